@@ -0,0 +1,117 @@
+# benchmarks/bench_decode.py
+"""
+Micro-benchmark of per-document decode cost: full Pydantic validation
+(`model_validate`) against the trusted read path (`VehicleRecord.from_doc`).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_decode --documents 10000 --repeat 5
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from src.models import Vehicle, VehicleCondition, VehicleRecord, WorkOrder, WorkOrderRecord
+
+
+def make_vehicle_docs(count: int, seed: int = 42) -> list:
+    """Builds stored-shape vehicle documents, roughly a quarter of them non-running."""
+    rng = random.Random(seed)
+    today = datetime.combine(datetime.today(), datetime.min.time())
+    docs = []
+    for i in range(count):
+        running = rng.random() > 0.25
+        doc = {
+            "_id": ObjectId(),
+            "alias": f"Vehicle {i}",
+            "photo_url": None,
+            "condition": VehicleCondition.RUNNING.value if running else VehicleCondition.NON_RUNNING.value,
+            "documentation": {
+                "inspection_due": today + timedelta(days=rng.randint(-60, 365)),
+                "tax_due": today + timedelta(days=rng.randint(-60, 365)),
+            },
+            "location": f"Depot {rng.randint(1, 20)}",
+            "is_available": running,
+        }
+        if not running:
+            doc["non_running_details"] = {
+                "explanation": "Engine overhaul",
+                "estimated_budget": float(rng.randint(100, 5000)),
+                "eta": today + timedelta(days=rng.randint(1, 90)),
+            }
+        docs.append(doc)
+    return docs
+
+
+def make_work_order_docs(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    vehicle_ids = [ObjectId() for _ in range(max(count // 100, 1))]
+    start = datetime(2020, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "vehicle_id": rng.choice(vehicle_ids),
+            "title": f"Order {i}",
+            "description": "Routine maintenance",
+            "cost": float(rng.randint(20, 2000)),
+            "start_date": start + timedelta(days=rng.randint(0, 2000)),
+            "completion_date": None,
+            "eta": None,
+            "eta_is_tbd": True,
+            "tasks": ["oil", "filters"],
+            "is_complete": False,
+        }
+        for i in range(count)
+    ]
+
+
+def time_decode(decode, docs: list, repeat: int) -> list:
+    """Returns the wall time of each repetition, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for doc in docs:
+            decode(doc)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(label: str, validated: list, trusted: list, count: int) -> None:
+    validated_us = statistics.median(validated) / count * 1e6
+    trusted_us = statistics.median(trusted) / count * 1e6
+    print(f"{label}:")
+    print(f"  model_validate  {validated_us:8.2f} µs/doc")
+    print(f"  record          {trusted_us:8.2f} µs/doc")
+    print(f"  speedup         {validated_us / trusted_us:8.2f}x")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    vehicles = make_vehicle_docs(args.documents)
+    report(
+        "Vehicle",
+        time_decode(Vehicle.model_validate, vehicles, args.repeat),
+        time_decode(VehicleRecord.from_doc, vehicles, args.repeat),
+        args.documents,
+    )
+
+    orders = make_work_order_docs(args.documents)
+    report(
+        "WorkOrder",
+        time_decode(WorkOrder.model_validate, orders, args.repeat),
+        time_decode(WorkOrderRecord.from_doc, orders, args.repeat),
+        args.documents,
+    )
+
+
+if __name__ == "__main__":
+    main()
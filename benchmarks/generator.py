@@ -0,0 +1,101 @@
+# benchmarks/generator.py
+"""
+Deterministic synthetic fleet built on the Vehicle/WorkOrder models.
+The same seed and anchor date always produce the same documents, ids included.
+"""
+
+import random
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional
+
+from bson import ObjectId
+
+from src.models import Documentation, NonRunningDetails, Vehicle, VehicleCondition, WorkOrder
+
+LOCATIONS = [f"Taller {name}" for name in ("Nord", "Sud", "Est", "Oest", "Centre", "Port", "Aeroport", "Polígon")]
+MAKES = ["SEAT 128", "SEAT 600", "Renault 4", "Citroën 2CV", "Ford Transit", "Iveco Daily", "Mercedes Sprinter"]
+REPAIRS = ["Canvi de motor", "Embragatge", "Frens", "Sistema elèctric", "Xapa i pintura"]
+ORDER_TITLES = ["Canvi d'oli i filtres", "Revisió ITV", "Pneumàtics", "Frens", "Distribució", "Bateria"]
+TASKS = ["Oli", "Filtre d'aire", "Filtre d'oli", "Pastilles", "Discos", "Líquid de frens", "Corretja"]
+
+
+def _object_id(rng: random.Random) -> ObjectId:
+    return ObjectId(rng.randbytes(12))
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def generate_vehicles(count: int, seed: int = 42, anchor: Optional[date] = None) -> List[dict]:
+    """
+    Builds `count` vehicle documents exactly as add_vehicle stores them.
+    About a quarter are non-running and about a tenth have lapsed documentation.
+    """
+    rng = random.Random(seed)
+    anchor = anchor or date.today()
+    docs = []
+    for i in range(count):
+        running = rng.random() > 0.25
+        details = None
+        if not running:
+            details = NonRunningDetails(
+                explanation=rng.choice(REPAIRS),
+                estimated_budget=float(rng.randint(100, 8000)),
+                eta=_midnight(anchor + timedelta(days=rng.randint(1, 120))),
+            )
+        vehicle = Vehicle(
+            id=_object_id(rng),
+            alias=f"{rng.choice(MAKES)} {1960 + rng.randint(0, 60)} #{i}",
+            condition=VehicleCondition.RUNNING if running else VehicleCondition.NON_RUNNING,
+            non_running_details=details,
+            documentation=Documentation(
+                inspection_due=_midnight(anchor + timedelta(days=rng.randint(-30, 365))),
+                tax_due=_midnight(anchor + timedelta(days=rng.randint(-30, 365))),
+            ),
+            location=rng.choice(LOCATIONS),
+        )
+        doc = vehicle.model_dump(by_alias=True)
+        doc["updated_at"] = _midnight(anchor)
+        docs.append(doc)
+    return docs
+
+
+def generate_work_orders(
+    vehicle_ids: List[ObjectId],
+    count: int,
+    seed: int = 42,
+    anchor: Optional[date] = None,
+    batch_size: int = 10000,
+) -> Iterator[List[dict]]:
+    """
+    Yields `count` work-order documents in batches, spread over the last ten years.
+    Orders older than a month are complete; the rest are open.
+    """
+    rng = random.Random(seed + 1)
+    anchor = anchor or date.today()
+    batch = []
+    for i in range(count):
+        start = _midnight(anchor - timedelta(days=rng.randint(0, 3650)))
+        complete = start < _midnight(anchor - timedelta(days=30))
+        order = WorkOrder(
+            id=_object_id(rng),
+            vehicle_id=rng.choice(vehicle_ids),
+            title=rng.choice(ORDER_TITLES),
+            description=f"Ordre sintètica #{i}",
+            cost=float(rng.randint(20, 3000)),
+            start_date=start,
+            completion_date=start + timedelta(days=rng.randint(0, 20)) if complete else None,
+            eta=None,
+            eta_is_tbd=not complete,
+            tasks=rng.sample(TASKS, rng.randint(1, 4)),
+            is_complete=complete,
+        )
+        doc = order.model_dump(by_alias=True)
+        doc["updated_at"] = start
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,319 @@
+# benchmarks/run.py
+"""
+Benchmarks the data layer and the pages against a synthetic fleet.
+
+Run from the repository root, against a local mongod (the database is dropped
+and re-seeded unless --skip-seed is given):
+
+    python -m benchmarks.run --vehicles 10000 --work-orders 1000000
+    python -m benchmarks.run --in-memory --vehicles 2000 --work-orders 50000
+    python -m benchmarks.run --backend sqlite --vehicles 10000 --work-orders 1000000
+
+The sqlite backend runs hermetically, in memory unless --sqlite-path is given.
+
+Each run is written to benchmarks/results/<label>.json. Compare two runs with:
+
+    python -m benchmarks.run --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date, datetime
+from itertools import chain
+from pathlib import Path
+from typing import Callable, Dict, List
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+PAGES_DIR = Path(__file__).resolve().parent.parent / "pages"
+REGRESSION_THRESHOLD = 1.10
+# Cases that return rows whenever the fleet is seeded with vehicles; an empty result
+# from one of them means the call failed.
+EXPECT_ROWS = {
+    "get_all_vehicles (cold)",
+    "get_all_vehicles (cached)",
+    "find_vehicles (first page)",
+    "get_vehicles_by_ids (24)",
+    "get_vehicle",
+}
+
+
+# --- Measuring ---
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def _error_count() -> int:
+    """Errors recorded so far by the instrumented data layer, which answers failures with empty results."""
+    from src.metrics import metrics
+
+    return sum(series["errors"] for series in metrics.snapshot()["operations"].values())
+
+
+def _item_count(result: object) -> int:
+    from src.models import Page
+
+    if result is None:
+        return 0
+    if isinstance(result, Page):
+        return len(result.items)
+    return len(result) if hasattr(result, "__len__") else 1
+
+
+def measure(function: Callable[[], object], iterations: int, expect_rows: bool = False) -> dict:
+    """
+    Runs `function` repeatedly and reports latency percentiles (ms) and peak traced memory (KiB).
+    Raises if the data layer recorded an error, or if `expect_rows` and nothing came back:
+    a failing call returns an empty result fast, and must not be reported as a fast case.
+    """
+    errors_before = _error_count()
+    if expect_rows and not _item_count(function()):  # warm-up
+        raise RuntimeError("returned no rows, though the seeded data has some")
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    # Memory is traced on a separate call so tracing does not skew the timings.
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    errors = _error_count() - errors_before
+    if errors:
+        raise RuntimeError(f"{errors} data layer calls failed")
+    return {
+        "iterations": iterations,
+        "p50_ms": _percentile(timings, 0.50),
+        "p95_ms": _percentile(timings, 0.95),
+        "p99_ms": _percentile(timings, 0.99),
+        "max_ms": timings[-1],
+        "mean_ms": statistics.fmean(timings),
+        "peak_kib": peak / 1024,
+        "items": _item_count(result),
+    }
+
+
+# --- Setup ---
+def connect(args):
+    """
+    Points the app's shared connection at the benchmark database and returns it.
+    The command line wins over any exported app settings: the seed drops and
+    rewrites whatever database this connects to.
+    """
+    os.environ["STORAGE_BACKEND"] = args.backend
+    os.environ["SQLITE_PATH"] = args.sqlite_path
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["DATABASE_NAME"] = args.database
+    # Always measure the database itself, never the local fallback copy.
+    os.environ["LOCAL_SNAPSHOT_PATH"] = ""
+    from src.database import db_connection
+    from src.repository import repository
+
+    if args.in_memory:
+        import mongomock
+        db_connection.use_client(mongomock.MongoClient(), args.database)
+    # Settings are read on import; if src was already imported they may point elsewhere.
+    if args.backend == "sqlite" and repository.path != args.sqlite_path:
+        raise SystemExit(f"Refusing to benchmark {repository.path}: --sqlite-path is {args.sqlite_path}.")
+    if args.backend == "mongo" and db_connection.database_name != args.database:
+        raise SystemExit(f"Refusing to benchmark {db_connection.database_name}: --database is {args.database}.")
+    return db_connection
+
+
+def seed(db, args) -> None:
+    from benchmarks.generator import generate_vehicles, generate_work_orders
+    from src.database import ensure_indexes, rebuild_work_order_totals
+
+    if db.name != args.database:
+        raise SystemExit(f"Refusing to drop {db.name}: only --database {args.database} is re-seeded.")
+    anchor = date.fromisoformat(args.anchor) if args.anchor else None
+    db.client.drop_database(db.name)
+    started = time.perf_counter()
+    vehicles = generate_vehicles(args.vehicles, seed=args.seed, anchor=anchor)
+    db["vehicles"].insert_many(vehicles, ordered=False)
+    vehicle_ids = [doc["_id"] for doc in vehicles]
+    for batch in generate_work_orders(vehicle_ids, args.work_orders, seed=args.seed, anchor=anchor):
+        db["work_orders"].insert_many(batch, ordered=False)
+    ensure_indexes(db)
+    # The generator writes raw documents, so the per-vehicle totals are computed once here.
+    rebuild_work_order_totals()
+    print(f"Seeded {args.vehicles} vehicles and {args.work_orders} work orders in {time.perf_counter() - started:.1f}s")
+
+
+def seed_sqlite(args) -> None:
+    from benchmarks.generator import generate_vehicles, generate_work_orders
+    from src.repository import repository
+
+    anchor = date.fromisoformat(args.anchor) if args.anchor else None
+    started = time.perf_counter()
+    vehicles = generate_vehicles(args.vehicles, seed=args.seed, anchor=anchor)
+    work_orders = chain.from_iterable(
+        generate_work_orders([doc["_id"] for doc in vehicles], args.work_orders, seed=args.seed, anchor=anchor)
+    )
+    repository.load(vehicles, work_orders)
+    repository.rebuild_work_order_totals()
+    print(f"Seeded {args.vehicles} vehicles and {args.work_orders} work orders in {time.perf_counter() - started:.1f}s")
+
+
+def data_layer_cases(vehicle_ids: List[str], rng: random.Random) -> Dict[str, Callable[[], object]]:
+    from src.database import vehicle_cache
+    from src.kpis import kpi_cache
+    from src.repository import repository
+
+    # The caches only exist on the mongo backend; clearing them elsewhere is a no-op.
+    def cold_vehicles():
+        vehicle_cache.invalidate()
+        return repository.get_all_vehicles()
+
+    def cold_kpis():
+        kpi_cache.invalidate()
+        return repository.get_fleet_kpis().by_location
+
+    return {
+        "get_all_vehicles (cold)": cold_vehicles,
+        "get_all_vehicles (cached)": repository.get_all_vehicles,
+        "find_vehicles (first page)": lambda: repository.find_vehicles(limit=24, with_total=True),
+        "find_vehicles (filtered)": lambda: repository.find_vehicles(available=True, sort="location", limit=24),
+        "get_vehicles_by_ids (24)": lambda: repository.get_vehicles_by_ids(rng.sample(vehicle_ids, 24)),
+        "get_vehicle": lambda: repository.get_vehicle(rng.choice(vehicle_ids)),
+        "get_vehicle_refs (search)": lambda: repository.get_vehicle_refs(search="seat", limit=51),
+        "get_availability_counts": repository.get_availability_counts,
+        "get_fleet_kpis (cold)": cold_kpis,
+        "get_work_orders_for_vehicle": lambda: repository.get_work_orders_for_vehicle(rng.choice(vehicle_ids)),
+        "get_work_orders_page": lambda: repository.get_work_orders_page(rng.choice(vehicle_ids)),
+        "get_work_orders_for_vehicles (20)": lambda: repository.get_work_orders_for_vehicles(rng.sample(vehicle_ids, 20)),
+    }
+
+
+def page_cases() -> Dict[str, Callable[[], object]]:
+    """Headless renders of each page through Streamlit's AppTest harness."""
+    from streamlit.testing.v1 import AppTest
+
+    def render(path: Path) -> Callable[[], object]:
+        def run():
+            app = AppTest.from_file(str(path), default_timeout=120).run()
+            if app.exception:
+                raise RuntimeError(f"{path.name} raised: {app.exception[0].message}")
+            return app.main.children
+        return run
+
+    return {f"page {path.stem}": render(path) for path in sorted(PAGES_DIR.glob("*.py"))}
+
+
+# --- Results ---
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def save_results(label: str, params: dict, results: dict) -> Path:
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{label}.json"
+    payload = {
+        "label": label,
+        "git_commit": _git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "params": params,
+        "results": results,
+    }
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False))
+    return path
+
+
+def print_results(results: dict) -> None:
+    print(f"{'case':<40} {'p50':>9} {'p95':>9} {'p99':>9} {'peak KiB':>10}")
+    for name, row in results.items():
+        if "error" in row:
+            print(f"{name:<40} ERROR {row['error']}")
+            continue
+        print(f"{name:<40} {row['p50_ms']:>8.2f}ms {row['p95_ms']:>8.2f}ms {row['p99_ms']:>8.2f}ms {row['peak_kib']:>10.0f}")
+
+
+def compare(old_path: str, new_path: str) -> int:
+    """Prints p50/p95 ratios between two result files. Returns 1 if any case regressed."""
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{old['label']} ({old['git_commit']}) -> {new['label']} ({new['git_commit']})")
+    regressed = False
+    for name, row in new["results"].items():
+        before = old["results"].get(name)
+        if not before or "error" in row or "error" in before:
+            print(f"{name:<40} (not comparable)")
+            continue
+        p50_ratio = row["p50_ms"] / before["p50_ms"] if before["p50_ms"] else float("inf")
+        p95_ratio = row["p95_ms"] / before["p95_ms"] if before["p95_ms"] else float("inf")
+        flag = "  REGRESSION" if p50_ratio > REGRESSION_THRESHOLD else ""
+        regressed = regressed or bool(flag)
+        print(f"{name:<40} p50 x{p50_ratio:5.2f}  p95 x{p95_ratio:5.2f}{flag}")
+    return 1 if regressed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="fleet_status_bench")
+    parser.add_argument("--in-memory", action="store_true", help="Use mongomock instead of a mongod.")
+    parser.add_argument("--backend", choices=["mongo", "sqlite"], default="mongo")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--vehicles", type=int, default=10000)
+    parser.add_argument("--work-orders", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", help="Anchor date (YYYY-MM-DD) for generated dates; defaults to today.")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--page-iterations", type=int, default=5)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the data already in the database.")
+    parser.add_argument("--skip-pages", action="store_true")
+    parser.add_argument("--label", help="Name of the results file; defaults to the git commit.")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare)
+
+    if args.backend == "sqlite":
+        connect(args)
+        if not args.skip_seed:
+            seed_sqlite(args)
+        from src.repository import repository
+        vehicle_ids = [ref.id for ref in repository.get_vehicle_refs()]
+    else:
+        db = connect(args).db
+        if not args.skip_seed:
+            seed(db, args)
+        vehicle_ids = [str(doc["_id"]) for doc in db["vehicles"].find({}, {"_id": 1})]
+
+    rng = random.Random(args.seed)
+    results = {}
+    cases = data_layer_cases(vehicle_ids, rng)
+    if not args.skip_pages:
+        cases.update(page_cases())
+    for name, function in cases.items():
+        iterations = args.page_iterations if name.startswith("page ") else args.iterations
+        try:
+            results[name] = measure(function, iterations, expect_rows=bool(vehicle_ids) and name in EXPECT_ROWS)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+
+    print_results(results)
+    params = {key: getattr(args, key) for key in ("backend", "vehicles", "work_orders", "seed", "anchor", "in_memory", "iterations")}
+    path = save_results(args.label or _git_commit(), params, results)
+    print(f"Results written to {path}")
+    return 1 if any("error" in row for row in results.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
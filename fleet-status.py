@@ -1,12 +1,19 @@
 import streamlit as st
 from src.i18n import TEXT
+from src.scheduler import start_background_jobs
+from src.debug import end_page_run
+from src.metrics import start_page_run
 
 st.set_page_config(
     page_title=TEXT["page_config_home_title"],
     page_icon=TEXT["page_config_icon"],
     layout="wide"
 )
+start_background_jobs()
+page_run = start_page_run("home")
 
 st.title(TEXT["welcome_title"])
 st.sidebar.success(TEXT["sidebar_select_page"])
 st.write(TEXT["welcome_instructions"])
+
+end_page_run(page_run)
@@ -1,27 +1,157 @@
+import pandas as pd
+from datetime import date
 import streamlit as st
-from src.database import get_all_vehicles
+from src.alerts import EXPIRY_ALERT_DAYS, EXPIRY_LAPSED_DAYS, alert_window, digest_csv, expiry_alerts
+from src.async_repository import async_repository, run_concurrently
+from src.repository import repository
+from src.live import ALL, LIVE_REFRESH_SECONDS, fleet_state, vehicles_changed_since
+from src.models import VehicleCondition
+from src.thumbnails import get_thumbnails
 from src.i18n import TEXT
+from src.widgets import connection_banner
+from src.scheduler import start_background_jobs
+from src.debug import end_page_run
+from src.metrics import start_page_run
 
 st.set_page_config(page_title=TEXT["overview_page_title"], layout="wide")
+start_background_jobs()
+page_run = start_page_run("overview")
 st.title(TEXT["overview_title"])
+connection_banner()
 
-vehicles = get_all_vehicles()
+# The KPIs, the expiry alerts and the location filter's options do not depend on each other,
+# so their queries run at once.
+alert_since, alert_before = alert_window()
+kpis, expiring_vehicles, locations = run_concurrently(
+    async_repository.get_fleet_kpis(),
+    async_repository.get_expiring_vehicles(alert_before, alert_since),
+    async_repository.get_vehicle_locations(),
+)
+
+# --- KPI SUMMARY ---
+kpi_cols = st.columns(4)
+kpi_cols[0].metric(TEXT["kpi_available"], kpis.available)
+kpi_cols[1].metric(TEXT["kpi_unavailable"], kpis.unavailable)
+kpi_cols[2].metric(
+    TEXT["kpi_repair_budget"],
+    f"{kpis.repair_budget:,.2f} €",
+    TEXT["kpi_repair_vehicles"].format(count=kpis.vehicles_in_repair),
+    delta_color="off"
+)
+kpi_cols[3].metric(TEXT["kpi_open_cost"], f"{kpis.open_work_order_cost:,.2f} €")
+
+with st.expander(TEXT["kpi_details"]):
+    location_col, cost_col = st.columns(2)
+    with location_col:
+        st.caption(TEXT["kpi_by_location"])
+        st.dataframe(
+            [
+                {TEXT["col_location"]: row.location, TEXT["col_vehicles"]: row.vehicles, TEXT["kpi_available"]: row.available}
+                for row in kpis.by_location
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+    with cost_col:
+        st.caption(TEXT["kpi_open_costs"])
+        st.dataframe(
+            [
+                {TEXT["col_alias"]: row.alias, TEXT["col_open_orders"]: row.open_orders, TEXT["col_open_cost"]: row.open_cost}
+                for row in kpis.open_costs
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+
+# --- EXPIRY ALERTS ---
+alerts = expiry_alerts(expiring_vehicles, EXPIRY_ALERT_DAYS)
+with st.expander(TEXT["expiry_title"].format(count=len(alerts)), expanded=bool(alerts)):
+    if not alerts:
+        st.caption(TEXT["expiry_none"].format(days=EXPIRY_ALERT_DAYS))
+    else:
+        st.caption(TEXT["expiry_caption"].format(days=EXPIRY_ALERT_DAYS, lapsed_days=EXPIRY_LAPSED_DAYS))
+        st.dataframe(
+            [
+                {
+                    TEXT["col_due"]: alert.due.date(),
+                    TEXT["col_days_left"]: alert.days_left,
+                    TEXT["col_document"]: TEXT[f"expiry_document_{alert.document}"],
+                    TEXT["col_alias"]: alert.alias,
+                    TEXT["col_location"]: alert.location,
+                }
+                for alert in alerts
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        st.download_button(
+            TEXT["expiry_download"],
+            data=digest_csv(alerts),
+            file_name=f"expiry-{date.today().isoformat()}.csv",
+            mime="text/csv"
+        )
+
+st.divider()
+
+# --- FILTERS ---
+view_mode = st.radio(TEXT["view_mode"], options=[TEXT["view_cards"], TEXT["view_table"]], horizontal=True)
+table_mode = view_mode == TEXT["view_table"]
+
+filter_cols = st.columns(4)
+with filter_cols[0]:
+    condition_filter = st.selectbox(
+        TEXT["col_condition"],
+        options=[TEXT["filter_all"]] + [c.value for c in VehicleCondition]
+    )
+with filter_cols[1]:
+    location_filter = st.selectbox(
+        TEXT["col_location"],
+        options=[TEXT["filter_all"]] + locations
+    )
+with filter_cols[2]:
+    availability_options = {
+        TEXT["filter_all"]: None,
+        TEXT["filter_available"]: True,
+        TEXT["filter_unavailable"]: False,
+    }
+    availability_filter = st.selectbox(TEXT["col_available"], options=availability_options.keys())
+with filter_cols[3]:
+    page_size = st.selectbox(TEXT["filter_page_size"], options=[12, 24, 48, 96], disabled=table_mode)
+
+filters = {
+    "condition": None if condition_filter == TEXT["filter_all"] else condition_filter,
+    "location": None if location_filter == TEXT["filter_all"] else location_filter,
+    "available": availability_options[availability_filter],
+}
+
+# --- LIVE CARD GRID ---
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def render_cards():
+    """Renders the current page, re-fetching only the cards the live watcher reports as changed."""
+    cards = st.session_state.overview_cards
+    changed = vehicles_changed_since("overview_live_version")
+    if changed is None or ALL in changed["vehicles"]:
+        st.rerun()
+    stale_ids = [vehicle_id for vehicle_id in changed["vehicles"] if vehicle_id in cards]
+    if stale_ids:
+        fresh = repository.get_vehicles_by_ids(stale_ids)
+        for vehicle_id in stale_ids:
+            if vehicle_id in fresh:
+                cards[vehicle_id] = fresh[vehicle_id]
+            else:
+                del cards[vehicle_id]
 
-if not vehicles:
-    st.warning(TEXT["overview_no_vehicles"])
-else:
     num_columns = 4
     cols = st.columns(num_columns)
 
-    for index, vehicle in enumerate(vehicles):
+    # Local, grid-sized copies of the photos; vehicles without one get the bundled placeholder.
+    thumbnails = get_thumbnails([vehicle.photo_url for vehicle in cards.values()])
+
+    for index, vehicle in enumerate(cards.values()):
         col = cols[index % num_columns]
 
         with col.container(border=True):
-            if vehicle.photo_url:
-                st.image(vehicle.photo_url, use_container_width=True)
-            else:
-                # Update placeholder to match the 800x600 (4:3) ratio
-                st.image("https://placehold.co/800x600/222/FFF?text=No+Foto", use_container_width=True)
+            st.image(thumbnails[index], use_container_width=True)
 
             st.subheader(vehicle.alias)
 
@@ -54,3 +184,99 @@ else:
                 if vehicle.condition == "No operatiu" and vehicle.non_running_details:
                     st.write(f"**Pressupost:** {vehicle.non_running_details.estimated_budget}€")
                     st.write(f"**ETA:** {vehicle.non_running_details.eta.strftime('%Y-%m-%d')}")
+
+
+# --- LIVE TABLE ---
+TABLE_COLUMNS = {
+    "alias": TEXT["col_alias"],
+    "condition": TEXT["col_condition"],
+    "location": TEXT["col_location"],
+    "is_available": TEXT["col_available"],
+    "inspection_due": TEXT["col_inspection_due"],
+    "tax_due": TEXT["col_tax_due"],
+    "reason": TEXT["col_reason"],
+    "open_orders": TEXT["col_open_orders"],
+    "total_cost": TEXT["col_total_cost"],
+    "last_service_date": TEXT["col_last_service"],
+}
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def render_table():
+    """
+    Renders the whole filtered fleet as one grid. It is a single element whatever the
+    fleet size, and is re-fetched only when the live watcher reports changed vehicles.
+    """
+    changed = vehicles_changed_since("overview_live_version")
+    if changed is None or changed["vehicles"]:
+        st.session_state.overview_table = repository.get_vehicle_table(**filters)
+
+    columns = st.session_state.overview_table
+    frame = pd.DataFrame({label: columns[name] for name, label in TABLE_COLUMNS.items()})
+    st.dataframe(
+        frame,
+        hide_index=True,
+        use_container_width=True,
+        height=600,
+        column_config={
+            TEXT["col_available"]: st.column_config.CheckboxColumn(),
+            TEXT["col_inspection_due"]: st.column_config.DateColumn(format="YYYY-MM-DD"),
+            TEXT["col_tax_due"]: st.column_config.DateColumn(format="YYYY-MM-DD"),
+            TEXT["col_total_cost"]: st.column_config.NumberColumn(format="%.2f €"),
+            TEXT["col_last_service"]: st.column_config.DateColumn(format="YYYY-MM-DD"),
+        }
+    )
+    st.caption(TEXT["table_caption"].format(total=len(frame)))
+
+
+if table_mode:
+    st.session_state.overview_live_version = fleet_state.version
+    st.session_state.overview_table = repository.get_vehicle_table(**filters)
+    if not st.session_state.overview_table["id"]:
+        st.warning(TEXT["overview_no_vehicles"])
+    else:
+        render_table()
+else:
+    # Cursors of the pages visited so far; reset whenever the filters change.
+    if st.session_state.get("overview_filters") != (filters, page_size):
+        st.session_state.overview_filters = (filters, page_size)
+        st.session_state.overview_cursors = [None]
+
+    page_number = len(st.session_state.overview_cursors)
+    # The query below is fresh, so earlier live changes are already reflected in it.
+    st.session_state.overview_live_version = fleet_state.version
+    # Counting reads every matching vehicle, so it only runs again when the
+    # filters change or vehicles were written since, not on every page turn.
+    total_key = (filters, fleet_state.collection_versions["vehicles"])
+    count_total = st.session_state.get("overview_total_key") != total_key
+    page = repository.find_vehicles(
+        **filters,
+        limit=page_size,
+        cursor=st.session_state.overview_cursors[-1],
+        with_total=count_total,
+    )
+    if count_total:
+        st.session_state.overview_total = page.total
+        st.session_state.overview_total_key = total_key
+    vehicles = page.items
+
+    if not vehicles:
+        st.warning(TEXT["overview_no_vehicles"])
+    else:
+        st.session_state.overview_cards = {str(vehicle.id): vehicle for vehicle in vehicles}
+        render_cards()
+
+        # --- PAGINATION ---
+        st.divider()
+        nav_prev, nav_caption, nav_next = st.columns([1, 3, 1])
+        with nav_prev:
+            if st.button(TEXT["page_previous"], disabled=page_number == 1):
+                st.session_state.overview_cursors.pop()
+                st.rerun()
+        with nav_caption:
+            st.caption(TEXT["page_caption"].format(page=page_number, total=st.session_state.overview_total))
+        with nav_next:
+            if st.button(TEXT["page_next"], disabled=page.next_cursor is None):
+                st.session_state.overview_cursors.append(page.next_cursor)
+                st.rerun()
+
+end_page_run(page_run)
@@ -1,11 +1,16 @@
 import streamlit as st
 from datetime import date, datetime
-from src.database import add_vehicle
+from src.repository import repository
 from src.models import Vehicle, VehicleCondition, Documentation, NonRunningDetails
 from src.i18n import TEXT
-from src.uploader import upload_image
+from src.uploader import enqueue_vehicle_photo
+from src.scheduler import start_background_jobs
+from src.debug import end_page_run
+from src.metrics import start_page_run
 
 st.set_page_config(page_title=TEXT["add_page_title"], layout="wide")
+start_background_jobs()
+page_run = start_page_run("add_vehicle")
 st.title(TEXT["add_title"])
 
 with st.form("new_vehicle_form", clear_on_submit=True):
@@ -44,11 +49,6 @@ with st.form("new_vehicle_form", clear_on_submit=True):
         if not alias or not location:
             st.error(TEXT["add_error_required"])
         else:
-            photo_url = None
-            if uploaded_photo is not None:
-                with st.spinner("Pujant imatge..."):
-                    photo_url = upload_image(uploaded_photo, alias)
-
             inspection_datetime = datetime.combine(inspection_due, datetime.min.time())
             tax_datetime = datetime.combine(tax_due, datetime.min.time())
             doc_model = Documentation(inspection_due=inspection_datetime, tax_due=tax_datetime)
@@ -64,12 +64,18 @@ with st.form("new_vehicle_form", clear_on_submit=True):
 
             new_vehicle = Vehicle(
                 alias=alias,
-                photo_url=photo_url,
                 condition=condition,
                 non_running_details=nr_details_model,
                 documentation=doc_model,
                 location=location
             )
 
-            add_vehicle(new_vehicle)
+            vehicle_id = repository.add_vehicle(new_vehicle)
             st.success(TEXT["add_success_message"].format(alias=alias))
+
+            # The photo is resized, uploaded and attached without holding up the form.
+            if vehicle_id and uploaded_photo is not None:
+                enqueue_vehicle_photo(uploaded_photo.getvalue(), vehicle_id)
+                st.info(TEXT["add_photo_queued"])
+
+end_page_run(page_run)
@@ -1,90 +1,150 @@
 import streamlit as st
-from src.database import get_all_vehicles, update_vehicle, delete_vehicle
+from src.repository import repository
 from src.models import VehicleCondition
 from datetime import datetime
 from src.i18n import TEXT
+from src.widgets import connection_banner, vehicle_multi_picker, vehicle_picker
+from src.scheduler import start_background_jobs
+from src.debug import end_page_run
+from src.metrics import start_page_run
 
 st.set_page_config(page_title=TEXT["manage_page_title"], layout="wide")
+start_background_jobs()
+page_run = start_page_run("edit_vehicle")
 st.title(TEXT["manage_title"])
-
-vehicles = get_all_vehicles()
-
-if not vehicles:
-    st.warning(TEXT["manage_no_vehicles"])
+connection_banner()
+
+edit_mode = st.radio(TEXT["manage_mode"], options=[TEXT["manage_mode_single"], TEXT["manage_mode_bulk"]], horizontal=True)
+
+if edit_mode == TEXT["manage_mode_bulk"]:
+    # --- BULK EDIT ---
+    # Every selected vehicle gets the same changes in one bulk write, and the
+    # shared snapshot is refreshed once afterwards.
+    selected_refs = vehicle_multi_picker("bulk_edit")
+
+    with st.form("bulk_edit_form"):
+        st.subheader(TEXT["bulk_edit_subheader"].format(count=len(selected_refs)))
+        st.caption(TEXT["bulk_edit_help"])
+
+        set_inspection = st.checkbox(TEXT["bulk_edit_set_inspection"])
+        inspection_due = st.date_input(TEXT["add_inspection_label"])
+        set_tax = st.checkbox(TEXT["bulk_edit_set_tax"])
+        tax_due = st.date_input(TEXT["add_tax_label"])
+        set_location = st.checkbox(TEXT["bulk_edit_set_location"])
+        location = st.text_input(TEXT["add_location_label"])
+
+        submitted = st.form_submit_button(TEXT["bulk_edit_button"])
+
+    if submitted:
+        updates = {}
+        if set_inspection:
+            updates["documentation.inspection_due"] = datetime.combine(inspection_due, datetime.min.time())
+        if set_tax:
+            updates["documentation.tax_due"] = datetime.combine(tax_due, datetime.min.time())
+        if set_location and location:
+            updates["location"] = location
+
+        if not selected_refs or not updates:
+            st.warning(TEXT["bulk_edit_nothing"])
+        else:
+            report = repository.bulk_update_vehicles({ref.id: updates for ref in selected_refs})
+            updated = len(report.results) - len(report.failed)
+            st.success(TEXT["bulk_edit_result"].format(updated=updated, total=len(report.results)))
+            if report.failed:
+                labels = {ref.id: ref.label for ref in selected_refs}
+                st.caption(TEXT["bulk_edit_failures"])
+                st.dataframe(
+                    [
+                        {TEXT["col_alias"]: labels[result.vehicle_id], TEXT["col_message"]: result.message}
+                        for result in report.failed
+                    ],
+                    hide_index=True,
+                    use_container_width=True
+                )
 else:
-    vehicle_map = {v.alias: v for v in vehicles}
-    alias_to_edit = st.selectbox(TEXT["manage_select_vehicle"], options=vehicle_map.keys())
-
-    selected_vehicle = vehicle_map[alias_to_edit]
-
-    with st.form("edit_vehicle_form"):
-        st.subheader(TEXT["manage_editing_subheader"].format(alias=selected_vehicle.alias))
-
-        new_alias = st.text_input(TEXT["add_alias_label"], value=selected_vehicle.alias)
-        location = st.text_input(TEXT["add_location_label"], value=selected_vehicle.location)
-
-        condition_options = [c.value for c in VehicleCondition]
-        condition_index = condition_options.index(selected_vehicle.condition)
-        condition = st.selectbox(TEXT["add_condition_label"], options=condition_options, index=condition_index)
-
-        inspection_due = st.date_input(TEXT["add_inspection_label"], value=selected_vehicle.documentation.inspection_due.date())
-        tax_due = st.date_input(TEXT["add_tax_label"], value=selected_vehicle.documentation.tax_due.date())
-
-        # --- DYNAMIC FORM FOR NON-RUNNING DETAILS ---
-        if condition == "No operatiu":
-            st.warning(TEXT["add_non_running_warning"])
-
-            # Pre-fill with existing data if it exists, otherwise use defaults
-            current_details = selected_vehicle.non_running_details
-            explanation = st.text_area(TEXT["add_explanation_label"], value=current_details.explanation if current_details else "")
-            budget = st.number_input(TEXT["add_budget_label"], min_value=0.0, step=50.0, value=current_details.estimated_budget if current_details else 0.0)
-            eta = st.date_input(TEXT["add_eta_label"], value=current_details.eta.date() if current_details else datetime.today().date())
-        # --- END OF DYNAMIC FORM ---
+    # Only the chosen vehicle is loaded in full; the selector reads the alias index.
+    selected_ref = vehicle_picker("edit_vehicle")
+    # Right after a save, the vehicle update_vehicle returned is shown instead of
+    # being read again; only that one rerun uses it.
+    saved_vehicle = st.session_state.pop("edit_vehicle_saved", None)
+    if selected_ref and saved_vehicle and str(saved_vehicle.id) == selected_ref.id:
+        selected_vehicle = saved_vehicle
+        st.success(TEXT["manage_update_success"])
+    else:
+        selected_vehicle = repository.get_vehicle(selected_ref.id) if selected_ref else None
+
+    if selected_vehicle:
+        with st.form("edit_vehicle_form"):
+            st.subheader(TEXT["manage_editing_subheader"].format(alias=selected_vehicle.alias))
+
+            new_alias = st.text_input(TEXT["add_alias_label"], value=selected_vehicle.alias)
+            location = st.text_input(TEXT["add_location_label"], value=selected_vehicle.location)
+
+            condition_options = [c.value for c in VehicleCondition]
+            condition_index = condition_options.index(selected_vehicle.condition)
+            condition = st.selectbox(TEXT["add_condition_label"], options=condition_options, index=condition_index)
+
+            inspection_due = st.date_input(TEXT["add_inspection_label"], value=selected_vehicle.documentation.inspection_due.date())
+            tax_due = st.date_input(TEXT["add_tax_label"], value=selected_vehicle.documentation.tax_due.date())
+
+            # --- DYNAMIC FORM FOR NON-RUNNING DETAILS ---
+            if condition == "No operatiu":
+                st.warning(TEXT["add_non_running_warning"])
+
+                # Pre-fill with existing data if it exists, otherwise use defaults
+                current_details = selected_vehicle.non_running_details
+                explanation = st.text_area(TEXT["add_explanation_label"], value=current_details.explanation if current_details else "")
+                budget = st.number_input(TEXT["add_budget_label"], min_value=0.0, step=50.0, value=current_details.estimated_budget if current_details else 0.0)
+                eta = st.date_input(TEXT["add_eta_label"], value=current_details.eta.date() if current_details else datetime.today().date())
+            # --- END OF DYNAMIC FORM ---
+
+            submitted = st.form_submit_button(TEXT["manage_save_button"])
+
+            if submitted:
+                # Base dictionary of fields that are always updated
+                updates = {
+                    "alias": new_alias,
+                    "location": location,
+                    "condition": condition,
+                    "documentation.inspection_due": datetime.combine(inspection_due, datetime.min.time()),
+                    "documentation.tax_due": datetime.combine(tax_due, datetime.min.time()),
+                }
 
-        submitted = st.form_submit_button(TEXT["manage_save_button"])
+                # Add or remove the non_running_details based on the selected condition
+                if condition == "No operatiu":
+                    updates["non_running_details"] = {
+                        "explanation": explanation,
+                        "estimated_budget": budget,
+                        "eta": datetime.combine(eta, datetime.min.time())
+                    }
+                else:
+                    # If the vehicle is now running, remove the old repair details
+                    updates["non_running_details"] = None
 
-        if submitted:
-            # Base dictionary of fields that are always updated
-            updates = {
-                "alias": new_alias,
-                "location": location,
-                "condition": condition,
-                "documentation.inspection_due": datetime.combine(inspection_due, datetime.min.time()),
-                "documentation.tax_due": datetime.combine(tax_due, datetime.min.time()),
-            }
+                updated_vehicle = repository.update_vehicle(str(selected_vehicle.id), updates)
 
-            # Add or remove the non_running_details based on the selected condition
-            if condition == "No operatiu":
-                updates["non_running_details"] = {
-                    "explanation": explanation,
-                    "estimated_budget": budget,
-                    "eta": datetime.combine(eta, datetime.min.time())
-                }
-            else:
-                # If the vehicle is now running, remove the old repair details
-                updates["non_running_details"] = None
-
-            success = update_vehicle(str(selected_vehicle.id), updates)
-
-            if success:
-                st.success(TEXT["manage_update_success"])
-                st.rerun()
-            else:
-                st.error(TEXT["manage_update_fail"])
-
-    # --- DELETE SECTION ---
-    st.divider()
-    with st.expander(TEXT["danger_zone_title"]):
-        st.subheader(TEXT["delete_subheader"])
-        st.warning(TEXT["delete_warning"].format(alias=selected_vehicle.alias))
-
-        confirm_delete = st.checkbox(TEXT["delete_confirm_checkbox"])
-
-        if confirm_delete:
-            if st.button(TEXT["delete_button"], type="primary"):
-                success = delete_vehicle(str(selected_vehicle.id))
-                if success:
-                    st.success(TEXT["delete_success"].format(alias=selected_vehicle.alias))
+                if updated_vehicle:
+                    # The rerun reads only the selector's alias index.
+                    st.session_state["edit_vehicle_saved"] = updated_vehicle
                     st.rerun()
                 else:
-                    st.error(TEXT["delete_fail"])
+                    st.error(TEXT["manage_update_fail"])
+
+        # --- DELETE SECTION ---
+        st.divider()
+        with st.expander(TEXT["danger_zone_title"]):
+            st.subheader(TEXT["delete_subheader"])
+            st.warning(TEXT["delete_warning"].format(alias=selected_vehicle.alias))
+
+            confirm_delete = st.checkbox(TEXT["delete_confirm_checkbox"])
+
+            if confirm_delete:
+                if st.button(TEXT["delete_button"], type="primary"):
+                    success = repository.delete_vehicle(str(selected_vehicle.id))
+                    if success:
+                        st.success(TEXT["delete_success"].format(alias=selected_vehicle.alias))
+                        st.rerun()
+                    else:
+                        st.error(TEXT["delete_fail"])
+
+end_page_run(page_run)
@@ -1,26 +1,97 @@
 import streamlit as st
 from bson import ObjectId
 from datetime import datetime, date
-from src.database import get_all_vehicles, add_work_order, get_work_orders_for_vehicle
+from src.repository import repository
+from src.live import ALL, LIVE_REFRESH_SECONDS, vehicles_changed_since
 from src.models import WorkOrder
-from src.i18n import TEXT
+from src.widgets import connection_banner, vehicle_picker
+from src.scheduler import start_background_jobs
+from src.debug import end_page_run
+from src.metrics import start_page_run
 
 st.set_page_config(page_title="Ordres de Treball", layout="wide")
+start_background_jobs()
+page_run = start_page_run("work_orders")
 st.title("Gestió d'Ordres de Treball 🛠️")
+connection_banner()
 
-vehicles = get_all_vehicles()
+WORK_ORDER_PAGE_SIZE = 20
 
-if not vehicles:
-    st.warning(TEXT["manage_no_vehicles"])
-else:
-    vehicle_map = {v.alias: v for v in vehicles}
-    selected_alias = st.selectbox(
-        TEXT["manage_select_vehicle"],
-        options=vehicle_map.keys()
-    )
-    selected_vehicle = vehicle_map[selected_alias]
 
-    st.header(f"Ordres per a: {selected_vehicle.alias}")
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def render_history(vehicle_id: str, history_key: str):
+    """Shows the loaded history, reloading it when the live watcher reports new orders for this vehicle."""
+    # One version per vehicle: each vehicle's cached history must see the changes
+    # made while another vehicle was selected.
+    changed = vehicles_changed_since(f"work_orders_live_version_{vehicle_id}")
+    if changed is None or vehicle_id in changed["work_orders"] or ALL in changed["work_orders"]:
+        st.session_state.pop(history_key, None)
+
+    if history_key not in st.session_state:
+        first_page = repository.get_work_orders_page(vehicle_id, limit=WORK_ORDER_PAGE_SIZE)
+        st.session_state[history_key] = {"orders": first_page.items, "next_cursor": first_page.next_cursor}
+    history = st.session_state[history_key]
+    work_orders = history["orders"]
+
+    if not work_orders:
+        st.info("Aquest vehicle no té cap ordre de treball.")
+    else:
+        for order in work_orders:
+            with st.container(border=True):
+                col1, col2, col3 = st.columns([3, 1, 1])
+                with col1:
+                    st.markdown(f"**{order.title}**")
+                    st.caption(f"Iniciada: {order.start_date.strftime('%Y-%m-%d')}")
+                    if order.is_complete and order.completion_date:
+                        st.caption(f"Completada: {order.completion_date.strftime('%Y-%m-%d')}")
+                    if not order.is_archived:
+                        st.write(order.description)
+                    else:
+                        # Only a summary is kept in the history; the details are read from the archive on demand.
+                        archived_key = f"archived_work_order_{order.id}"
+                        if archived_key not in st.session_state:
+                            if st.button("🗄️ Mostra els detalls arxivats", key=f"load_{archived_key}"):
+                                st.session_state[archived_key] = repository.get_archived_work_order(str(order.id))
+                                st.rerun(scope="fragment")
+                        elif st.session_state[archived_key] is None:
+                            st.caption("No s'han trobat els detalls arxivats.")
+                        else:
+                            archived_order = st.session_state[archived_key]
+                            st.write(archived_order.description)
+                            if archived_order.tasks:
+                                st.caption(" · ".join(archived_order.tasks))
+                with col2:
+                    if order.eta_is_tbd:
+                        st.metric("ETA", "TBD")
+                    elif order.eta:
+                        st.metric("ETA", order.eta.strftime('%Y-%m-%d'))
+                with col3:
+                    st.metric("Cost", f"{order.cost} €")
+                    if not order.is_complete and st.button("✅ Completa", key=f"complete_{order.id}"):
+                        completed_order = repository.complete_work_order(str(order.id))
+                        if completed_order is None:
+                            st.error("No s'ha pogut completar l'ordre de treball.")
+                        else:
+                            # Swap it in place; the vehicle's totals were updated with it.
+                            work_orders[work_orders.index(order)] = completed_order
+                            st.rerun(scope="fragment")
+
+        if history["next_cursor"]:
+            if st.button("Carrega'n més"):
+                next_page = repository.get_work_orders_page(vehicle_id, limit=WORK_ORDER_PAGE_SIZE, cursor=history["next_cursor"])
+                history["orders"].extend(next_page.items)
+                history["next_cursor"] = next_page.next_cursor
+                st.rerun(scope="fragment")
+
+
+# The page only needs the vehicle's id and alias, which the selector already has.
+selected_vehicle = vehicle_picker("work_orders")
+
+if selected_vehicle:
+    st.header(f"Ordres per a: {selected_vehicle.label}")
+
+    # Pages of history loaded so far in this session, newest first.
+    history_key = f"work_order_history_{selected_vehicle.id}"
 
     # --- Section to Add a New Work Order ---
     with st.expander("➕ Afegeix una Ordre de Treball Nova"):
@@ -48,7 +119,7 @@ else:
                     st.error("El títol és obligatori.")
                 else:
                     new_order = WorkOrder(
-                        vehicle_id=selected_vehicle.id,
+                        vehicle_id=ObjectId(selected_vehicle.id),
                         title=title,
                         description=description,
                         cost=cost,
@@ -56,29 +127,18 @@ else:
                         eta=None if is_tbd else datetime.combine(eta_date, datetime.min.time()),
                         eta_is_tbd=is_tbd
                     )
-                    add_work_order(new_order)
-                    st.success(f"S'ha creat l'ordre de treball '{title}'.")
-                    st.rerun()
+                    created_order = repository.add_work_order(new_order)
+                    if created_order is None:
+                        st.error("No s'ha pogut crear l'ordre de treball.")
+                    else:
+                        # Newest first, so the new order goes on top of the loaded history.
+                        if history_key in st.session_state:
+                            st.session_state[history_key]["orders"].insert(0, created_order)
+                        st.success(f"S'ha creat l'ordre de treball '{title}'.")
 
     # --- Section to Display Existing Work Orders ---
     st.divider()
     st.subheader("Historial d'Ordres de Treball")
-    work_orders = get_work_orders_for_vehicle(str(selected_vehicle.id))
+    render_history(selected_vehicle.id, history_key)
 
-    if not work_orders:
-        st.info("Aquest vehicle no té cap ordre de treball.")
-    else:
-        for order in sorted(work_orders, key=lambda o: o.start_date, reverse=True):
-            with st.container(border=True):
-                col1, col2, col3 = st.columns([3, 1, 1])
-                with col1:
-                    st.markdown(f"**{order.title}**")
-                    st.caption(f"Iniciada: {order.start_date.strftime('%Y-%m-%d')}")
-                    st.write(order.description)
-                with col2:
-                    if order.eta_is_tbd:
-                        st.metric("ETA", "TBD")
-                    elif order.eta:
-                        st.metric("ETA", order.eta.strftime('%Y-%m-%d'))
-                with col3:
-                    st.metric("Cost", f"{order.cost} €")
+end_page_run(page_run)
@@ -0,0 +1,70 @@
+import io
+import streamlit as st
+from src.bulk import IMPORTERS, export_url, format_from_path, write_export_file
+from src.i18n import TEXT
+from src.repository import STORAGE_BACKEND
+from src.scheduler import start_background_jobs
+from src.debug import end_page_run
+from src.metrics import start_page_run
+
+st.set_page_config(page_title=TEXT["bulk_page_title"], layout="wide")
+start_background_jobs()
+page_run = start_page_run("import_export")
+st.title(TEXT["bulk_title"])
+
+if STORAGE_BACKEND != "mongo":
+    # Bulk import and export stream straight to and from MongoDB collections.
+    st.info(TEXT["bulk_needs_mongo"])
+    end_page_run(page_run)
+    st.stop()
+
+collection_labels = {
+    "vehicles": TEXT["bulk_collection_vehicles"],
+    "work_orders": TEXT["bulk_collection_work_orders"],
+}
+collection = st.radio(
+    TEXT["bulk_collection_label"],
+    options=collection_labels.keys(),
+    format_func=collection_labels.get,
+    horizontal=True
+)
+
+# --- IMPORT ---
+st.subheader(TEXT["bulk_import_subheader"])
+uploaded_file = st.file_uploader(TEXT["bulk_import_help"], type=["csv", "jsonl", "ndjson"])
+
+if uploaded_file is not None and st.button(TEXT["bulk_import_button"], type="primary"):
+    # Wrap the upload so rows are decoded and validated as they are read.
+    stream = io.TextIOWrapper(uploaded_file, encoding="utf-8", newline="")
+    with st.spinner():
+        report = IMPORTERS[collection](stream, format_from_path(uploaded_file.name))
+
+    message = TEXT["bulk_import_result"].format(
+        processed=report.processed, inserted=report.inserted, errors=len(report.errors)
+    )
+    if report.errors:
+        st.warning(message)
+        st.write(TEXT["bulk_import_errors"])
+        st.dataframe([error.model_dump() for error in report.errors], use_container_width=True)
+    else:
+        st.success(message)
+
+# --- EXPORT ---
+st.divider()
+st.subheader(TEXT["bulk_export_subheader"])
+export_format = st.radio(TEXT["bulk_export_format"], options=["csv", "jsonl"], horizontal=True)
+
+if st.button(TEXT["bulk_export_prepare"]):
+    # Streamed from the cursor to a file, which the static file server sends from
+    # disk; st.download_button would hold the whole export in memory.
+    with st.spinner():
+        export_path, count = write_export_file(collection, export_format)
+
+    st.success(TEXT["bulk_export_result"].format(count=count))
+    label = TEXT["bulk_export_download"].format(filename=export_path.name)
+    st.markdown(
+        f'<a href="{export_url(export_path)}" download="{export_path.name}">{label}</a>',
+        unsafe_allow_html=True
+    )
+
+end_page_run(page_run)
@@ -0,0 +1,101 @@
+# src/alerts.py
+
+import csv
+import io
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from src.config import get_setting
+from src.models import ExpiryAlert, Vehicle
+from src.repository import repository
+
+# How far ahead upcoming ITV and road tax due dates are reported.
+EXPIRY_ALERT_DAYS = get_setting("EXPIRY_ALERT_DAYS", 30, int)
+# How long a lapsed ITV or road tax keeps being reported; older ones are left out.
+EXPIRY_LAPSED_DAYS = get_setting("EXPIRY_LAPSED_DAYS", 90, int)
+# Where the daily digest is written, one CSV per day.
+EXPIRY_DIGEST_DIR = get_setting("EXPIRY_DIGEST_DIR", "digests")
+
+DOCUMENTS = ("inspection_due", "tax_due")
+DIGEST_COLUMNS = ["due", "days_left", "document", "alias", "location", "vehicle_id"]
+
+
+def alert_cutoff(within_days: int = EXPIRY_ALERT_DAYS, today: Optional[date] = None) -> datetime:
+    """Start of the first day after the window: due dates before it are alerted on."""
+    today = today or date.today()
+    return datetime.combine(today + timedelta(days=within_days + 1), datetime.min.time())
+
+
+def lapsed_cutoff(lapsed_days: int = EXPIRY_LAPSED_DAYS, today: Optional[date] = None) -> datetime:
+    """Start of the oldest day still reported: due dates before it lapsed too long ago."""
+    today = today or date.today()
+    return datetime.combine(today - timedelta(days=lapsed_days), datetime.min.time())
+
+
+def alert_window(
+    within_days: int = EXPIRY_ALERT_DAYS, lapsed_days: int = EXPIRY_LAPSED_DAYS, today: Optional[date] = None
+) -> Tuple[datetime, datetime]:
+    """The (since, before) due-date range alerted on, as passed to get_expiring_vehicles."""
+    return lapsed_cutoff(lapsed_days, today), alert_cutoff(within_days, today)
+
+
+def expiry_alerts(
+    vehicles: Iterable[Vehicle],
+    within_days: int = EXPIRY_ALERT_DAYS,
+    today: Optional[date] = None,
+    lapsed_days: int = EXPIRY_LAPSED_DAYS,
+) -> List[ExpiryAlert]:
+    """
+    Turns the vehicles from get_expiring_vehicles into one alert per due date inside
+    the window, soonest first. A vehicle can have both its ITV and its tax due.
+    """
+    today = today or date.today()
+    since, cutoff = alert_window(within_days, lapsed_days, today)
+    alerts = []
+    for vehicle in vehicles:
+        for document in DOCUMENTS:
+            due = getattr(vehicle.documentation, document)
+            if since <= due < cutoff:
+                alerts.append(ExpiryAlert(
+                    vehicle_id=str(vehicle.id),
+                    alias=vehicle.alias,
+                    location=vehicle.location,
+                    document=document,
+                    due=due,
+                    days_left=(due.date() - today).days,
+                ))
+    alerts.sort(key=lambda alert: (alert.due, alert.alias))
+    return alerts
+
+
+def get_expiry_alerts(within_days: int = EXPIRY_ALERT_DAYS, lapsed_days: int = EXPIRY_LAPSED_DAYS) -> List[ExpiryAlert]:
+    """ITV and road tax due in the next `within_days` days, or lapsed in the last `lapsed_days`, soonest first."""
+    since, before = alert_window(within_days, lapsed_days)
+    return expiry_alerts(repository.get_expiring_vehicles(before, since), within_days, lapsed_days=lapsed_days)
+
+
+# --- DAILY DIGEST ---
+def digest_csv(alerts: Iterable[ExpiryAlert]) -> str:
+    """The alerts as CSV, as written to the daily digest and offered for download."""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=DIGEST_COLUMNS)
+    writer.writeheader()
+    for alert in alerts:
+        writer.writerow({**alert.model_dump(), "due": alert.due.date().isoformat()})
+    return out.getvalue()
+
+
+def write_expiry_digest(within_days: int = EXPIRY_ALERT_DAYS, directory: str = EXPIRY_DIGEST_DIR) -> Path:
+    """
+    Writes today's digest to `<directory>/expiry-<date>.csv` and returns its path.
+    The file is replaced atomically, so readers never see half a digest. Meant to run daily.
+    """
+    alerts = get_expiry_alerts(within_days)
+    path = Path(directory) / f"expiry-{date.today().isoformat()}.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".csv.tmp")
+    partial.write_text(digest_csv(alerts), encoding="utf-8")
+    os.replace(partial, path)
+    return path
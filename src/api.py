@@ -0,0 +1,314 @@
+# src/api.py
+
+import argparse
+import hmac
+import re
+import secrets
+import sys
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import orjson
+from bson import ObjectId
+
+from src.config import get_setting
+from src.database import VEHICLE_SORT_FIELDS, db_connection
+from src.live import fleet_state, fleet_watcher
+from src.metrics import finish_page_run, start_page_run
+from src.models import Vehicle, WorkOrder
+from src.repository import STORAGE_BACKEND, repository
+
+# Port of the read-only JSON API; 0 leaves it off.
+API_PORT = get_setting("API_PORT", 0, int)
+# When set, requests must send `Authorization: Bearer <token>`.
+API_TOKEN = get_setting("API_TOKEN", "")
+# Largest page a client can ask for with `limit`.
+API_MAX_PAGE_SIZE = get_setting("API_MAX_PAGE_SIZE", 200, int)
+API_DEFAULT_PAGE_SIZE = 50
+
+# Changes with every process, so ETags handed out before a restart never match
+# the versions counted after it.
+_EPOCH = secrets.token_hex(4)
+
+
+class ApiError(Exception):
+    """A request the API refuses; sent back as `{"error": message}` with `status`."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# --- JSON ---
+# The API's own layout rather than a model dump, so it reads the same for the
+# Pydantic models and the trusted-read records.
+def vehicle_json(vehicle: Vehicle) -> dict:
+    details = vehicle.non_running_details
+    totals = vehicle.work_order_totals
+    return {
+        "id": str(vehicle.id),
+        "alias": vehicle.alias,
+        "photo_url": vehicle.photo_url,
+        "condition": vehicle.condition,
+        "location": vehicle.location,
+        "is_available": vehicle.is_available,
+        "next_expiry": vehicle.next_expiry,
+        "documentation": {
+            "inspection_due": vehicle.documentation.inspection_due,
+            "tax_due": vehicle.documentation.tax_due,
+        },
+        "non_running_details": {
+            "explanation": details.explanation,
+            "estimated_budget": details.estimated_budget,
+            "eta": details.eta,
+        } if details else None,
+        "work_order_totals": {
+            "open_orders": totals.open_orders,
+            "open_cost": totals.open_cost,
+            "total_cost": totals.total_cost,
+            "last_service_date": totals.last_service_date,
+        },
+    }
+
+
+def work_order_json(order: WorkOrder) -> dict:
+    return {
+        "id": str(order.id),
+        "vehicle_id": str(order.vehicle_id),
+        "title": order.title,
+        "description": order.description,
+        "cost": order.cost,
+        "start_date": order.start_date,
+        "completion_date": order.completion_date,
+        "eta": order.eta,
+        "eta_is_tbd": order.eta_is_tbd,
+        "tasks": order.tasks,
+        "is_complete": order.is_complete,
+        "is_archived": order.is_archived,
+    }
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+
+def dumps(payload) -> bytes:
+    """orjson handles datetimes and enums natively; ObjectIds become strings."""
+    return orjson.dumps(payload, default=_default)
+
+
+# --- QUERY PARAMETERS ---
+def _param(params: Dict[str, List[str]], name: str) -> Optional[str]:
+    values = params.get(name)
+    return values[-1] if values else None
+
+
+def _bool_param(params: Dict[str, List[str]], name: str) -> Optional[bool]:
+    value = _param(params, name)
+    if value is None:
+        return None
+    if value.lower() in ("1", "true"):
+        return True
+    if value.lower() in ("0", "false"):
+        return False
+    raise ApiError(400, f"'{name}' must be true or false.")
+
+
+def _limit_param(params: Dict[str, List[str]]) -> int:
+    value = _param(params, "limit")
+    if value is None:
+        return API_DEFAULT_PAGE_SIZE
+    if not value.isdigit() or not 1 <= int(value) <= API_MAX_PAGE_SIZE:
+        raise ApiError(400, f"'limit' must be between 1 and {API_MAX_PAGE_SIZE}.")
+    return int(value)
+
+
+# --- ROUTES ---
+def list_vehicles(params: Dict[str, List[str]]) -> dict:
+    sort = _param(params, "sort") or "alias"
+    if sort not in VEHICLE_SORT_FIELDS:
+        raise ApiError(400, f"Cannot sort vehicles by '{sort}'.")
+    page = repository.find_vehicles(
+        condition=_param(params, "condition"),
+        location=_param(params, "location"),
+        available=_bool_param(params, "available"),
+        sort=sort,
+        descending=bool(_bool_param(params, "descending")),
+        limit=_limit_param(params),
+        cursor=_param(params, "cursor"),
+        with_total=bool(_bool_param(params, "total")),
+    )
+    return {"items": [vehicle_json(vehicle) for vehicle in page.items], "next_cursor": page.next_cursor, "total": page.total}
+
+
+def get_vehicle(params: Dict[str, List[str]], vehicle_id: str) -> dict:
+    vehicle = repository.get_vehicle(vehicle_id)
+    if vehicle is None:
+        raise ApiError(404, "Vehicle not found.")
+    return vehicle_json(vehicle)
+
+
+def list_work_orders(params: Dict[str, List[str]], vehicle_id: str) -> dict:
+    cursor = _param(params, "cursor")
+    page = repository.get_work_orders_page(vehicle_id, limit=_limit_param(params), cursor=cursor)
+    if not page.items and not cursor and repository.get_vehicle(vehicle_id) is None:
+        raise ApiError(404, "Vehicle not found.")
+    return {"items": [work_order_json(order) for order in page.items], "next_cursor": page.next_cursor}
+
+
+def read(view: Callable[..., dict], params: Dict[str, List[str]], path_args: Dict[str, str]) -> dict:
+    """
+    Runs a view, timed like a page run. The repository answers failures with empty
+    results, so a view whose calls recorded an error is turned into a 503 rather
+    than an empty list, or a 404, that could be cached.
+    """
+    run = start_page_run(f"api.{view.__name__}")
+    try:
+        try:
+            payload = view(params, **path_args)
+        except ApiError:
+            if not any(call.errors for call in run.calls):
+                raise
+        if any(call.errors for call in run.calls):
+            raise ApiError(503, "The fleet database could not be read; try again later.")
+        return payload
+    finally:
+        finish_page_run(run)
+
+
+# (path, collection the response is built from, view)
+ROUTES: List[Tuple[re.Pattern, str, Callable[..., dict]]] = [
+    (re.compile(r"/vehicles"), "vehicles", list_vehicles),
+    (re.compile(r"/vehicles/(?P<vehicle_id>[0-9a-f]{24})"), "vehicles", get_vehicle),
+    (re.compile(r"/vehicles/(?P<vehicle_id>[0-9a-f]{24})/work_orders"), "work_orders", list_work_orders),
+]
+
+
+# --- ETAGS ---
+def versions_are_current() -> bool:
+    """
+    Whether the fleet state has seen every write, so its versions can tag responses.
+    The sqlite backend records its own writes; with MongoDB it takes a running live
+    watcher and a reachable server. Otherwise responses go out without an ETag.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        return True
+    return fleet_watcher.mode in ("change_stream", "polling") and not repository.status()["degraded"]
+
+
+def current_etag(collection: str) -> str:
+    """
+    Strong ETag of every response built from `collection`. The date is part of it
+    because availability is computed against today.
+    """
+    return f'"{_EPOCH}-{date.today().toordinal()}-{fleet_state.collection_versions[collection]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            if API_TOKEN and not hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {API_TOKEN}"):
+                raise ApiError(401, "Missing or wrong API token.")
+            if url.path == "/status":
+                self._send_json(200, {**repository.status(), "etags": versions_are_current()})
+                return
+            for pattern, collection, view in ROUTES:
+                match = pattern.fullmatch(url.path)
+                if match:
+                    break
+            else:
+                raise ApiError(404, "Not found.")
+
+            # The version is read before the data: a write racing the read can only
+            # make the client fetch again, never keep a stale copy.
+            etag = current_etag(collection) if versions_are_current() else None
+            if etag and etag_matches(self.headers.get("If-None-Match"), etag):
+                self.send_response(304)
+                self._send_cache_headers(etag)
+                self.end_headers()
+                return
+            payload = read(view, parse_qs(url.query), match.groupdict())
+            if etag and not versions_are_current():
+                etag = None
+            self._send_json(200, payload, etag)
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            print(f"An error occurred while serving {url.path}: {e}")
+            self._send_json(500, {"error": "Internal error."})
+
+    def _send_cache_headers(self, etag: Optional[str]) -> None:
+        if etag:
+            self.send_header("ETag", etag)
+        # Clients may keep a copy but must revalidate it on every request.
+        self.send_header("Cache-Control", "no-cache")
+
+    def _send_json(self, status: int, payload, etag: Optional[str] = None) -> None:
+        body = dumps(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 200:
+            self._send_cache_headers(etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_api_server(port: int = API_PORT) -> None:
+    """Serves the JSON API on `port` from a daemon thread, once per process. A port of 0 disables it."""
+    global _server
+    if not port:
+        return
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _ApiHandler)
+        except OSError as e:
+            print(f"❌ Could not start the JSON API on port {port}: {e}")
+            _server = False
+            return
+        threading.Thread(target=_server.serve_forever, name="api-http", daemon=True).start()
+        print(f"🔌 JSON API available at http://0.0.0.0:{port}/vehicles")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.api", description="Serves the read-only fleet JSON API.")
+    parser.add_argument("--port", type=int, default=API_PORT or 8080)
+    args = parser.parse_args(argv)
+
+    if STORAGE_BACKEND != "mongo":
+        # Another process would not see the app's writes to the sqlite file.
+        print("The sqlite backend serves the API from the app itself; set API_PORT instead.", file=sys.stderr)
+        return 1
+    db_connection.start()
+    fleet_watcher.start()
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), _ApiHandler)
+    print(f"🔌 JSON API available at http://0.0.0.0:{args.port}/vehicles")
+    server.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
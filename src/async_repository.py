@@ -0,0 +1,46 @@
+# src/async_repository.py
+
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, List
+
+from src.repository import FleetRepository, repository
+
+
+class AsyncRepository:
+    """
+    Awaitable versions of every FleetRepository method. Each call runs the blocking
+    method in a worker thread (asyncio.to_thread), so independent queries issued
+    together take about as long as the slowest of them. The thread inherits the
+    caller's context, so calls still show up in the page's metrics.
+
+    pymongo's connection pool serves concurrent calls in parallel; the sqlite
+    backend answers them one at a time behind its lock.
+    """
+
+    def __init__(self, repository: FleetRepository):
+        self._repository = repository
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        method = getattr(self._repository, name)
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+async_repository = AsyncRepository(repository)
+
+
+def run_concurrently(*calls: Awaitable) -> List[Any]:
+    """
+    Awaits the given calls together from synchronous code, such as a page script,
+    and returns their results in the same order. Async code should await
+    asyncio.gather directly instead.
+    """
+    async def gather():
+        return await asyncio.gather(*calls)
+
+    return asyncio.run(gather())
@@ -0,0 +1,347 @@
+# src/bulk.py
+
+import argparse
+import csv
+import secrets
+import shutil
+import sys
+import time
+from datetime import datetime
+from itertools import chain, islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, TextIO, Tuple, Type, Union
+
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.database import db_connection, utc_now, vehicle_cache
+from src.models import ImportReport, RowError, Vehicle, WorkOrder, WorkOrderTotals
+
+BATCH_SIZE = 1000
+
+# Exports offered for download are written under Streamlit's static folder, which
+# serves them from disk in chunks (server.enableStaticServing in .streamlit/config.toml).
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+EXPORT_DIR = STATIC_DIR / "exports"
+EXPORT_RETENTION_SECONDS = 3600
+
+# Flat CSV columns; nested fields use dotted names and lists are joined with "|".
+VEHICLE_COLUMNS = [
+    "_id",
+    "alias",
+    "photo_url",
+    "condition",
+    "location",
+    "documentation.inspection_due",
+    "documentation.tax_due",
+    "non_running_details.explanation",
+    "non_running_details.estimated_budget",
+    "non_running_details.eta",
+]
+
+WORK_ORDER_COLUMNS = [
+    "_id",
+    "vehicle_id",
+    "title",
+    "description",
+    "cost",
+    "start_date",
+    "completion_date",
+    "eta",
+    "eta_is_tbd",
+    "tasks",
+    "is_complete",
+]
+
+LIST_SEPARATOR = "|"
+OBJECT_ID_FIELDS = ("_id", "vehicle_id")
+
+
+# --- READING ---
+def _unflatten(row: dict) -> dict:
+    """Turns a CSV row with dotted column names into a nested document."""
+    doc = {}
+    for key, value in row.items():
+        if key is None or value is None or value == "":
+            continue
+        if key == "tasks":
+            value = [task for task in value.split(LIST_SEPARATOR) if task]
+        target = doc
+        *parents, leaf = key.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+    return doc
+
+
+def _coerce_ids(doc: dict) -> dict:
+    for field in OBJECT_ID_FIELDS:
+        if isinstance(doc.get(field), str):
+            doc[field] = ObjectId(doc[field])
+    return doc
+
+
+def read_rows(stream: TextIO, file_format: str) -> Iterator[Tuple[int, Union[dict, str]]]:
+    """
+    Yields (row number, raw row) pairs from a CSV or JSONL stream, one at a time.
+    JSONL lines are parsed later so a malformed line is reported as a row error.
+    """
+    if file_format == "csv":
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            yield row_number, _unflatten(row)
+    elif file_format == "jsonl":
+        row_number = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            row_number += 1
+            yield row_number, line
+    else:
+        raise ValueError(f"Unsupported format '{file_format}'.")
+
+
+def _batches(rows: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _validate_batch(model: Type[BaseModel], batch: List[Tuple[int, dict]], report: ImportReport) -> List[Tuple[int, dict]]:
+    valid = []
+    for row_number, raw in batch:
+        report.processed += 1
+        try:
+            if isinstance(raw, str):
+                raw = json_util.loads(raw)
+            if not isinstance(raw, dict):
+                raise TypeError(f"Expected a JSON object, got {type(raw).__name__}.")
+            doc = model.model_validate(_coerce_ids(raw)).model_dump(by_alias=True)
+            doc["updated_at"] = utc_now()
+            valid.append((row_number, doc))
+        except (ValidationError, ValueError, TypeError, InvalidId) as e:
+            report.errors.append(RowError(row=row_number, message=str(e)))
+    return valid
+
+
+def _insert_batch(collection, valid: List[Tuple[int, dict]], report: ImportReport) -> List[dict]:
+    """Inserts the batch unordered and returns the documents that made it in."""
+    if not valid:
+        return []
+    try:
+        result = collection.insert_many([doc for _, doc in valid], ordered=False)
+        report.inserted += len(result.inserted_ids)
+        return [doc for _, doc in valid]
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        report.inserted += e.details.get("nInserted", len(valid) - len(write_errors))
+        for error in write_errors:
+            report.errors.append(RowError(row=valid[error["index"]][0], message=error.get("errmsg", "")))
+        failed = {error["index"] for error in write_errors}
+        return [doc for index, (_, doc) in enumerate(valid) if index not in failed]
+
+
+def _add_to_work_order_totals(orders: List[dict]) -> None:
+    """
+    Adds imported work orders to their vehicles' totals with one $inc/$max update
+    per vehicle, as add_work_order does for a single order.
+    """
+    updates = {}
+    for order in orders:
+        update = updates.setdefault(order["vehicle_id"], {
+            "$inc": {"work_order_totals.total_cost": 0.0, "work_order_totals.open_orders": 0, "work_order_totals.open_cost": 0.0},
+            "$max": {},
+        })
+        update["$inc"]["work_order_totals.total_cost"] += order["cost"]
+        if not order["is_complete"]:
+            update["$inc"]["work_order_totals.open_orders"] += 1
+            update["$inc"]["work_order_totals.open_cost"] += order["cost"]
+        elif order["completion_date"]:
+            last = update["$max"].get("work_order_totals.last_service_date")
+            if last is None or order["completion_date"] > last:
+                update["$max"]["work_order_totals.last_service_date"] = order["completion_date"]
+    operations = []
+    for vehicle_id, update in updates.items():
+        if not update["$max"]:
+            del update["$max"]
+        operations.append(UpdateOne({"_id": vehicle_id}, {**update, "$set": {"updated_at": utc_now()}}))
+    if operations:
+        db_connection.vehicle_collection.bulk_write(operations, ordered=False)
+
+
+def import_vehicles(stream: TextIO, file_format: str, batch_size: int = BATCH_SIZE) -> ImportReport:
+    """Streams vehicles from CSV/JSONL, validating and inserting them in unordered batches."""
+    report = ImportReport()
+    try:
+        collection = db_connection.vehicle_collection
+        for batch in _batches(read_rows(stream, file_format), batch_size):
+            valid = _validate_batch(Vehicle, batch, report)
+            # Totals are built by the work-order import; an exported vehicle still
+            # carries its own, which would be counted twice on the way back in.
+            for _, doc in valid:
+                doc["work_order_totals"] = WorkOrderTotals().model_dump()
+            _insert_batch(collection, valid, report)
+    except Exception as e:
+        print(f"An error occurred while importing vehicles: {e}")
+        report.errors.append(RowError(row=report.processed + 1, message=str(e)))
+    finally:
+        if report.inserted:
+            vehicle_cache.invalidate()
+    report.errors.sort(key=lambda error: error.row)
+    return report
+
+
+def import_work_orders(stream: TextIO, file_format: str, batch_size: int = BATCH_SIZE) -> ImportReport:
+    """Streams work orders from CSV/JSONL; orders pointing to unknown vehicles are rejected."""
+    report = ImportReport()
+    try:
+        collection = db_connection.db["work_orders"]
+        for batch in _batches(read_rows(stream, file_format), batch_size):
+            valid = _validate_batch(WorkOrder, batch, report)
+            # One lookup per batch to check that the referenced vehicles exist.
+            vehicle_ids = list({doc["vehicle_id"] for _, doc in valid})
+            known_ids = {
+                doc["_id"] for doc in db_connection.vehicle_collection.find({"_id": {"$in": vehicle_ids}}, {"_id": 1})
+            }
+            existing = []
+            for row_number, doc in valid:
+                if doc["vehicle_id"] in known_ids:
+                    existing.append((row_number, doc))
+                else:
+                    report.errors.append(RowError(row=row_number, message=f"Unknown vehicle_id {doc['vehicle_id']}"))
+            _add_to_work_order_totals(_insert_batch(collection, existing, report))
+    except Exception as e:
+        print(f"An error occurred while importing work orders: {e}")
+        report.errors.append(RowError(row=report.processed + 1, message=str(e)))
+    finally:
+        if report.inserted:
+            vehicle_cache.invalidate()
+    report.errors.sort(key=lambda error: error.row)
+    return report
+
+
+# --- WRITING ---
+def _flatten(doc: dict, prefix: str = "") -> dict:
+    """Turns a nested document into a flat row with dotted column names."""
+    row = {}
+    for key, value in doc.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            row.update(_flatten(value, prefix=f"{name}."))
+        elif isinstance(value, list):
+            row[name] = LIST_SEPARATOR.join(str(item) for item in value)
+        elif isinstance(value, datetime):
+            row[name] = value.isoformat()
+        elif isinstance(value, ObjectId):
+            row[name] = str(value)
+        else:
+            row[name] = value
+    return row
+
+
+def _export(cursors: list, out: TextIO, file_format: str, columns: List[str]) -> int:
+    cursor = chain.from_iterable(cursors)
+    count = 0
+    if file_format == "csv":
+        writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for doc in cursor:
+            writer.writerow(_flatten(doc))
+            count += 1
+    elif file_format == "jsonl":
+        for doc in cursor:
+            out.write(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS))
+            out.write("\n")
+            count += 1
+    else:
+        raise ValueError(f"Unsupported format '{file_format}'.")
+    return count
+
+
+def export_vehicles(out: TextIO, file_format: str, batch_size: int = BATCH_SIZE) -> int:
+    """Streams every vehicle to CSV/JSONL straight from a batched cursor. Returns the row count."""
+    return _export([db_connection.vehicle_collection.find().batch_size(batch_size)], out, file_format, VEHICLE_COLUMNS)
+
+
+def export_work_orders(out: TextIO, file_format: str, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Streams every work order to CSV/JSONL straight from batched cursors. Returns the row count.
+    Archived orders are exported in full from the archive instead of as their summaries.
+    """
+    db = db_connection.db
+    cursors = [
+        db["work_orders"].find({"is_archived": {"$ne": True}}).batch_size(batch_size),
+        db["work_orders_archive"].find().batch_size(batch_size),
+    ]
+    return _export(cursors, out, file_format, WORK_ORDER_COLUMNS)
+
+
+# --- CLI ---
+IMPORTERS = {"vehicles": import_vehicles, "work_orders": import_work_orders}
+EXPORTERS = {"vehicles": export_vehicles, "work_orders": export_work_orders}
+
+
+# --- DOWNLOADS ---
+def _remove_old_exports() -> None:
+    if not EXPORT_DIR.exists():
+        return
+    cutoff = time.time() - EXPORT_RETENTION_SECONDS
+    for directory in EXPORT_DIR.iterdir():
+        if directory.stat().st_mtime < cutoff:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def write_export_file(collection: str, file_format: str) -> Tuple[Path, int]:
+    """
+    Streams an export to a file under EXPORT_DIR, in a directory with an unguessable
+    name, and returns its path and row count. Exports older than an hour are removed.
+    """
+    _remove_old_exports()
+    directory = EXPORT_DIR / secrets.token_urlsafe(16)
+    directory.mkdir(parents=True)
+    path = directory / f"{collection}.{file_format}"
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        count = EXPORTERS[collection](out, file_format)
+    return path, count
+
+
+def export_url(path: Path) -> str:
+    """Relative URL of an export file on Streamlit's static file server."""
+    return "app/static/" + path.relative_to(STATIC_DIR).as_posix()
+
+
+def format_from_path(path: str) -> str:
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.bulk", description="Bulk import/export of fleet data.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("collection", choices=sorted(IMPORTERS))
+    parser.add_argument("path", help="CSV or JSONL file; use '-' for stdin/stdout.")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    file_format = args.format or format_from_path(args.path)
+
+    if args.action == "import":
+        stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+        with stream:
+            report = IMPORTERS[args.collection](stream, file_format, batch_size=args.batch_size)
+        print(f"Processed {report.processed} rows, inserted {report.inserted}, {len(report.errors)} errors.")
+        for error in report.errors:
+            print(f"  row {error.row}: {error.message}", file=sys.stderr)
+        return 1 if report.errors else 0
+
+    out = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+    with out:
+        count = EXPORTERS[args.collection](out, file_format, batch_size=args.batch_size)
+    print(f"Exported {count} {args.collection}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# src/cache.py
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class SnapshotCache:
+    """
+    Process-wide snapshot of a collection, keyed by document id.
+    Shared by every Streamlit session: the snapshot is loaded once, served until
+    its TTL runs out, and patched or invalidated by the write functions.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._items is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    def get(self, loader: Callable[[], Dict[str, Any]]) -> List[Any]:
+        """Returns the cached items, calling `loader` only when the snapshot is missing or stale."""
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return list(self._items.values())
+
+        # Only one session reloads; the others wait and then read its result.
+        with self._load_lock:
+            with self._lock:
+                if self._is_fresh():
+                    self.hits += 1
+                    return list(self._items.values())
+                self.misses += 1
+                version_before_load = self.version
+
+            items = loader()
+
+            with self._lock:
+                # A write that landed while we were loading makes this result stale.
+                if self.version == version_before_load:
+                    self._items = items
+                    self._loaded_at = time.monotonic()
+            return list(items.values())
+
+    def put(self, key: str, item: Any) -> None:
+        """Inserts or replaces a single item in the snapshot."""
+        with self._lock:
+            self.version += 1
+            if self._items is not None:
+                self._items[key] = item
+
+    def remove(self, key: str) -> None:
+        """Removes a single item from the snapshot."""
+        with self._lock:
+            self.version += 1
+            if self._items is not None:
+                self._items.pop(key, None)
+
+    def invalidate(self) -> None:
+        """Drops the snapshot so the next read reloads it."""
+        with self._lock:
+            self.version += 1
+            self._items = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._items) if self._items is not None else 0,
+                "age_seconds": time.monotonic() - self._loaded_at if self._items is not None else None,
+            }
+
+
+class TTLCache:
+    """Small process-wide cache of computed values, each kept for a fixed number of seconds."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._values: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            self._values[key] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._values)}
@@ -0,0 +1,29 @@
+# src/config.py
+
+import os
+from typing import Any, Callable, Optional
+
+import streamlit as st
+
+_REQUIRED = object()
+_TRUE_STRINGS = {"1", "true", "yes", "on"}
+
+
+def get_setting(name: str, default: Any = _REQUIRED, cast: Optional[Callable[[Any], Any]] = None) -> Any:
+    """
+    Reads a setting from the environment first, then from st.secrets.
+    Environment variables let the CLI and the benchmarks run without a secrets.toml.
+    Raises KeyError for a missing setting that has no default.
+    """
+    value = os.environ.get(name)
+    if value is None:
+        try:
+            value = st.secrets[name]
+        except Exception:
+            # Missing key, or no secrets.toml at all.
+            if default is _REQUIRED:
+                raise KeyError(f"Missing required setting '{name}'.")
+            value = default
+    if cast is bool and isinstance(value, str):
+        return value.strip().lower() in _TRUE_STRINGS
+    return cast(value) if cast is not None and value is not None else value
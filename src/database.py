@@ -1,108 +1,1044 @@
-import os
+import base64
+import re
+import threading
+import time
 import pymongo
-import streamlit as st
-from typing import List, Optional
-from bson import ObjectId
-from src.models import Vehicle, WorkOrder # <-- Ensure WorkOrder is imported here
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+from src.cache import SnapshotCache
+from src.config import get_setting
+from src.snapshot import LocalSnapshot
+from src.metrics import command_listener, instrumented, record_error, register_collector
+from src.models import BulkUpdateReport, Page, Vehicle, VehicleCondition, VehicleRecord, VehicleRef, VehicleUpdateResult, WorkOrder, WorkOrderRecord, WorkOrderTotals # <-- Ensure WorkOrder is imported here
 
-# Get secrets using st.secrets
-MONGO_URI = st.secrets["MONGO_URI"]
-DATABASE_NAME = st.secrets["DATABASE_NAME"]
+# Settings come from the environment or st.secrets (see src/config.py)
+# Only required with the MongoDB storage backend (see src/repository.py); nothing connects at import.
+MONGO_URI = get_setting("MONGO_URI", None)
+DATABASE_NAME = get_setting("DATABASE_NAME", None)
+MONGO_MAX_POOL_SIZE = get_setting("MONGO_MAX_POOL_SIZE", 50, int)
+MONGO_MIN_POOL_SIZE = get_setting("MONGO_MIN_POOL_SIZE", 0, int)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = get_setting("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000, int)
+MONGO_CONNECT_TIMEOUT_MS = get_setting("MONGO_CONNECT_TIMEOUT_MS", 5000, int)
+MONGO_SOCKET_TIMEOUT_MS = get_setting("MONGO_SOCKET_TIMEOUT_MS", 30000, int)
+MONGO_HEALTH_CHECK_SECONDS = get_setting("MONGO_HEALTH_CHECK_SECONDS", 30, float)
+MONGO_RECONNECT_AFTER_FAILURES = get_setting("MONGO_RECONNECT_AFTER_FAILURES", 3, int)
+VEHICLE_CACHE_TTL_SECONDS = get_setting("VEHICLE_CACHE_TTL_SECONDS", 300, float)
+WORK_ORDER_ARCHIVE_AFTER_DAYS = get_setting("WORK_ORDER_ARCHIVE_AFTER_DAYS", 365, float)
+# Local copy of the fleet served while MongoDB is unreachable; an empty path disables it.
+LOCAL_SNAPSHOT_PATH = get_setting("LOCAL_SNAPSHOT_PATH", f".cache/{DATABASE_NAME}.snapshot.sqlite3" if DATABASE_NAME else "")
+DELETION_RETENTION_SECONDS = 7 * 24 * 3600
+# Documents are validated on write, so reads may skip validation and return the
+# lightweight VehicleRecord/WorkOrderRecord types instead when this is enabled.
+TRUSTED_READS = get_setting("TRUSTED_READS", False, bool)
+
+def ensure_indexes(db) -> None:
+    """Creates the indexes the query functions rely on. Safe to call on every startup."""
+    vehicles = db["vehicles"]
+    # Every sortable field has a (field, _id) index, matching the sort and cursor of
+    # find_vehicles, so pages are read off the index instead of sorted in memory.
+    # The alias index also carries location, so the vehicle selectors are covered queries.
+    vehicles.create_index([("alias", pymongo.ASCENDING), ("_id", pymongo.ASCENDING), ("location", pymongo.ASCENDING)])
+    vehicles.create_index([("location", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+    vehicles.create_index([("condition", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+    # Filtered by location or condition and listed by alias, as the selectors do.
+    vehicles.create_index([("location", pymongo.ASCENDING), ("alias", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+    vehicles.create_index([("condition", pymongo.ASCENDING), ("alias", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+    vehicles.create_index([("documentation.inspection_due", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+    vehicles.create_index([("documentation.tax_due", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+    vehicles.create_index([("is_available", pymongo.ASCENDING), ("alias", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+    vehicles.create_index([("next_expiry", pymongo.ASCENDING)])
+
+    work_orders = db["work_orders"]
+    work_orders.create_index([("is_complete", pymongo.ASCENDING), ("vehicle_id", pymongo.ASCENDING)])
+    work_orders.create_index([("vehicle_id", pymongo.ASCENDING), ("start_date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)])
+    work_orders.create_index([("is_archived", pymongo.ASCENDING), ("completion_date", pymongo.ASCENDING)])
+    db["work_orders_archive"].create_index(
+        [("vehicle_id", pymongo.ASCENDING), ("start_date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
+    )
+
+    # updated_at and the deletion tombstones let the live watcher poll for changes
+    # on servers without change streams.
+    vehicles.create_index([("updated_at", pymongo.ASCENDING)])
+    work_orders.create_index([("updated_at", pymongo.ASCENDING)])
+    db["deletions"].create_index([("deleted_at", pymongo.ASCENDING)], expireAfterSeconds=DELETION_RETENTION_SECONDS)
 
 class DatabaseConnection:
+    """
+    The single MongoClient shared by every session in this process.
+
+    Nothing touches the network at import time: the client is created on first
+    use with `connect=False`, and the driver's pool handles connections and
+    reconnects. A background thread pings the server, creates the indexes once
+    it is reachable, and rebuilds the client after repeated failures. While the
+    last health check has failed, `db` raises immediately instead of making every
+    caller wait for the server selection timeout.
+    """
+
     def __init__(self):
-        self.client = None
-        self.db = None
-        self.vehicle_collection = None
+        self._client = None
+        self.database_name = DATABASE_NAME
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._indexes_ready = False
+        self.healthy: Optional[bool] = None
+        self.last_error: Optional[str] = None
+        # Called from the health thread after every successful check.
+        self.after_health_check: List[Callable[[], object]] = []
+
+    def _create_client(self) -> pymongo.MongoClient:
+        if MONGO_URI is None or self.database_name is None:
+            raise KeyError("The mongo storage backend needs the MONGO_URI and DATABASE_NAME settings.")
+        return pymongo.MongoClient(
+            MONGO_URI,
+            connect=False,
+            appname="fleet-status",
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            event_listeners=[command_listener],
+        )
+
+    @property
+    def client(self) -> pymongo.MongoClient:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+                    self._start_health_checks()
+        return self._client
+
+    @property
+    def db(self):
+        client = self.client
+        if self.healthy is False:
+            raise ServerSelectionTimeoutError(f"Database unavailable: {self.last_error}")
+        return client[self.database_name]
+
+    @property
+    def vehicle_collection(self):
+        return self.db["vehicles"]
+
+    def start(self) -> None:
+        """Creates the client and starts the health checks without waiting on the network."""
+        self.client
+
+    def use_client(self, client, database_name: Optional[str] = None) -> None:
+        """Points the shared connection at an existing client, e.g. an in-memory stand-in for benchmarks."""
+        with self._lock:
+            self._client = client
+            self.database_name = database_name or self.database_name
+            self._indexes_ready = False
+            self._start_health_checks()
+
+    def reconnect(self) -> None:
+        """Swaps in a fresh client and closes the old one."""
+        with self._lock:
+            old_client, self._client = self._client, self._create_client()
+        if old_client is not None:
+            old_client.close()
+
+    def check_health(self) -> bool:
         try:
-            self.client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-            self.client.admin.command('ping')
-            self.db = self.client[DATABASE_NAME]
-            self.vehicle_collection = self.db["vehicles"]
-            print("✅ Database connection successful.")
+            self.client.admin.command("ping")
+            if not self._indexes_ready:
+                ensure_indexes(self.client[self.database_name])
+                self._indexes_ready = True
+            if not self.healthy:
+                print("✅ Database connection successful.")
+            self.healthy = True
+            self.last_error = None
         except Exception as e:
-            print(f"❌ Database connection failed: {e}")
+            if self.healthy is not False:
+                print(f"❌ Database connection failed: {e}")
+            self.healthy = False
+            self.last_error = str(e)
+        if self.healthy:
+            for callback in self.after_health_check:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"❌ Post health-check task failed: {e}")
+        return self.healthy
+
+    def _health_loop(self) -> None:
+        failures = 0
+        while True:
+            if self.check_health():
+                failures = 0
+                time.sleep(MONGO_HEALTH_CHECK_SECONDS)
+            else:
+                failures += 1
+                if failures >= MONGO_RECONNECT_AFTER_FAILURES:
+                    self.reconnect()
+                    failures = 0
+                # Retry quickly so callers stop failing fast soon after the server is back.
+                time.sleep(min(MONGO_HEALTH_CHECK_SECONDS, 2))
+
+    def _start_health_checks(self) -> None:
+        if self._health_thread is None:
+            self._health_thread = threading.Thread(target=self._health_loop, name="mongo-health", daemon=True)
+            self._health_thread.start()
+
+    def status(self) -> dict:
+        return {"healthy": self.healthy, "last_error": self.last_error, "indexes_ready": self._indexes_ready}
 
 db_connection = DatabaseConnection()
+register_collector("database", db_connection.status)
+
+def get_connection_status() -> dict:
+    """Returns the result of the last background health check, and whether reads are degraded."""
+    return {**db_connection.status(), "degraded": serving_from_snapshot(), "snapshot": local_snapshot.status()}
+
+# Shared by every session in this process; the write functions below keep it current.
+vehicle_cache = SnapshotCache(ttl_seconds=VEHICLE_CACHE_TTL_SECONDS)
+register_collector("vehicle_cache", vehicle_cache.stats)
+
+def get_vehicle_cache_stats() -> dict:
+    """Returns the hit/miss counters and version of the shared vehicle snapshot."""
+    return vehicle_cache.stats()
+
+def utc_now() -> datetime:
+    """Timestamp written to `updated_at` on every change."""
+    return datetime.now(timezone.utc)
+
+# --- LOCAL SNAPSHOT ---
+local_snapshot = LocalSnapshot(Path(LOCAL_SNAPSHOT_PATH) if LOCAL_SNAPSHOT_PATH else None)
+register_collector("local_snapshot", lambda: {
+    key: value for key, value in local_snapshot.status().items() if key != "last_synced_at"
+})
+# Re-read this much history on incremental syncs, for clock skew and in-flight writes.
+SNAPSHOT_SYNC_OVERLAP = timedelta(seconds=5)
+
+def serving_from_snapshot() -> bool:
+    """
+    Reads fall back to the local snapshot while the database is down, and at startup
+    until the first health check has reached it, so pages never wait on a dead server.
+    """
+    return db_connection.healthy is not True and local_snapshot.has_data()
+
+def sync_local_snapshot() -> None:
+    """
+    Brings the local snapshot up to date: fully on the first run, or when it is older
+    than the deletion tombstones, and incrementally from `updated_at` otherwise.
+    Runs after every successful health check, so it also catches up after an outage.
+    """
+    if not local_snapshot.enabled:
+        return
+    db = db_connection.db
+    started = utc_now()
+    local_snapshot.has_data()  # reads the file, and its sync time, on first use
+    since = local_snapshot.last_synced_at
+    if since is None or started - since > timedelta(seconds=DELETION_RETENTION_SECONDS):
+        local_snapshot.replace(db["vehicles"].find(), db["work_orders"].find({"is_complete": False}), started)
+        return
+    since -= SNAPSHOT_SYNC_OVERLAP
+    local_snapshot.apply(
+        db["vehicles"].find({"updated_at": {"$gte": since}}),
+        [str(doc["doc_id"]) for doc in db["deletions"].find({"collection": "vehicles", "deleted_at": {"$gte": since}})],
+        db["work_orders"].find({"updated_at": {"$gte": since}}),
+        started,
+    )
+
+db_connection.after_health_check.append(sync_local_snapshot)
+
+def _snapshot_sort_key(field: str):
+    return lambda doc: (_get_field(doc, field), doc["_id"])
+
+# --- DECODING ---
+def vehicle_from_doc(doc: dict) -> Vehicle:
+    return VehicleRecord.from_doc(doc) if TRUSTED_READS else Vehicle.model_validate(doc)
+
+def work_order_from_doc(doc: dict) -> WorkOrder:
+    return WorkOrderRecord.from_doc(doc) if TRUSTED_READS else WorkOrder.model_validate(doc)
 
 # --- VEHICLE FUNCTIONS ---
+def _load_all_vehicles() -> dict:
+    vehicles_cursor = db_connection.vehicle_collection.find()
+    return {str(doc["_id"]): vehicle_from_doc(doc) for doc in vehicles_cursor}
+
+@instrumented("db.get_all_vehicles")
 def get_all_vehicles() -> List[Vehicle]:
-    """Fetches all vehicles from the database."""
+    """Fetches all vehicles, served from the shared snapshot when it is fresh."""
     try:
-        vehicles_cursor = db_connection.vehicle_collection.find()
-        vehicle_list = []
-        for doc in vehicles_cursor:
-            vehicle_list.append(Vehicle.model_validate(doc))
-        return vehicle_list
+        if serving_from_snapshot():
+            return [vehicle_from_doc(doc) for doc in local_snapshot.vehicles()]
+        return vehicle_cache.get(_load_all_vehicles)
     except Exception as e:
+        record_error()
         print(f"An error occurred while fetching vehicles: {e}")
         return []
 
+# --- VEHICLE QUERIES ---
+VEHICLE_SORT_FIELDS = (
+    "alias",
+    "location",
+    "condition",
+    "documentation.inspection_due",
+    "documentation.tax_due",
+)
+
+def _get_field(doc: dict, path: str):
+    for part in path.split("."):
+        doc = doc[part]
+    return doc
+
+def _encode_cursor(sort_field: str, descending: bool, doc: dict) -> str:
+    payload = {"s": sort_field, "d": descending, "v": _get_field(doc, sort_field), "id": doc["_id"]}
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode()).decode()
+
+def _cursor_payload(token: str, sort_field: str, descending: bool) -> Optional[dict]:
+    payload = json_util.loads(base64.urlsafe_b64decode(token.encode()))
+    if payload["s"] != sort_field or payload["d"] != descending:
+        # The token belongs to a different ordering; start from the first page.
+        return None
+    return payload
+
+def _decode_cursor(token: str, sort_field: str, descending: bool) -> Optional[dict]:
+    payload = _cursor_payload(token, sort_field, descending)
+    if payload is None:
+        return None
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {sort_field: {op: payload["v"]}},
+        {sort_field: payload["v"], "_id": {op: payload["id"]}},
+    ]}
+
+def _start_of_tomorrow() -> datetime:
+    return datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+
+def _availability_stage() -> dict:
+    """
+    Aggregation stage that recomputes the stored `next_expiry` and `is_available`
+    fields from the document itself, mirroring the Vehicle computed fields.
+    """
+    next_expiry = {"$min": ["$documentation.inspection_due", "$documentation.tax_due"]}
+    return {"$set": {
+        "next_expiry": next_expiry,
+        # Both due dates must be after today, i.e. from tomorrow at 00:00 onwards.
+        "is_available": {"$and": [
+            {"$eq": ["$condition", VehicleCondition.RUNNING.value]},
+            {"$gte": [next_expiry, _start_of_tomorrow()]},
+        ]},
+    }}
+
+def _vehicle_filter_clauses(condition: Optional[str], location: Optional[str], available: Optional[bool]) -> list:
+    clauses = []
+    if condition:
+        clauses.append({"condition": condition})
+    if location:
+        clauses.append({"location": location})
+    if available is not None:
+        clauses.append({"is_available": available})
+    return clauses
+
+@instrumented("db.find_vehicles")
+def find_vehicles(
+    condition: Optional[str] = None,
+    location: Optional[str] = None,
+    available: Optional[bool] = None,
+    projection: Optional[List[str]] = None,
+    sort: str = "alias",
+    descending: bool = False,
+    limit: int = 20,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    with_total: bool = False,
+) -> Page:
+    """
+    Fetches one page of vehicles matching the filters, sorted and paginated on the server.
+    Items are Vehicle models, or raw documents when a projection is given.
+    Pass the returned `next_cursor` back in to fetch the following page.
+    """
+    try:
+        if sort not in VEHICLE_SORT_FIELDS:
+            raise ValueError(f"Cannot sort vehicles by '{sort}'.")
+
+        if serving_from_snapshot():
+            return _find_vehicles_in_snapshot(condition, location, available, projection, sort, descending, limit, skip, cursor, with_total)
+
+        clauses = _vehicle_filter_clauses(condition, location, available)
+        query = {"$and": clauses} if clauses else {}
+
+        page_query = query
+        if cursor:
+            after_cursor = _decode_cursor(cursor, sort, descending)
+            if after_cursor:
+                page_query = {"$and": clauses + [after_cursor]}
+
+        fields = None
+        if projection is not None:
+            fields = dict.fromkeys(projection, 1)
+            fields[sort] = 1
+
+        direction = pymongo.DESCENDING if descending else pymongo.ASCENDING
+        docs = list(
+            db_connection.vehicle_collection.find(page_query, fields)
+            .sort([(sort, direction), ("_id", direction)])
+            .skip(skip)
+            .limit(limit + 1)
+        )
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = _encode_cursor(sort, descending, docs[-1])
+
+        items = docs if projection is not None else [vehicle_from_doc(doc) for doc in docs]
+        total = db_connection.vehicle_collection.count_documents(query) if with_total else None
+        return Page(items=items, next_cursor=next_cursor, total=total)
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while querying vehicles: {e}")
+        return Page(items=[])
+
+# Column name -> stored field of the overview table.
+VEHICLE_TABLE_FIELDS = {
+    "alias": "alias",
+    "condition": "condition",
+    "location": "location",
+    "is_available": "is_available",
+    "inspection_due": "documentation.inspection_due",
+    "tax_due": "documentation.tax_due",
+    "reason": "non_running_details.explanation",
+    "open_orders": "work_order_totals.open_orders",
+    "total_cost": "work_order_totals.total_cost",
+    "last_service_date": "work_order_totals.last_service_date",
+}
+
+def vehicle_table_columns(docs: Iterable[dict]) -> Dict[str, list]:
+    """Lays out vehicle documents, already filtered and sorted, as the overview table's columns."""
+    columns = {"id": [], **{name: [] for name in VEHICLE_TABLE_FIELDS}}
+    for doc in docs:
+        columns["id"].append(str(doc["_id"]))
+        for name, path in VEHICLE_TABLE_FIELDS.items():
+            value = doc
+            for part in path.split("."):
+                value = value.get(part) if isinstance(value, dict) else None
+            columns[name].append(value)
+    return columns
+
+def _find_vehicles_in_snapshot(condition, location, available, projection, sort, descending, limit, skip, cursor, with_total) -> Page:
+    """find_vehicles over the local snapshot, with the same ordering and cursor tokens."""
+    sort_key = _snapshot_sort_key(sort)
+    docs = sorted(local_snapshot.vehicles(condition, location, available), key=sort_key, reverse=descending)
+    total = len(docs) if with_total else None
+    payload = _cursor_payload(cursor, sort, descending) if cursor else None
+    if payload:
+        after = (payload["v"], payload["id"])
+        docs = [doc for doc in docs if (sort_key(doc) < after if descending else sort_key(doc) > after)]
+    docs = docs[skip:skip + limit + 1]
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = _encode_cursor(sort, descending, docs[-1])
+    # With a projection the raw documents are returned whole, a superset of what was asked for.
+    items = docs if projection is not None else [vehicle_from_doc(doc) for doc in docs]
+    return Page(items=items, next_cursor=next_cursor, total=total)
+
+@instrumented("db.get_vehicle_table")
+def get_vehicle_table(
+    condition: Optional[str] = None,
+    location: Optional[str] = None,
+    available: Optional[bool] = None,
+) -> Dict[str, list]:
+    """
+    Fetches every vehicle matching the filters as columns (one list per table field, plus `id`),
+    sorted by alias. Only the table's fields are read and no models are built, so the
+    result can go straight into a DataFrame even for thousands of vehicles.
+    """
+    try:
+        if serving_from_snapshot():
+            docs = sorted(local_snapshot.vehicles(condition, location, available), key=_snapshot_sort_key("alias"))
+        else:
+            clauses = _vehicle_filter_clauses(condition, location, available)
+            docs = db_connection.vehicle_collection.find(
+                {"$and": clauses} if clauses else {},
+                dict.fromkeys(VEHICLE_TABLE_FIELDS.values(), 1),
+            ).sort([("alias", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+        return vehicle_table_columns(docs)
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while fetching the vehicle table: {e}")
+        return vehicle_table_columns([])
+
+@instrumented("db.get_vehicles_by_ids")
+def get_vehicles_by_ids(vehicle_ids: List[str]) -> Dict[str, Vehicle]:
+    """Fetches several vehicles in a single $in query, keyed by id. Missing ids are left out."""
+    if not vehicle_ids:
+        return {}
+    try:
+        if serving_from_snapshot():
+            docs = [local_snapshot.vehicle(vehicle_id) for vehicle_id in vehicle_ids]
+            return {str(doc["_id"]): vehicle_from_doc(doc) for doc in docs if doc}
+        vehicles_cursor = db_connection.vehicle_collection.find(
+            {"_id": {"$in": [ObjectId(vehicle_id) for vehicle_id in vehicle_ids]}}
+        )
+        return {str(doc["_id"]): vehicle_from_doc(doc) for doc in vehicles_cursor}
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while fetching vehicles: {e}")
+        return {}
+
+@instrumented("db.get_vehicle")
+def get_vehicle(vehicle_id: str) -> Optional[Vehicle]:
+    """Fetches a single vehicle by id, or None if it does not exist."""
+    try:
+        if serving_from_snapshot():
+            doc = local_snapshot.vehicle(vehicle_id)
+        else:
+            doc = db_connection.vehicle_collection.find_one({"_id": ObjectId(vehicle_id)})
+        return vehicle_from_doc(doc) if doc else None
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while fetching vehicle: {e}")
+        return None
+
+@instrumented("db.get_vehicle_refs")
+def get_vehicle_refs(search: Optional[str] = None, limit: int = 0) -> List[VehicleRef]:
+    """
+    Lists (id, alias, location) for the vehicles whose alias has a word starting with
+    `search` (case-insensitive), sorted by alias. Only the alias index is read, never
+    the documents. A limit of 0 returns every match.
+    """
+    try:
+        pattern = r"(^|\s)" + re.escape(search.strip()) if search and search.strip() else None
+        if serving_from_snapshot():
+            matcher = re.compile(pattern or "", re.IGNORECASE)
+            docs = sorted(
+                (doc for doc in local_snapshot.vehicles() if matcher.search(doc["alias"])),
+                key=_snapshot_sort_key("alias"),
+            )
+            return [VehicleRef(str(doc["_id"]), doc["alias"], doc["location"]) for doc in docs[:limit or None]]
+        query = {"alias": {"$regex": pattern, "$options": "i"}} if pattern else {}
+        cursor = (
+            db_connection.vehicle_collection.find(query, {"alias": 1, "location": 1})
+            .sort([("alias", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+            .limit(limit)
+        )
+        return [VehicleRef(str(doc["_id"]), doc["alias"], doc["location"]) for doc in cursor]
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while listing vehicles: {e}")
+        return []
+
+@instrumented("db.get_expiring_vehicles")
+def get_expiring_vehicles(before: datetime, since: Optional[datetime] = None) -> List[Vehicle]:
+    """
+    Fetches the vehicles whose ITV or road tax is due before `before`, soonest first.
+    With `since`, only due dates from then on count, so vehicles that lapsed long ago
+    are not read again every day; each document is a range scan on its own index.
+    Without it, lapsed vehicles are included, from a range scan on next_expiry.
+    """
+    try:
+        if serving_from_snapshot():
+            docs = sorted(
+                (doc for doc in local_snapshot.vehicles() if any(
+                    (since is None or since <= due) and due < before for due in doc["documentation"].values()
+                )),
+                key=_snapshot_sort_key("next_expiry"),
+            )
+        elif since is None:
+            docs = db_connection.vehicle_collection.find({"next_expiry": {"$lt": before}}).sort("next_expiry", pymongo.ASCENDING)
+        else:
+            window = {"$gte": since, "$lt": before}
+            docs = sorted(
+                db_connection.vehicle_collection.find({"$or": [
+                    {"documentation.inspection_due": window},
+                    {"documentation.tax_due": window},
+                ]}),
+                key=_snapshot_sort_key("next_expiry"),
+            )
+        return [vehicle_from_doc(doc) for doc in docs]
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while fetching expiring vehicles: {e}")
+        return []
+
+@instrumented("db.get_vehicle_locations")
+def get_vehicle_locations() -> List[str]:
+    """Returns the distinct vehicle locations, read from the location index."""
+    try:
+        if serving_from_snapshot():
+            return sorted({doc["location"] for doc in local_snapshot.vehicles()})
+        return sorted(db_connection.vehicle_collection.distinct("location"))
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while fetching locations: {e}")
+        return []
+
+@instrumented("db.add_vehicle")
 def add_vehicle(vehicle: Vehicle) -> str:
     """Adds a new vehicle to the database."""
     try:
         vehicle_dict = vehicle.model_dump(by_alias=True)
+        vehicle_dict["updated_at"] = utc_now()
         result = db_connection.vehicle_collection.insert_one(vehicle_dict)
+        vehicle_cache.put(str(result.inserted_id), vehicle)
         return str(result.inserted_id)
     except Exception as e:
+        record_error()
         print(f"An error occurred while adding vehicle: {e}")
         return ""
 
-def update_vehicle(vehicle_id: str, updates: dict) -> bool:
-    """Updates a vehicle in the database."""
+def _vehicle_update_pipeline(updates: dict) -> list:
+    """
+    Turns a dict of (possibly dotted) field updates into an update pipeline.
+    None values remove the field. The last stage keeps the stored availability current.
+    """
+    fields_to_set = {}
+    fields_to_unset = []
+    for key, value in updates.items():
+        if value is None:
+            fields_to_unset.append(key)
+        else:
+            # $literal stops values such as "$..." strings being read as expressions.
+            fields_to_set[key] = {"$literal": value}
+    pipeline = []
+    if fields_to_set:
+        pipeline.append({"$set": fields_to_set})
+    if fields_to_unset:
+        pipeline.append({"$unset": fields_to_unset})
+    if not pipeline:
+        return []
+    pipeline.append(_availability_stage())
+    pipeline.append({"$set": {"updated_at": utc_now()}})
+    return pipeline
+
+@instrumented("db.update_vehicle")
+def update_vehicle(vehicle_id: str, updates: dict) -> Optional[Vehicle]:
+    """
+    Updates a vehicle in the database and returns it as stored after the write,
+    or None if it does not exist or the update failed. The shared snapshot is
+    patched with the returned vehicle rather than reloaded.
+    """
     try:
-        update_operation = {}
-        fields_to_set = {}
-        fields_to_unset = {}
-        for key, value in updates.items():
-            if value is None:
-                fields_to_unset[key] = ""
-            else:
-                fields_to_set[key] = value
-        if fields_to_set:
-            update_operation["$set"] = fields_to_set
-        if fields_to_unset:
-            update_operation["$unset"] = fields_to_unset
-        if not update_operation:
-            return True
-        result = db_connection.vehicle_collection.update_one(
-            {"_id": ObjectId(vehicle_id)},
-            update_operation
-        )
-        return result.matched_count > 0
+        collection = db_connection.vehicle_collection
+        update_pipeline = _vehicle_update_pipeline(updates)
+        if not update_pipeline:
+            doc = collection.find_one({"_id": ObjectId(vehicle_id)})
+        else:
+            doc = collection.find_one_and_update(
+                {"_id": ObjectId(vehicle_id)},
+                update_pipeline,
+                return_document=ReturnDocument.AFTER
+            )
+        if doc is None:
+            return None
+        vehicle = vehicle_from_doc(doc)
+        vehicle_cache.put(vehicle_id, vehicle)
+        return vehicle
     except Exception as e:
+        record_error()
         print(f"An error occurred while updating vehicle: {e}")
-        return False
+        return None
+
+@instrumented("db.bulk_update_vehicles")
+def bulk_update_vehicles(updates: Dict[str, dict]) -> BulkUpdateReport:
+    """
+    Applies field updates to many vehicles, keyed by vehicle id, in a single unordered bulk_write.
+    Each value takes the same form as in update_vehicle. A vehicle that fails does not stop
+    the others; the report has one result per requested vehicle.
+    """
+    results = {vehicle_id: VehicleUpdateResult(vehicle_id=vehicle_id) for vehicle_id in updates}
+    report = BulkUpdateReport(results=list(results.values()))
+    pipelines = {}
+    for vehicle_id, fields in updates.items():
+        try:
+            object_id = ObjectId(vehicle_id)
+        except (InvalidId, TypeError):
+            results[vehicle_id].message = "Invalid vehicle id."
+            continue
+        pipeline = _vehicle_update_pipeline(fields)
+        if pipeline:
+            pipelines[object_id] = pipeline
+        else:
+            results[vehicle_id].updated = True
+    if not pipelines:
+        return report
+
+    try:
+        collection = db_connection.vehicle_collection
+        existing = {doc["_id"] for doc in collection.find({"_id": {"$in": list(pipelines)}}, {"_id": 1})}
+        for object_id in pipelines.keys() - existing:
+            results[str(object_id)].message = "Vehicle not found."
+        operation_ids = [object_id for object_id in pipelines if object_id in existing]
+        if not operation_ids:
+            return report
+
+        try:
+            outcome = collection.bulk_write(
+                [UpdateOne({"_id": object_id}, pipelines[object_id]) for object_id in operation_ids],
+                ordered=False,
+            ).bulk_api_result
+        except BulkWriteError as e:
+            outcome = e.details
+        failed = {}
+        for error in outcome.get("writeErrors", []):
+            failed[error["index"]] = error.get("errmsg", "Write failed.")
+        for index, object_id in enumerate(operation_ids):
+            result = results[str(object_id)]
+            result.updated = index not in failed
+            result.message = failed.get(index)
+
+        report.matched = outcome.get("nMatched", 0)
+        report.modified = outcome.get("nModified", 0)
+        if report.matched:
+            vehicle_cache.invalidate()
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while bulk updating vehicles: {e}")
+        for result in results.values():
+            if result.updated is False and result.message is None:
+                result.message = str(e)
+    return report
+
+@instrumented("db.refresh_availability")
+def refresh_availability() -> int:
+    """
+    Flips vehicles whose ITV or road tax has lapsed to unavailable, and backfills the
+    stored fields on documents that predate them. Meant to run just after midnight.
+    Returns the number of vehicles updated.
+    """
+    try:
+        result = db_connection.vehicle_collection.update_many(
+            {"$or": [
+                {"is_available": True, "next_expiry": {"$lt": _start_of_tomorrow()}},
+                {"next_expiry": {"$exists": False}},
+            ]},
+            [_availability_stage(), {"$set": {"updated_at": utc_now()}}]
+        )
+        return result.modified_count
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while refreshing availability: {e}")
+        return 0
 
+@instrumented("db.get_availability_counts")
+def get_availability_counts() -> dict:
+    """Returns the number of available and unavailable vehicles, counted on the is_available index."""
+    try:
+        if serving_from_snapshot():
+            return {
+                "available": len(local_snapshot.vehicles(available=True)),
+                "unavailable": len(local_snapshot.vehicles(available=False)),
+            }
+        collection = db_connection.vehicle_collection
+        return {
+            "available": collection.count_documents({"is_available": True}),
+            "unavailable": collection.count_documents({"is_available": False}),
+        }
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while counting vehicles: {e}")
+        return {"available": 0, "unavailable": 0}
+
+@instrumented("db.delete_vehicle")
 def delete_vehicle(vehicle_id: str) -> bool:
     """Deletes a vehicle from the database."""
     try:
         result = db_connection.vehicle_collection.delete_one(
             {"_id": ObjectId(vehicle_id)}
         )
+        if result.deleted_count > 0:
+            vehicle_cache.remove(vehicle_id)
+            # Tombstone so pollers on servers without change streams see the delete.
+            db_connection.db["deletions"].insert_one(
+                {"collection": "vehicles", "doc_id": ObjectId(vehicle_id), "deleted_at": utc_now()}
+            )
         return result.deleted_count > 0
     except Exception as e:
+        record_error()
         print(f"An error occurred while deleting vehicle: {e}")
         return False
 
 # --- WORK ORDER FUNCTIONS ---
-def add_work_order(work_order: WorkOrder) -> str:
-    """Adds a new work order to the database."""
+@instrumented("db.add_work_order")
+def add_work_order(work_order: WorkOrder) -> Optional[WorkOrder]:
+    """
+    Adds a new work order to the database and returns it as inserted, so callers
+    can add it to what they already show instead of re-querying. None on failure.
+    The vehicle's work-order totals are updated right after the insert.
+    """
     try:
         collection = db_connection.db["work_orders"]
         work_order_dict = work_order.model_dump(by_alias=True)
-        result = collection.insert_one(work_order_dict)
-        return str(result.inserted_id)
+        work_order_dict["updated_at"] = utc_now()
+        collection.insert_one(work_order_dict)
+        _update_work_order_totals(work_order.vehicle_id, _added_order_totals(work_order))
+        return work_order
     except Exception as e:
+        record_error()
         print(f"An error occurred while adding work order: {e}")
-        return ""
+        return None
+
+# Newest first; matches the (vehicle_id, start_date, _id) index.
+WORK_ORDER_SORT = [("start_date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
 
+@instrumented("db.get_work_orders_for_vehicle")
 def get_work_orders_for_vehicle(vehicle_id: str) -> List[WorkOrder]:
-    """Fetches all work orders for a specific vehicle."""
+    """Fetches all work orders for a specific vehicle, newest first. Only open ones during an outage."""
     try:
+        if serving_from_snapshot():
+            return [work_order_from_doc(doc) for doc in local_snapshot.open_work_orders([vehicle_id])]
         collection = db_connection.db["work_orders"]
-        orders_cursor = collection.find({"vehicle_id": ObjectId(vehicle_id)})
-        return [WorkOrder.model_validate(doc) for doc in orders_cursor]
+        orders_cursor = collection.find({"vehicle_id": ObjectId(vehicle_id)}).sort(WORK_ORDER_SORT)
+        return [work_order_from_doc(doc) for doc in orders_cursor]
     except Exception as e:
+        record_error()
         print(f"An error occurred while fetching work orders: {e}")
         return []
+
+@instrumented("db.get_work_orders_page")
+def get_work_orders_page(vehicle_id: str, limit: int = 20, cursor: Optional[str] = None) -> Page:
+    """
+    Fetches one page of a vehicle's work orders, newest first.
+    Pass the returned `next_cursor` back in to fetch the following page.
+    During an outage the only page holds the vehicle's open orders.
+    """
+    try:
+        if serving_from_snapshot():
+            docs = [] if cursor else local_snapshot.open_work_orders([vehicle_id])
+            return Page(items=[work_order_from_doc(doc) for doc in docs])
+        collection = db_connection.db["work_orders"]
+        query = {"vehicle_id": ObjectId(vehicle_id)}
+        if cursor:
+            after_cursor = _decode_cursor(cursor, "start_date", True)
+            if after_cursor:
+                query = {"$and": [query, after_cursor]}
+
+        docs = list(collection.find(query).sort(WORK_ORDER_SORT).limit(limit + 1))
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = _encode_cursor("start_date", True, docs[-1])
+        return Page(items=[work_order_from_doc(doc) for doc in docs], next_cursor=next_cursor)
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while fetching work orders: {e}")
+        return Page(items=[])
+
+@instrumented("db.get_work_orders_for_vehicles")
+def get_work_orders_for_vehicles(vehicle_ids: List[str]) -> Dict[str, List[WorkOrder]]:
+    """
+    Fetches the work orders of several vehicles in a single $in query.
+    Returns a dict keyed by vehicle id; each list is newest first.
+    """
+    orders_by_vehicle = {vehicle_id: [] for vehicle_id in vehicle_ids}
+    if not vehicle_ids:
+        return orders_by_vehicle
+    try:
+        if serving_from_snapshot():
+            for doc in local_snapshot.open_work_orders(vehicle_ids):
+                orders_by_vehicle[str(doc["vehicle_id"])].append(work_order_from_doc(doc))
+            return orders_by_vehicle
+        collection = db_connection.db["work_orders"]
+        orders_cursor = collection.find(
+            {"vehicle_id": {"$in": [ObjectId(vehicle_id) for vehicle_id in vehicle_ids]}}
+        ).sort([("vehicle_id", pymongo.ASCENDING)] + WORK_ORDER_SORT)
+        for doc in orders_cursor:
+            orders_by_vehicle[str(doc["vehicle_id"])].append(work_order_from_doc(doc))
+        return orders_by_vehicle
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while fetching work orders: {e}")
+        return orders_by_vehicle
+
+# --- WORK ORDER TOTALS ---
+# Each vehicle keeps running totals of its work orders in `work_order_totals`, so
+# spend and open-order views read one document per vehicle. The order write and
+# the totals update are two atomic single-document writes; a crash between them
+# leaves the totals off until rebuild_work_order_totals runs.
+WORK_ORDER_TOTALS_PIPELINE = [
+    {"$group": {
+        "_id": "$vehicle_id",
+        "open_orders": {"$sum": {"$cond": ["$is_complete", 0, 1]}},
+        "open_cost": {"$sum": {"$cond": ["$is_complete", 0, "$cost"]}},
+        "total_cost": {"$sum": "$cost"},
+        # $max skips the nulls of open orders.
+        "last_service_date": {"$max": {"$cond": ["$is_complete", "$completion_date", None]}},
+    }},
+]
+
+def _added_order_totals(work_order: WorkOrder) -> dict:
+    """The $inc/$max update that adds a new work order to its vehicle's totals."""
+    update = {"$inc": {"work_order_totals.total_cost": work_order.cost}}
+    if not work_order.is_complete:
+        update["$inc"]["work_order_totals.open_orders"] = 1
+        update["$inc"]["work_order_totals.open_cost"] = work_order.cost
+    elif work_order.completion_date:
+        update["$max"] = {"work_order_totals.last_service_date": work_order.completion_date}
+    return update
+
+def _completed_order_totals(doc: dict) -> dict:
+    """The $inc/$max update that moves a just-completed work order out of its vehicle's open totals."""
+    return {
+        "$inc": {"work_order_totals.open_orders": -1, "work_order_totals.open_cost": -doc.get("cost", 0.0)},
+        "$max": {"work_order_totals.last_service_date": doc["completion_date"]},
+    }
+
+def _update_work_order_totals(vehicle_id: ObjectId, update: dict) -> None:
+    doc = db_connection.vehicle_collection.find_one_and_update(
+        {"_id": vehicle_id},
+        {**update, "$set": {"updated_at": utc_now()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc is not None:
+        vehicle_cache.put(str(vehicle_id), vehicle_from_doc(doc))
+
+@instrumented("db.complete_work_order")
+def complete_work_order(work_order_id: str, completion_date: Optional[datetime] = None) -> Optional[WorkOrder]:
+    """
+    Marks an open work order complete (now, unless a date is given) and moves its cost
+    out of the vehicle's open totals. Returns the order as stored, or None if it does
+    not exist. Completing an order twice changes nothing.
+    """
+    try:
+        collection = db_connection.db["work_orders"]
+        completion_date = completion_date or datetime.now()
+        doc = collection.find_one_and_update(
+            {"_id": ObjectId(work_order_id), "is_complete": False},
+            {"$set": {"is_complete": True, "completion_date": completion_date, "updated_at": utc_now()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            doc = collection.find_one({"_id": ObjectId(work_order_id)})
+            return work_order_from_doc(doc) if doc else None
+        _update_work_order_totals(doc["vehicle_id"], _completed_order_totals(doc))
+        return work_order_from_doc(doc)
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while completing work order: {e}")
+        return None
+
+# Times a vehicle whose totals changed while they were being rebuilt is read again.
+REBUILD_TOTALS_RETRIES = 3
+
+def _rebuild_totals_batch(db, docs: List[dict]) -> Tuple[int, List[ObjectId]]:
+    """
+    Rewrites the totals of `docs`, vehicles just read, that differ from their orders.
+    A write only applies if the vehicle still has the totals that were read, so an
+    order added or completed in the meantime is not overwritten. Returns the number
+    of vehicles corrected and the ids to read again because a write did not apply.
+    """
+    ids = [doc["_id"] for doc in docs]
+    # Aggregated after the vehicles were read: an order missing here was written
+    # later, and its own update either lands after ours or makes ours miss.
+    pipeline = [{"$match": {"vehicle_id": {"$in": ids}}}] + WORK_ORDER_TOTALS_PIPELINE
+    totals = {row.pop("_id"): row for row in db["work_orders"].aggregate(pipeline)}
+
+    empty = WorkOrderTotals().model_dump()
+    operations, drifted = [], []
+    for doc in docs:
+        expected = totals.get(doc["_id"], empty)
+        if doc.get("work_order_totals") != expected:
+            drifted.append(doc["_id"])
+            operations.append(UpdateOne(
+                {"_id": doc["_id"], "work_order_totals": doc.get("work_order_totals")},
+                {"$set": {"work_order_totals": expected, "updated_at": utc_now()}}
+            ))
+    if not operations:
+        return 0, []
+    result = db["vehicles"].bulk_write(operations, ordered=False)
+    # bulk_write does not say which filters missed; the ones that matched compare
+    # equal on the next read and are left alone.
+    return result.modified_count, drifted if result.matched_count < len(operations) else []
+
+@instrumented("db.rebuild_work_order_totals")
+def rebuild_work_order_totals(vehicle_ids: Optional[List[str]] = None, batch_size: int = 1000) -> int:
+    """
+    Recomputes the work-order totals of the given vehicles, or of every vehicle, from
+    the work orders themselves and rewrites the ones that drifted. Archived summaries
+    keep their cost and completion date, so they are counted too.
+    Returns the number of vehicles corrected.
+    """
+    corrected = 0
+    try:
+        db = db_connection.db
+        vehicle_query = {}
+        if vehicle_ids is not None:
+            vehicle_query = {"_id": {"$in": [ObjectId(vehicle_id) for vehicle_id in vehicle_ids]}}
+        cursor = db["vehicles"].find(vehicle_query, {"work_order_totals": 1}, batch_size=batch_size)
+        stale = []
+        while docs := list(islice(cursor, batch_size)):
+            batch_corrected, batch_stale = _rebuild_totals_batch(db, docs)
+            corrected += batch_corrected
+            stale += batch_stale
+
+        for _ in range(REBUILD_TOTALS_RETRIES):
+            if not stale:
+                break
+            retry, stale = stale, []
+            for start in range(0, len(retry), batch_size):
+                docs = list(db["vehicles"].find({"_id": {"$in": retry[start:start + batch_size]}}, {"work_order_totals": 1}))
+                batch_corrected, batch_stale = _rebuild_totals_batch(db, docs)
+                corrected += batch_corrected
+                stale += batch_stale
+        if stale:
+            print(f"⚠️ Work-order totals of {len(stale)} vehicles kept changing during the rebuild; run it again.")
+        if corrected:
+            vehicle_cache.invalidate()
+        return corrected
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while rebuilding work order totals: {e}")
+        return corrected
+
+
+# --- WORK ORDER ARCHIVE ---
+# Completed orders are moved to work_orders_archive after a while. A summary without
+# the description and tasks stays in work_orders, so history pages still list them
+# while the hot collection and its indexes stay small.
+ARCHIVED_FIELDS = ("description", "tasks")
+
+@instrumented("db.archive_work_orders")
+def archive_work_orders(older_than_days: float = WORK_ORDER_ARCHIVE_AFTER_DAYS, batch_size: int = 500) -> int:
+    """
+    Copies work orders completed more than `older_than_days` ago to the archive and
+    slims them down to summaries. Safe to re-run after an interruption.
+    Meant to run daily. Returns the number of orders archived.
+    """
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    archived = 0
+    try:
+        db = db_connection.db
+        hot, cold = db["work_orders"], db["work_orders_archive"]
+        # [False, None] also matches orders stored before is_archived existed.
+        query = {"is_archived": {"$in": [False, None]}, "completion_date": {"$lt": cutoff}, "is_complete": True}
+        while True:
+            docs = list(hot.find(query).limit(batch_size))
+            if not docs:
+                return archived
+            try:
+                cold.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Orders copied by an earlier, interrupted run are already in the archive.
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+            result = hot.update_many(
+                {"_id": {"$in": [doc["_id"] for doc in docs]}},
+                {"$set": {"is_archived": True, "updated_at": utc_now()}, "$unset": dict.fromkeys(ARCHIVED_FIELDS, "")}
+            )
+            archived += result.modified_count
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while archiving work orders: {e}")
+        return archived
+
+@instrumented("db.get_archived_work_order")
+def get_archived_work_order(work_order_id: str) -> Optional[WorkOrder]:
+    """Fetches the full archived copy of a work order, or None if it is not archived."""
+    try:
+        doc = db_connection.db["work_orders_archive"].find_one({"_id": ObjectId(work_order_id)})
+        return work_order_from_doc(doc) if doc else None
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while fetching the archived work order: {e}")
+        return None
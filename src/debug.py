@@ -0,0 +1,69 @@
+# src/debug.py
+
+import streamlit as st
+
+from src.config import get_setting
+from src.i18n import TEXT
+from src.metrics import PageRun, finish_page_run, metrics
+
+# The sidebar can also be opened on a single page load with ?debug=1.
+DEBUG_SIDEBAR = get_setting("DEBUG_SIDEBAR", False, bool)
+
+
+def debug_enabled() -> bool:
+    return DEBUG_SIDEBAR or st.query_params.get("debug") == "1"
+
+
+def end_page_run(run: PageRun) -> None:
+    """Call at the end of every page: records the run time and shows the debug sidebar when enabled."""
+    finish_page_run(run)
+    if debug_enabled():
+        render_debug_sidebar(run)
+
+
+def render_debug_sidebar(run: PageRun) -> None:
+    """Shows this run's calls and the process-wide totals in the sidebar."""
+    with st.sidebar.expander(TEXT["debug_title"], expanded=True):
+        st.metric(TEXT["debug_run_time"], f"{run.seconds * 1000:.0f} ms")
+
+        st.caption(TEXT["debug_run_calls"])
+        st.dataframe(
+            [
+                {
+                    TEXT["col_operation"]: call.name,
+                    TEXT["col_ms"]: round(call.seconds * 1000, 1),
+                    TEXT["col_documents"]: call.documents,
+                    TEXT["col_kib"]: round(call.bytes / 1024, 1),
+                }
+                for call in sorted(run.calls, key=lambda call: call.seconds, reverse=True)
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+
+        snapshot = metrics.snapshot()
+        for caption, table in ((TEXT["debug_totals"], snapshot["operations"]), (TEXT["debug_pages"], snapshot["pages"])):
+            st.caption(caption)
+            st.dataframe(
+                [
+                    {
+                        TEXT["col_operation"]: name,
+                        TEXT["col_calls"]: row["calls"],
+                        TEXT["col_mean_ms"]: round(row["mean_ms"], 1),
+                        TEXT["col_max_ms"]: round(row["max_ms"], 1),
+                        TEXT["col_documents"]: row["documents"],
+                        TEXT["col_kib"]: round(row["bytes"] / 1024, 1),
+                        TEXT["col_errors"]: row["errors"],
+                    }
+                    for name, row in sorted(table.items(), key=lambda item: item[1]["max_ms"], reverse=True)
+                ],
+                hide_index=True,
+                use_container_width=True
+            )
+
+        st.download_button(
+            TEXT["debug_download"],
+            data=metrics.render_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
@@ -0,0 +1,749 @@
+# src/embedded.py
+
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import bson
+from bson import ObjectId
+
+from src.database import (
+    ARCHIVED_FIELDS,
+    VEHICLE_SORT_FIELDS,
+    WORK_ORDER_ARCHIVE_AFTER_DAYS,
+    _added_order_totals,
+    _completed_order_totals,
+    _cursor_payload,
+    _encode_cursor,
+    _start_of_tomorrow,
+    utc_now,
+    vehicle_from_doc,
+    vehicle_table_columns,
+    work_order_from_doc,
+)
+from src.kpis import TOP_OPEN_COSTS
+from src.metrics import instrumented, record_error
+from src.models import (
+    BulkUpdateReport,
+    FleetKpis,
+    LocationSummary,
+    Page,
+    Vehicle,
+    VehicleCondition,
+    VehicleOpenCost,
+    VehicleRef,
+    VehicleUpdateResult,
+    WorkOrder,
+    WorkOrderTotals,
+)
+
+# Documents are kept whole as BSON, like in MongoDB; the columns next to them are
+# copies of the fields the queries filter and sort on, so they can be indexed.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vehicles (
+    id TEXT PRIMARY KEY,
+    alias TEXT NOT NULL,
+    location TEXT NOT NULL,
+    condition TEXT NOT NULL,
+    inspection_due TEXT NOT NULL,
+    tax_due TEXT NOT NULL,
+    next_expiry TEXT NOT NULL,
+    is_available INTEGER NOT NULL,
+    repair_budget REAL,
+    doc BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vehicles_alias ON vehicles (alias, id, location);
+CREATE INDEX IF NOT EXISTS vehicles_location ON vehicles (location, alias, id);
+CREATE INDEX IF NOT EXISTS vehicles_condition ON vehicles (condition, alias, id);
+CREATE INDEX IF NOT EXISTS vehicles_location_id ON vehicles (location, id);
+CREATE INDEX IF NOT EXISTS vehicles_condition_id ON vehicles (condition, id);
+CREATE INDEX IF NOT EXISTS vehicles_inspection_due ON vehicles (inspection_due, id);
+CREATE INDEX IF NOT EXISTS vehicles_tax_due ON vehicles (tax_due, id);
+CREATE INDEX IF NOT EXISTS vehicles_is_available ON vehicles (is_available, alias, id);
+CREATE INDEX IF NOT EXISTS vehicles_next_expiry ON vehicles (next_expiry);
+
+CREATE TABLE IF NOT EXISTS work_orders (
+    id TEXT PRIMARY KEY,
+    vehicle_id TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    is_complete INTEGER NOT NULL,
+    is_archived INTEGER NOT NULL,
+    completion_date TEXT,
+    cost REAL NOT NULL,
+    doc BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS work_orders_vehicle ON work_orders (vehicle_id, start_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS work_orders_open ON work_orders (is_complete, vehicle_id);
+CREATE INDEX IF NOT EXISTS work_orders_archivable ON work_orders (is_archived, completion_date);
+
+CREATE TABLE IF NOT EXISTS work_orders_archive (id TEXT PRIMARY KEY, vehicle_id TEXT NOT NULL, doc BLOB NOT NULL);
+"""
+
+# find_vehicles sort field -> column.
+SORT_COLUMNS = {
+    "alias": "alias",
+    "location": "location",
+    "condition": "condition",
+    "documentation.inspection_due": "inspection_due",
+    "documentation.tax_due": "tax_due",
+}
+
+
+def _column(value):
+    """A document value as stored in its column. Datetimes are fixed-width ISO strings so they sort as text."""
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="milliseconds")
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+def _round_trip(doc: dict) -> tuple:
+    """
+    Encodes a document and decodes it back, so the columns are derived from exactly
+    what is stored: BSON keeps milliseconds and drops time zones, as MongoDB does.
+    """
+    blob = bson.encode(doc)
+    return bson.decode(blob), blob
+
+
+def _vehicle_row(doc: dict) -> tuple:
+    doc, blob = _round_trip(doc)
+    documentation = doc["documentation"]
+    details = doc.get("non_running_details")
+    return (
+        str(doc["_id"]),
+        doc["alias"],
+        doc["location"],
+        doc["condition"],
+        _column(documentation["inspection_due"]),
+        _column(documentation["tax_due"]),
+        _column(doc["next_expiry"]),
+        int(doc["is_available"]),
+        details["estimated_budget"] if details else None,
+        blob,
+    )
+
+
+def _work_order_row(doc: dict) -> tuple:
+    doc, blob = _round_trip(doc)
+    return (
+        str(doc["_id"]),
+        str(doc["vehicle_id"]),
+        _column(doc["start_date"]),
+        int(doc.get("is_complete", False)),
+        int(doc.get("is_archived", False)),
+        _column(doc.get("completion_date")),
+        doc.get("cost", 0.0),
+        blob,
+    )
+
+
+def _parent(doc: dict, path: str) -> tuple:
+    """The dict holding a dotted field, created as needed, and the field's own name."""
+    *parents, leaf = path.split(".")
+    for parent in parents:
+        if not isinstance(doc.get(parent), dict):
+            doc[parent] = {}
+        doc = doc[parent]
+    return doc, leaf
+
+
+def _apply_updates(doc: dict, updates: dict) -> None:
+    """Applies (possibly dotted) field updates like update_vehicle: None removes the field."""
+    for key, value in updates.items():
+        target, leaf = _parent(doc, key)
+        if value is None:
+            target.pop(leaf, None)
+        else:
+            target[leaf] = value
+
+
+def _apply_operators(doc: dict, update: dict) -> None:
+    """Applies the $inc and $max parts of a MongoDB update, as built for the work-order totals."""
+    for key, amount in update.get("$inc", {}).items():
+        target, leaf = _parent(doc, key)
+        target[leaf] = target.get(leaf, 0) + amount
+    for key, value in update.get("$max", {}).items():
+        target, leaf = _parent(doc, key)
+        if target.get(leaf) is None or value > target[leaf]:
+            target[leaf] = value
+
+
+def _set_availability(doc: dict) -> None:
+    """Recomputes the stored `next_expiry` and `is_available`, mirroring _availability_stage."""
+    documentation = doc["documentation"]
+    doc["next_expiry"] = min(documentation["inspection_due"], documentation["tax_due"])
+    doc["is_available"] = (
+        doc["condition"] == VehicleCondition.RUNNING.value and doc["next_expiry"] >= _start_of_tomorrow()
+    )
+
+
+def _project(doc: dict, fields: Iterable[str]) -> dict:
+    """Keeps `_id` and the given (possibly dotted) fields, like a MongoDB projection."""
+    projected = {"_id": doc["_id"]}
+    for path in fields:
+        *parents, leaf = path.split(".")
+        source, target = doc, projected
+        for parent in parents:
+            source = source.get(parent) if isinstance(source, dict) else None
+            target = target.setdefault(parent, {})
+        if isinstance(source, dict) and leaf in source:
+            target[leaf] = source[leaf]
+    return projected
+
+
+def _regexp(pattern: str, value: str) -> bool:
+    return re.search(pattern, value, re.IGNORECASE) is not None
+
+
+class SQLiteRepository:
+    """
+    The fleet repository on an embedded SQLite database, for depots without a
+    database server and for hermetic tests and benchmarks (`path=":memory:"`).
+
+    Every query is answered from an index on the copied columns, and documents
+    are decoded the same way as the MongoDB ones. One connection is shared by
+    all sessions in the process and used under a lock; an in-memory database
+    only exists on its own connection. `on_change(collection, vehicle_id)` is
+    called after each write, which is how open pages learn about changes
+    without a change stream.
+    """
+
+    def __init__(self, path: str = ":memory:", on_change: Optional[Callable[[str, str], object]] = None):
+        self.path = path
+        self.on_change = on_change
+        self._lock = threading.RLock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.create_function("regexp", 2, _regexp, deterministic=True)
+        with self._connection:
+            if path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock, self._connection:
+            yield self._connection
+
+    def _query(self, sql: str, params: Iterable = ()) -> List[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, tuple(params)).fetchall()
+
+    def _changed(self, collection: str, vehicle_ids: Iterable[str]) -> None:
+        if self.on_change is not None:
+            for vehicle_id in vehicle_ids:
+                self.on_change(collection, vehicle_id)
+
+    @staticmethod
+    def _filters(condition: Optional[str], location: Optional[str], available: Optional[bool]) -> tuple:
+        clauses, params = [], []
+        if condition:
+            clauses.append("condition = ?")
+            params.append(condition)
+        if location:
+            clauses.append("location = ?")
+            params.append(location)
+        if available is not None:
+            clauses.append("is_available = ?")
+            params.append(int(available))
+        return clauses, params
+
+    @staticmethod
+    def _where(clauses: List[str]) -> str:
+        return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    def load(self, vehicles: Iterable[dict], work_orders: Iterable[dict]) -> None:
+        """Bulk-loads documents already in stored form, e.g. generated fixtures, without validating them."""
+        with self._transaction() as connection:
+            connection.executemany("INSERT INTO vehicles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", map(_vehicle_row, vehicles))
+            connection.executemany("INSERT INTO work_orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)", map(_work_order_row, work_orders))
+
+    def status(self) -> dict:
+        """Always healthy: there is no server to lose."""
+        (vehicles,), = self._query("SELECT COUNT(*) FROM vehicles")
+        (work_orders,), = self._query("SELECT COUNT(*) FROM work_orders")
+        return {"backend": "sqlite", "healthy": True, "degraded": False, "vehicles": vehicles, "work_orders": work_orders}
+
+    # --- VEHICLE FUNCTIONS ---
+    @instrumented("db.get_all_vehicles")
+    def get_all_vehicles(self) -> List[Vehicle]:
+        try:
+            return [vehicle_from_doc(bson.decode(doc)) for doc, in self._query("SELECT doc FROM vehicles")]
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching vehicles: {e}")
+            return []
+
+    @instrumented("db.find_vehicles")
+    def find_vehicles(
+        self,
+        condition: Optional[str] = None,
+        location: Optional[str] = None,
+        available: Optional[bool] = None,
+        projection: Optional[List[str]] = None,
+        sort: str = "alias",
+        descending: bool = False,
+        limit: int = 20,
+        skip: int = 0,
+        cursor: Optional[str] = None,
+        with_total: bool = False,
+    ) -> Page:
+        try:
+            if sort not in VEHICLE_SORT_FIELDS:
+                raise ValueError(f"Cannot sort vehicles by '{sort}'.")
+            column = SORT_COLUMNS[sort]
+            clauses, params = self._filters(condition, location, available)
+            total = None
+            if with_total:
+                (total,), = self._query(f"SELECT COUNT(*) FROM vehicles{self._where(clauses)}", params)
+
+            payload = _cursor_payload(cursor, sort, descending) if cursor else None
+            if payload:
+                clauses = clauses + [f"({column}, id) {'<' if descending else '>'} (?, ?)"]
+                params = params + [_column(payload["v"]), str(payload["id"])]
+            direction = "DESC" if descending else "ASC"
+            rows = self._query(
+                f"SELECT doc FROM vehicles{self._where(clauses)} "
+                f"ORDER BY {column} {direction}, id {direction} LIMIT ? OFFSET ?",
+                params + [limit + 1, skip],
+            )
+            docs = [bson.decode(doc) for doc, in rows]
+
+            next_cursor = None
+            if len(docs) > limit:
+                docs = docs[:limit]
+                next_cursor = _encode_cursor(sort, descending, docs[-1])
+            if projection is not None:
+                items = [_project(doc, [*projection, sort]) for doc in docs]
+            else:
+                items = [vehicle_from_doc(doc) for doc in docs]
+            return Page(items=items, next_cursor=next_cursor, total=total)
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while querying vehicles: {e}")
+            return Page(items=[])
+
+    @instrumented("db.get_vehicle_table")
+    def get_vehicle_table(
+        self,
+        condition: Optional[str] = None,
+        location: Optional[str] = None,
+        available: Optional[bool] = None,
+    ) -> Dict[str, list]:
+        try:
+            clauses, params = self._filters(condition, location, available)
+            rows = self._query(f"SELECT doc FROM vehicles{self._where(clauses)} ORDER BY alias, id", params)
+            return vehicle_table_columns(bson.decode(doc) for doc, in rows)
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching the vehicle table: {e}")
+            return vehicle_table_columns([])
+
+    @instrumented("db.get_vehicles_by_ids")
+    def get_vehicles_by_ids(self, vehicle_ids: List[str]) -> Dict[str, Vehicle]:
+        if not vehicle_ids:
+            return {}
+        try:
+            rows = self._query(
+                f"SELECT id, doc FROM vehicles WHERE id IN ({', '.join('?' * len(vehicle_ids))})", vehicle_ids
+            )
+            return {vehicle_id: vehicle_from_doc(bson.decode(doc)) for vehicle_id, doc in rows}
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching vehicles: {e}")
+            return {}
+
+    @instrumented("db.get_vehicle")
+    def get_vehicle(self, vehicle_id: str) -> Optional[Vehicle]:
+        try:
+            rows = self._query("SELECT doc FROM vehicles WHERE id = ?", [vehicle_id])
+            return vehicle_from_doc(bson.decode(rows[0][0])) if rows else None
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching vehicle: {e}")
+            return None
+
+    @instrumented("db.get_vehicle_refs")
+    def get_vehicle_refs(self, search: Optional[str] = None, limit: int = 0) -> List[VehicleRef]:
+        try:
+            sql, params = "SELECT id, alias, location FROM vehicles", []
+            if search and search.strip():
+                sql += " WHERE alias REGEXP ?"
+                params.append(r"(^|\s)" + re.escape(search.strip()))
+            sql += " ORDER BY alias, id LIMIT ?"
+            params.append(limit or -1)
+            return [VehicleRef(*row) for row in self._query(sql, params)]
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while listing vehicles: {e}")
+            return []
+
+    @instrumented("db.get_expiring_vehicles")
+    def get_expiring_vehicles(self, before: datetime, since: Optional[datetime] = None) -> List[Vehicle]:
+        try:
+            if since is None:
+                rows = self._query("SELECT doc FROM vehicles WHERE next_expiry < ? ORDER BY next_expiry, id", [_column(before)])
+            else:
+                rows = self._query(
+                    "SELECT doc FROM vehicles WHERE (inspection_due >= ? AND inspection_due < ?) "
+                    "OR (tax_due >= ? AND tax_due < ?) ORDER BY next_expiry, id",
+                    [_column(since), _column(before)] * 2,
+                )
+            return [vehicle_from_doc(bson.decode(doc)) for doc, in rows]
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching expiring vehicles: {e}")
+            return []
+
+    @instrumented("db.get_vehicle_locations")
+    def get_vehicle_locations(self) -> List[str]:
+        try:
+            return [location for location, in self._query("SELECT DISTINCT location FROM vehicles ORDER BY location")]
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching locations: {e}")
+            return []
+
+    @instrumented("db.add_vehicle")
+    def add_vehicle(self, vehicle: Vehicle) -> str:
+        try:
+            vehicle_dict = vehicle.model_dump(by_alias=True)
+            vehicle_dict["updated_at"] = utc_now()
+            with self._transaction() as connection:
+                connection.execute("INSERT INTO vehicles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", _vehicle_row(vehicle_dict))
+            self._changed("vehicles", [str(vehicle.id)])
+            return str(vehicle.id)
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while adding vehicle: {e}")
+            return ""
+
+    def _update_vehicle_doc(self, connection: sqlite3.Connection, vehicle_id: str, updates: dict) -> Optional[dict]:
+        """Reads, updates and rewrites one vehicle inside the caller's transaction. None if it does not exist."""
+        rows = connection.execute("SELECT doc FROM vehicles WHERE id = ?", (vehicle_id,)).fetchall()
+        if not rows:
+            return None
+        doc = bson.decode(rows[0][0])
+        if updates:
+            _apply_updates(doc, updates)
+            _set_availability(doc)
+            doc["updated_at"] = utc_now()
+            connection.execute("REPLACE INTO vehicles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", _vehicle_row(doc))
+        return doc
+
+    @instrumented("db.update_vehicle")
+    def update_vehicle(self, vehicle_id: str, updates: dict) -> Optional[Vehicle]:
+        try:
+            with self._transaction() as connection:
+                doc = self._update_vehicle_doc(connection, vehicle_id, updates)
+            if doc is None:
+                return None
+            if updates:
+                self._changed("vehicles", [vehicle_id])
+            return vehicle_from_doc(doc)
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while updating vehicle: {e}")
+            return None
+
+    @instrumented("db.bulk_update_vehicles")
+    def bulk_update_vehicles(self, updates: Dict[str, dict]) -> BulkUpdateReport:
+        results = {vehicle_id: VehicleUpdateResult(vehicle_id=vehicle_id) for vehicle_id in updates}
+        report = BulkUpdateReport(results=list(results.values()))
+        try:
+            # One transaction for the whole batch, like the single bulk_write on MongoDB.
+            with self._transaction() as connection:
+                for vehicle_id, fields in updates.items():
+                    result = results[vehicle_id]
+                    if not ObjectId.is_valid(vehicle_id):
+                        result.message = "Invalid vehicle id."
+                    elif not fields:
+                        result.updated = True
+                    elif self._update_vehicle_doc(connection, vehicle_id, fields) is None:
+                        result.message = "Vehicle not found."
+                    else:
+                        result.updated = True
+                        report.matched += 1
+            report.modified = report.matched
+            self._changed("vehicles", [result.vehicle_id for result in report.results if result.updated])
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while bulk updating vehicles: {e}")
+            report.matched = report.modified = 0
+            for result in results.values():
+                result.updated = False
+                result.message = result.message or str(e)
+        return report
+
+    @instrumented("db.refresh_availability")
+    def refresh_availability(self) -> int:
+        try:
+            with self._transaction() as connection:
+                rows = connection.execute(
+                    "SELECT doc FROM vehicles WHERE is_available = 1 AND next_expiry < ?",
+                    (_column(_start_of_tomorrow()),),
+                ).fetchall()
+                docs = [bson.decode(doc) for doc, in rows]
+                for doc in docs:
+                    _set_availability(doc)
+                    doc["updated_at"] = utc_now()
+                connection.executemany("REPLACE INTO vehicles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", map(_vehicle_row, docs))
+            self._changed("vehicles", [str(doc["_id"]) for doc in docs])
+            return len(docs)
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while refreshing availability: {e}")
+            return 0
+
+    @instrumented("db.get_availability_counts")
+    def get_availability_counts(self) -> dict:
+        try:
+            counts = dict(self._query("SELECT is_available, COUNT(*) FROM vehicles GROUP BY is_available"))
+            return {"available": counts.get(1, 0), "unavailable": counts.get(0, 0)}
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while counting vehicles: {e}")
+            return {"available": 0, "unavailable": 0}
+
+    @instrumented("db.delete_vehicle")
+    def delete_vehicle(self, vehicle_id: str) -> bool:
+        try:
+            with self._transaction() as connection:
+                deleted = connection.execute("DELETE FROM vehicles WHERE id = ?", (vehicle_id,)).rowcount > 0
+            if deleted:
+                self._changed("vehicles", [vehicle_id])
+            return deleted
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while deleting vehicle: {e}")
+            return False
+
+    @instrumented("db.get_fleet_kpis")
+    def get_fleet_kpis(self) -> FleetKpis:
+        try:
+            by_location = [
+                LocationSummary(location=location, vehicles=vehicles, available=available)
+                for location, vehicles, available in self._query(
+                    "SELECT location, COUNT(*), SUM(is_available) FROM vehicles "
+                    "GROUP BY location ORDER BY COUNT(*) DESC, location"
+                )
+            ]
+            (repair_budget, vehicles_in_repair), = self._query("SELECT TOTAL(repair_budget), COUNT(repair_budget) FROM vehicles")
+            open_costs = [
+                VehicleOpenCost(vehicle_id=ObjectId(vehicle_id), alias=alias, open_orders=open_orders, open_cost=open_cost)
+                for vehicle_id, alias, open_orders, open_cost in self._query(
+                    "SELECT work_orders.vehicle_id, vehicles.alias, COUNT(*), TOTAL(work_orders.cost) "
+                    "FROM work_orders LEFT JOIN vehicles ON vehicles.id = work_orders.vehicle_id "
+                    "WHERE work_orders.is_complete = 0 GROUP BY work_orders.vehicle_id ORDER BY 4 DESC"
+                )
+            ]
+            available = sum(row.available for row in by_location)
+            return FleetKpis(
+                available=available,
+                unavailable=sum(row.vehicles for row in by_location) - available,
+                repair_budget=repair_budget,
+                vehicles_in_repair=vehicles_in_repair,
+                open_work_order_cost=sum(row.open_cost for row in open_costs),
+                by_location=by_location,
+                open_costs=open_costs[:TOP_OPEN_COSTS],
+            )
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while computing fleet KPIs: {e}")
+            return FleetKpis()
+
+    # --- WORK ORDER FUNCTIONS ---
+    @staticmethod
+    def _update_work_order_totals(connection: sqlite3.Connection, vehicle_id: str, update: dict) -> None:
+        """Applies a totals update from src.database to the vehicle, inside the caller's transaction."""
+        rows = connection.execute("SELECT doc FROM vehicles WHERE id = ?", (vehicle_id,)).fetchall()
+        if rows:
+            doc = bson.decode(rows[0][0])
+            _apply_operators(doc, update)
+            doc["updated_at"] = utc_now()
+            connection.execute("REPLACE INTO vehicles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", _vehicle_row(doc))
+
+    @instrumented("db.add_work_order")
+    def add_work_order(self, work_order: WorkOrder) -> Optional[WorkOrder]:
+        try:
+            work_order_dict = work_order.model_dump(by_alias=True)
+            work_order_dict["updated_at"] = utc_now()
+            vehicle_id = str(work_order.vehicle_id)
+            # The order and its vehicle's totals are written in one transaction.
+            with self._transaction() as connection:
+                connection.execute("INSERT INTO work_orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _work_order_row(work_order_dict))
+                self._update_work_order_totals(connection, vehicle_id, _added_order_totals(work_order))
+            self._changed("vehicles", [vehicle_id])
+            self._changed("work_orders", [vehicle_id])
+            return work_order
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while adding work order: {e}")
+            return None
+
+    @instrumented("db.get_work_orders_for_vehicle")
+    def get_work_orders_for_vehicle(self, vehicle_id: str) -> List[WorkOrder]:
+        try:
+            rows = self._query(
+                "SELECT doc FROM work_orders WHERE vehicle_id = ? ORDER BY start_date DESC, id DESC", [vehicle_id]
+            )
+            return [work_order_from_doc(bson.decode(doc)) for doc, in rows]
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching work orders: {e}")
+            return []
+
+    @instrumented("db.get_work_orders_page")
+    def get_work_orders_page(self, vehicle_id: str, limit: int = 20, cursor: Optional[str] = None) -> Page:
+        try:
+            sql, params = "SELECT doc FROM work_orders WHERE vehicle_id = ?", [vehicle_id]
+            payload = _cursor_payload(cursor, "start_date", True) if cursor else None
+            if payload:
+                sql += " AND (start_date, id) < (?, ?)"
+                params += [_column(payload["v"]), str(payload["id"])]
+            rows = self._query(sql + " ORDER BY start_date DESC, id DESC LIMIT ?", params + [limit + 1])
+            docs = [bson.decode(doc) for doc, in rows]
+            next_cursor = None
+            if len(docs) > limit:
+                docs = docs[:limit]
+                next_cursor = _encode_cursor("start_date", True, docs[-1])
+            return Page(items=[work_order_from_doc(doc) for doc in docs], next_cursor=next_cursor)
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching work orders: {e}")
+            return Page(items=[])
+
+    @instrumented("db.get_work_orders_for_vehicles")
+    def get_work_orders_for_vehicles(self, vehicle_ids: List[str]) -> Dict[str, List[WorkOrder]]:
+        orders_by_vehicle = {vehicle_id: [] for vehicle_id in vehicle_ids}
+        if not vehicle_ids:
+            return orders_by_vehicle
+        try:
+            rows = self._query(
+                f"SELECT vehicle_id, doc FROM work_orders WHERE vehicle_id IN ({', '.join('?' * len(vehicle_ids))}) "
+                "ORDER BY vehicle_id, start_date DESC, id DESC",
+                vehicle_ids,
+            )
+            for vehicle_id, doc in rows:
+                orders_by_vehicle[vehicle_id].append(work_order_from_doc(bson.decode(doc)))
+            return orders_by_vehicle
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching work orders: {e}")
+            return orders_by_vehicle
+
+    @instrumented("db.complete_work_order")
+    def complete_work_order(self, work_order_id: str, completion_date: Optional[datetime] = None) -> Optional[WorkOrder]:
+        try:
+            with self._transaction() as connection:
+                rows = connection.execute("SELECT doc FROM work_orders WHERE id = ?", (work_order_id,)).fetchall()
+                if not rows:
+                    return None
+                doc = bson.decode(rows[0][0])
+                if doc.get("is_complete"):
+                    return work_order_from_doc(doc)
+                doc["is_complete"] = True
+                doc["completion_date"] = completion_date or datetime.now()
+                doc["updated_at"] = utc_now()
+                doc, _ = _round_trip(doc)
+                connection.execute("REPLACE INTO work_orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _work_order_row(doc))
+                self._update_work_order_totals(connection, str(doc["vehicle_id"]), _completed_order_totals(doc))
+            self._changed("vehicles", [str(doc["vehicle_id"])])
+            self._changed("work_orders", [str(doc["vehicle_id"])])
+            return work_order_from_doc(doc)
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while completing work order: {e}")
+            return None
+
+    @instrumented("db.rebuild_work_order_totals")
+    def rebuild_work_order_totals(self, vehicle_ids: Optional[List[str]] = None, batch_size: int = 1000) -> int:
+        try:
+            order_filter = vehicle_filter = ""
+            params = list(vehicle_ids or [])
+            if vehicle_ids is not None:
+                placeholders = ", ".join("?" * len(vehicle_ids))
+                order_filter = f" WHERE vehicle_id IN ({placeholders})"
+                vehicle_filter = f" WHERE id IN ({placeholders})"
+            # One transaction, so no order can be added between the sums and the rewrite.
+            with self._transaction() as connection:
+                totals = {
+                    vehicle_id: {
+                        "open_orders": open_orders,
+                        "open_cost": open_cost,
+                        "total_cost": total_cost,
+                        "last_service_date": datetime.fromisoformat(last_service) if last_service else None,
+                    }
+                    for vehicle_id, open_orders, open_cost, total_cost, last_service in connection.execute(
+                        "SELECT vehicle_id, SUM(is_complete = 0), TOTAL(CASE WHEN is_complete = 0 THEN cost END), "
+                        f"TOTAL(cost), MAX(CASE WHEN is_complete = 1 THEN completion_date END) FROM work_orders{order_filter} "
+                        "GROUP BY vehicle_id",
+                        params,
+                    )
+                }
+                empty = WorkOrderTotals().model_dump()
+                drifted = []
+                for doc, in connection.execute(f"SELECT doc FROM vehicles{vehicle_filter}", params).fetchall():
+                    doc = bson.decode(doc)
+                    expected = totals.get(str(doc["_id"]), empty)
+                    if doc.get("work_order_totals") != expected:
+                        doc["work_order_totals"] = expected
+                        doc["updated_at"] = utc_now()
+                        drifted.append(doc)
+                connection.executemany("REPLACE INTO vehicles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", map(_vehicle_row, drifted))
+            self._changed("vehicles", [str(doc["_id"]) for doc in drifted])
+            return len(drifted)
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while rebuilding work order totals: {e}")
+            return 0
+
+    @instrumented("db.archive_work_orders")
+    def archive_work_orders(self, older_than_days: float = WORK_ORDER_ARCHIVE_AFTER_DAYS, batch_size: int = 500) -> int:
+        cutoff = _column(datetime.now() - timedelta(days=older_than_days))
+        archived = 0
+        try:
+            while True:
+                # Each batch is one transaction, so the copy and the slimming happen together.
+                with self._transaction() as connection:
+                    rows = connection.execute(
+                        "SELECT doc FROM work_orders WHERE is_archived = 0 AND completion_date < ? AND is_complete = 1 LIMIT ?",
+                        (cutoff, batch_size),
+                    ).fetchall()
+                    if not rows:
+                        return archived
+                    docs = [bson.decode(doc) for doc, in rows]
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO work_orders_archive VALUES (?, ?, ?)",
+                        [(str(doc["_id"]), str(doc["vehicle_id"]), blob) for doc, (blob,) in zip(docs, rows)],
+                    )
+                    for doc in docs:
+                        for field in ARCHIVED_FIELDS:
+                            doc.pop(field, None)
+                        doc["is_archived"] = True
+                        doc["updated_at"] = utc_now()
+                    connection.executemany("REPLACE INTO work_orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)", map(_work_order_row, docs))
+                archived += len(docs)
+                self._changed("work_orders", {str(doc["vehicle_id"]) for doc in docs})
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while archiving work orders: {e}")
+            return archived
+
+    @instrumented("db.get_archived_work_order")
+    def get_archived_work_order(self, work_order_id: str) -> Optional[WorkOrder]:
+        try:
+            rows = self._query("SELECT doc FROM work_orders_archive WHERE id = ?", [work_order_id])
+            return work_order_from_doc(bson.decode(rows[0][0])) if rows else None
+        except Exception as e:
+            record_error()
+            print(f"An error occurred while fetching the archived work order: {e}")
+            return None
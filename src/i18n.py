@@ -5,6 +5,7 @@ TEXT = {
     "page_config_icon": "🚗",
     "welcome_title": "Benvingut al Panell de l'Estat de la Flota! 🚗",
     "sidebar_select_page": "Selecciona una pàgina a dalt.",
+    "degraded_banner": "📴 La base de dades no respon: es mostra la còpia local de les dades del {synced_at}. Els canvis no es desaran fins que torni.",
     "welcome_instructions": "Fes servir la navegació a la barra lateral per veure la flota o afegir un vehicle nou.",
 
     "overview_page_title": "Estat General",
@@ -16,6 +17,40 @@ TEXT = {
     "col_available": "Disponible?",
     "col_inspection_due": "ITV Vigent Fins",
     "col_tax_due": "Impost Circ. Vigent Fins",
+    "kpi_available": "Disponibles",
+    "kpi_unavailable": "No disponibles",
+    "kpi_repair_budget": "Pressupost de reparacions",
+    "kpi_repair_vehicles": "{count} vehicles en reparació",
+    "kpi_open_cost": "Cost d'ordres obertes",
+    "kpi_details": "Detall per ubicació i ordres obertes",
+    "kpi_by_location": "Vehicles per ubicació",
+    "kpi_open_costs": "Vehicles amb més cost obert",
+    "col_vehicles": "Vehicles",
+    "col_open_orders": "Ordres obertes",
+    "col_open_cost": "Cost obert (€)",
+    "col_total_cost": "Cost total",
+    "col_last_service": "Últim servei",
+    "expiry_title": "⚠️ Caducitats properes ({count})",
+    "expiry_caption": "ITV i impostos de circulació que caduquen en els propers {days} dies o que han caducat en els últims {lapsed_days}.",
+    "expiry_none": "Cap ITV ni impost de circulació caduca en els propers {days} dies.",
+    "expiry_download": "Descarrega el resum (CSV)",
+    "expiry_document_inspection_due": "ITV",
+    "expiry_document_tax_due": "Impost de circulació",
+    "col_document": "Document",
+    "col_due": "Venciment",
+    "col_days_left": "Dies restants",
+    "filter_all": "Tots",
+    "filter_available": "Disponible",
+    "filter_unavailable": "No disponible",
+    "filter_page_size": "Vehicles per pàgina",
+    "page_previous": "⬅️ Anterior",
+    "page_next": "Següent ➡️",
+    "page_caption": "Pàgina {page} · {total} vehicles",
+    "view_mode": "Vista",
+    "view_cards": "Targetes",
+    "view_table": "Taula",
+    "table_caption": "{total} vehicles",
+    "col_reason": "Motiu",
 
     "add_page_title": "Afegir Vehicle",
     "add_title": "Afegeix un Vehicle Nou ➕",
@@ -33,15 +68,34 @@ TEXT = {
     "add_submit_button": "Afegeix Vehicle",
     "add_error_required": "Els camps Àlies i Ubicació són obligatoris.",
     "add_success_message": "Vehicle '{alias}' afegit correctament! Navega a la pàgina de Visió General per veure'l.",
+    "add_photo_queued": "La foto s'està processant en segon pla i apareixerà al vehicle quan estigui pujada.",
 
     "manage_page_title": "Editar o Esborrar Vehicle",
     "manage_title": "Edita o Esborra un Vehicle ✏️",
     "manage_no_vehicles": "No hi ha vehicles a la base de dades per gestionar.",
     "manage_select_vehicle": "Selecciona un vehicle per gestionar",
+    "vehicle_search_label": "Cerca un vehicle",
+    "vehicle_search_placeholder": "Escriu el començament de qualsevol paraula de l'àlies",
+    "vehicle_search_more": "Es mostren els primers {limit} vehicles; escriu més per afinar la cerca.",
+    "vehicle_search_no_results": "Cap vehicle coincideix amb la cerca.",
     "manage_editing_subheader": "Editant: {alias}",
     "manage_save_button": "Desa els Canvis",
     "manage_update_success": "Detalls del vehicle actualitzats correctament!",
     "manage_update_fail": "No s'han pogut actualitzar els detalls del vehicle.",
+    "manage_mode": "Mode d'edició",
+    "manage_mode_single": "Un vehicle",
+    "manage_mode_bulk": "Edició massiva",
+    "bulk_edit_select": "Selecciona els vehicles",
+    "bulk_edit_subheader": "Canvis per als {count} vehicles seleccionats",
+    "bulk_edit_help": "Només s'aplicaran els camps marcats.",
+    "bulk_edit_set_inspection": "Renova l'ITV",
+    "bulk_edit_set_tax": "Renova l'impost de circulació",
+    "bulk_edit_set_location": "Canvia la ubicació",
+    "bulk_edit_button": "Aplica als Seleccionats",
+    "bulk_edit_nothing": "Selecciona almenys un vehicle i un camp a canviar.",
+    "bulk_edit_result": "{updated} de {total} vehicles actualitzats.",
+    "bulk_edit_failures": "Vehicles no actualitzats",
+    "col_message": "Motiu",
 
     "danger_zone_title": "🚨 Zona Perillosa",
     "delete_subheader": "Esborra el Vehicle",
@@ -50,4 +104,36 @@ TEXT = {
     "delete_button": "Esborra el Vehicle Permanentment",
     "delete_success": "Vehicle '{alias}' esborrat correctament.",
     "delete_fail": "No s'ha pogut esborrar el vehicle.",
+
+    "bulk_page_title": "Importar i Exportar",
+    "bulk_title": "Importació i Exportació Massiva 📦",
+    "bulk_needs_mongo": "La importació i l'exportació massives només estan disponibles amb la base de dades MongoDB.",
+    "bulk_collection_label": "Col·lecció",
+    "bulk_collection_vehicles": "Vehicles",
+    "bulk_collection_work_orders": "Ordres de Treball",
+    "bulk_import_subheader": "Importa",
+    "bulk_import_help": "Fitxer CSV (columnes amb punts per als camps niats, p. ex. `documentation.tax_due`) o JSONL (un document per línia).",
+    "bulk_import_button": "Importa",
+    "bulk_import_result": "Files processades: {processed} · Inserides: {inserted} · Errors: {errors}",
+    "bulk_import_errors": "Files amb errors",
+    "bulk_export_subheader": "Exporta",
+    "bulk_export_format": "Format",
+    "bulk_export_prepare": "Prepara l'exportació",
+    "bulk_export_download": "Descarrega {filename}",
+    "bulk_export_result": "{count} registres exportats.",
+
+    "debug_title": "🛠️ Depuració",
+    "debug_run_time": "Temps d'execució de la pàgina",
+    "debug_run_calls": "Crides d'aquesta execució",
+    "debug_totals": "Totals del procés",
+    "debug_pages": "Pàgines",
+    "debug_download": "Descarrega mètriques (Prometheus)",
+    "col_operation": "Operació",
+    "col_calls": "Crides",
+    "col_ms": "ms",
+    "col_mean_ms": "ms (mitjana)",
+    "col_max_ms": "ms (màx.)",
+    "col_documents": "Documents",
+    "col_kib": "KiB",
+    "col_errors": "Errors",
 }
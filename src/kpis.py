@@ -0,0 +1,121 @@
+# src/kpis.py
+
+from collections import defaultdict
+
+from src.cache import TTLCache
+from src.config import get_setting
+from src.database import db_connection, local_snapshot, serving_from_snapshot
+from src.metrics import instrumented, record_error, register_collector
+from src.models import FleetKpis, LocationSummary, VehicleOpenCost
+
+KPI_CACHE_TTL_SECONDS = get_setting("KPI_CACHE_TTL_SECONDS", 60, float)
+TOP_OPEN_COSTS = 10
+
+kpi_cache = TTLCache(ttl_seconds=KPI_CACHE_TTL_SECONDS)
+register_collector("kpi_cache", kpi_cache.stats)
+
+# One pass over the vehicles collection, split into the summaries. Open work-order
+# costs come from the totals kept on each vehicle, so no work order is read.
+VEHICLE_KPI_PIPELINE = [
+    {"$facet": {
+        "availability": [
+            {"$group": {"_id": "$is_available", "count": {"$sum": 1}}},
+        ],
+        "by_location": [
+            {"$group": {
+                "_id": "$location",
+                "vehicles": {"$sum": 1},
+                "available": {"$sum": {"$cond": ["$is_available", 1, 0]}},
+            }},
+            {"$sort": {"vehicles": -1, "_id": 1}},
+        ],
+        "repairs": [
+            {"$match": {"non_running_details": {"$ne": None}}},
+            {"$group": {
+                "_id": None,
+                "budget": {"$sum": "$non_running_details.estimated_budget"},
+                "vehicles": {"$sum": 1},
+            }},
+        ],
+        "open_cost": [
+            {"$group": {"_id": None, "total": {"$sum": "$work_order_totals.open_cost"}}},
+        ],
+        "open_costs": [
+            {"$match": {"work_order_totals.open_orders": {"$gt": 0}}},
+            {"$sort": {"work_order_totals.open_cost": -1}},
+            {"$limit": TOP_OPEN_COSTS},
+            {"$project": {
+                "_id": 0,
+                "vehicle_id": "$_id",
+                "alias": 1,
+                "open_orders": "$work_order_totals.open_orders",
+                "open_cost": "$work_order_totals.open_cost",
+            }},
+        ],
+    }},
+]
+
+
+def _compute_fleet_kpis() -> FleetKpis:
+    facets = next(db_connection.vehicle_collection.aggregate(VEHICLE_KPI_PIPELINE))
+    availability = {row["_id"]: row["count"] for row in facets["availability"]}
+    repairs = facets["repairs"][0] if facets["repairs"] else {"budget": 0.0, "vehicles": 0}
+
+    return FleetKpis(
+        available=availability.get(True, 0),
+        unavailable=sum(count for key, count in availability.items() if key is not True),
+        repair_budget=repairs["budget"],
+        vehicles_in_repair=repairs["vehicles"],
+        open_work_order_cost=facets["open_cost"][0]["total"] if facets["open_cost"] else 0.0,
+        by_location=[
+            LocationSummary(location=row["_id"], vehicles=row["vehicles"], available=row["available"])
+            for row in facets["by_location"]
+        ],
+        open_costs=[VehicleOpenCost.model_validate(row) for row in facets["open_costs"]],
+    )
+
+
+def _compute_fleet_kpis_from_snapshot() -> FleetKpis:
+    """The same KPIs computed in Python over the vehicles in the local snapshot."""
+    vehicles = local_snapshot.vehicles()
+    locations = defaultdict(lambda: [0, 0])
+    for doc in vehicles:
+        locations[doc["location"]][0] += 1
+        locations[doc["location"]][1] += bool(doc.get("is_available"))
+    in_repair = [doc["non_running_details"] for doc in vehicles if doc.get("non_running_details")]
+
+    totals = [(doc, doc.get("work_order_totals") or {}) for doc in vehicles]
+    open_costs = sorted(
+        (
+            VehicleOpenCost(vehicle_id=doc["_id"], alias=doc["alias"], open_orders=total["open_orders"], open_cost=total["open_cost"])
+            for doc, total in totals if total.get("open_orders")
+        ),
+        key=lambda row: -row.open_cost,
+    )
+
+    available = sum(count[1] for count in locations.values())
+    return FleetKpis(
+        available=available,
+        unavailable=len(vehicles) - available,
+        repair_budget=sum(details["estimated_budget"] for details in in_repair),
+        vehicles_in_repair=len(in_repair),
+        open_work_order_cost=sum(total.get("open_cost", 0.0) for _, total in totals),
+        by_location=[
+            LocationSummary(location=location, vehicles=count[0], available=count[1])
+            for location, count in sorted(locations.items(), key=lambda item: (-item[1][0], item[0]))
+        ],
+        open_costs=open_costs[:TOP_OPEN_COSTS],
+    )
+
+
+@instrumented("db.get_fleet_kpis")
+def get_fleet_kpis() -> FleetKpis:
+    """Returns the fleet KPIs, recomputed in the database at most once per cache TTL."""
+    try:
+        if serving_from_snapshot():
+            return _compute_fleet_kpis_from_snapshot()
+        return kpi_cache.get("fleet", _compute_fleet_kpis)
+    except Exception as e:
+        record_error()
+        print(f"An error occurred while computing fleet KPIs: {e}")
+        return FleetKpis()
@@ -0,0 +1,213 @@
+# src/live.py
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+import streamlit as st
+from pymongo.errors import OperationFailure, PyMongoError
+
+from src.config import get_setting
+from src.database import db_connection, utc_now, vehicle_cache, vehicle_from_doc
+
+LIVE_POLL_INTERVAL_SECONDS = get_setting("LIVE_POLL_INTERVAL_SECONDS", 5, float)
+# Sessions check the fleet state this often; also used by the page fragments.
+LIVE_REFRESH_SECONDS = get_setting("LIVE_REFRESH_SECONDS", 10, float)
+
+# Polls re-read this much history so writes from app servers with slightly skewed
+# clocks, or still in flight at the previous poll, are not missed.
+POLL_OVERLAP = timedelta(seconds=5)
+
+# Marks a change whose owner is unknown (e.g. a deleted work order); sessions
+# treat it as "everything may have changed".
+ALL = "*"
+
+WATCHED_COLLECTIONS = ("vehicles", "work_orders")
+
+# Server error codes meaning $changeStream is not available at all, as opposed
+# to a stream that failed: 40573 (standalone server) and 115 (CommandNotSupported).
+CHANGE_STREAMS_UNSUPPORTED_CODES = (40573, 115)
+
+
+def change_streams_unsupported(error: OperationFailure) -> bool:
+    """Whether `error` says the server cannot run change streams, rather than a stream failing once."""
+    return error.code in CHANGE_STREAMS_UNSUPPORTED_CODES or "only supported on replica sets" in str(error)
+
+
+class FleetState:
+    """
+    Shared in-memory log of what changed in the fleet, fed by the FleetWatcher.
+    Sessions remember the version they last saw and ask which vehicles changed since.
+    """
+
+    def __init__(self, max_changes: int = 10000):
+        self.version = 0
+        # Changes recorded per collection, e.g. to tag HTTP responses built from one of them.
+        self.collection_versions = dict.fromkeys(WATCHED_COLLECTIONS, 0)
+        self._changes = deque(maxlen=max_changes)
+        self._lock = threading.Lock()
+
+    def record(self, collection: str, vehicle_id: str) -> None:
+        with self._lock:
+            self.version += 1
+            self.collection_versions[collection] += 1
+            self._changes.append((self.version, collection, vehicle_id))
+
+    def changes_since(self, version: int) -> Tuple[int, Optional[Dict[str, Set[str]]]]:
+        """
+        Returns the current version and, per collection, the ids of the vehicles
+        touched after `version`. The dict is None when the log no longer reaches
+        back that far and the caller should reload everything.
+        """
+        with self._lock:
+            if self._changes and self._changes[0][0] > version + 1:
+                return self.version, None
+            changed = {collection: set() for collection in WATCHED_COLLECTIONS}
+            for change_version, collection, vehicle_id in reversed(self._changes):
+                if change_version <= version:
+                    break
+                changed[collection].add(vehicle_id)
+            return self.version, changed
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class FleetWatcher:
+    """
+    Background thread that pushes vehicle and work-order changes into the shared
+    FleetState and the vehicle snapshot cache. Uses a change stream when the
+    server supports one, and otherwise polls `updated_at` and the deletion tombstones.
+    """
+
+    def __init__(self, state: FleetState, poll_interval: float):
+        self.state = state
+        self.poll_interval = poll_interval
+        self.mode = "stopped"
+        self._thread = None
+        self._lock = threading.Lock()
+        self._resume_token = None
+        self._high_water_mark = utc_now()
+        self._last_seen: Dict[Tuple[str, str], datetime] = {}
+
+    # --- Applying deltas ---
+    def _apply_vehicle(self, vehicle_id: str, doc: Optional[dict]) -> None:
+        if doc is None:
+            vehicle_cache.remove(vehicle_id)
+        else:
+            vehicle_cache.put(vehicle_id, vehicle_from_doc(doc))
+        self.state.record("vehicles", vehicle_id)
+
+    def _apply_work_order(self, doc: Optional[dict]) -> None:
+        vehicle_id = str(doc["vehicle_id"]) if doc else ALL
+        self.state.record("work_orders", vehicle_id)
+
+    # --- Change streams ---
+    def _watch(self) -> None:
+        pipeline = [{"$match": {"ns.coll": {"$in": list(WATCHED_COLLECTIONS)}}}]
+        with db_connection.db.watch(
+            pipeline, full_document="updateLookup", resume_after=self._resume_token
+        ) as stream:
+            self.mode = "change_stream"
+            for change in stream:
+                self._resume_token = stream.resume_token
+                collection = change["ns"]["coll"]
+                operation = change["operationType"]
+                doc = change.get("fullDocument")
+                if collection == "vehicles":
+                    vehicle_id = str(change["documentKey"]["_id"])
+                    self._apply_vehicle(vehicle_id, None if operation == "delete" else doc)
+                elif operation in ("insert", "update", "replace", "delete"):
+                    self._apply_work_order(doc)
+
+    # --- Polling fallback ---
+    def _is_new(self, collection: str, doc_id, stamp: datetime) -> bool:
+        key = (collection, str(doc_id))
+        if self._last_seen.get(key) == stamp:
+            return False
+        self._last_seen[key] = stamp
+        return True
+
+    def _poll_once(self) -> None:
+        since = self._high_water_mark - POLL_OVERLAP
+        newest = self._high_water_mark
+        for collection in WATCHED_COLLECTIONS:
+            for doc in db_connection.db[collection].find({"updated_at": {"$gt": since}}).sort("updated_at", 1):
+                stamp = _as_utc(doc["updated_at"])
+                newest = max(newest, stamp)
+                if not self._is_new(collection, doc["_id"], stamp):
+                    continue
+                if collection == "vehicles":
+                    self._apply_vehicle(str(doc["_id"]), doc)
+                else:
+                    self._apply_work_order(doc)
+        for tombstone in db_connection.db["deletions"].find({"deleted_at": {"$gt": since}}):
+            stamp = _as_utc(tombstone["deleted_at"])
+            newest = max(newest, stamp)
+            if self._is_new("deletions", tombstone["_id"], stamp) and tombstone["collection"] == "vehicles":
+                self._apply_vehicle(str(tombstone["doc_id"]), None)
+        self._high_water_mark = newest
+        # Anything older than the overlap window can no longer be re-read.
+        cutoff = newest - POLL_OVERLAP
+        self._last_seen = {key: stamp for key, stamp in self._last_seen.items() if stamp >= cutoff}
+
+    def _poll(self) -> None:
+        self.mode = "polling"
+        while True:
+            self._poll_once()
+            time.sleep(self.poll_interval)
+
+    def _run(self) -> None:
+        use_change_streams = True
+        while True:
+            try:
+                if use_change_streams:
+                    self._watch()
+                else:
+                    self._poll()
+            except OperationFailure as e:
+                if use_change_streams and change_streams_unsupported(e):
+                    # Standalone servers and some mocks reject $changeStream.
+                    print(f"ℹ️ Change streams unavailable ({e}); polling for fleet changes instead.")
+                    use_change_streams = False
+                    continue
+                print(f"❌ Fleet watcher error: {e}")
+                if use_change_streams:
+                    # The stream could not resume (e.g. history lost); start over from a clean slate.
+                    self._resume_token = None
+                    vehicle_cache.invalidate()
+                    self.state.record("vehicles", ALL)
+                    self.state.record("work_orders", ALL)
+            except (PyMongoError, AttributeError, TypeError) as e:
+                # AttributeError/TypeError: no database connection yet.
+                print(f"❌ Fleet watcher error: {e}")
+            self.mode = "retrying"
+            time.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        """Starts the watcher thread once per process; later calls do nothing."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="fleet-watcher", daemon=True)
+                self._thread.start()
+
+
+fleet_state = FleetState()
+fleet_watcher = FleetWatcher(fleet_state, poll_interval=LIVE_POLL_INTERVAL_SECONDS)
+
+
+def vehicles_changed_since(session_key: str) -> Optional[Dict[str, Set[str]]]:
+    """
+    Returns what changed since this session last asked, and remembers the new version
+    in `st.session_state[session_key]`. None means "reload everything".
+    """
+    last_version = st.session_state.get(session_key)
+    if last_version is None:
+        st.session_state[session_key] = fleet_state.version
+        return {collection: set() for collection in WATCHED_COLLECTIONS}
+    version, changed = fleet_state.changes_since(last_version)
+    st.session_state[session_key] = version
+    return changed
@@ -0,0 +1,339 @@
+# src/metrics.py
+
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+import bson
+from pymongo import monitoring
+
+from src.config import get_setting
+from src.models import Page
+
+# Port of the Prometheus /metrics endpoint; 0 leaves it off.
+METRICS_PORT = get_setting("METRICS_PORT", 0, int)
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Call:
+    """One instrumented call: its latency and what it moved over the wire."""
+
+    __slots__ = ("name", "seconds", "documents", "bytes", "commands", "errors")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.documents = 0
+        self.bytes = 0
+        self.commands = 0
+        self.errors = 0
+
+
+class Series:
+    """Running totals and a latency histogram for one operation or page."""
+
+    __slots__ = ("calls", "errors", "documents", "bytes", "commands", "seconds", "max_seconds", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.documents = 0
+        self.bytes = 0
+        self.commands = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, call: Call) -> None:
+        self.calls += 1
+        self.errors += call.errors
+        self.documents += call.documents
+        self.bytes += call.bytes
+        self.commands += call.commands
+        self.seconds += call.seconds
+        self.max_seconds = max(self.max_seconds, call.seconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, call.seconds)] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "documents": self.documents,
+            "bytes": self.bytes,
+            "commands": self.commands,
+            "mean_ms": self.seconds / self.calls * 1000 if self.calls else 0.0,
+            "max_ms": self.max_seconds * 1000,
+        }
+
+
+class PageRun:
+    """The calls made during one script run of a page, for the debug sidebar."""
+
+    def __init__(self, page: str):
+        self.page = page
+        self.started = time.perf_counter()
+        self.seconds: Optional[float] = None
+        self.calls: List[Call] = []
+        self._token = None
+
+
+class MetricsRegistry:
+    """Process-wide latency, document and byte counters, exportable as Prometheus text."""
+
+    def __init__(self):
+        self._operations: Dict[str, Series] = {}
+        self._pages: Dict[str, Series] = {}
+        self._collectors: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, table: Dict[str, Series], name: str, call: Call) -> None:
+        with self._lock:
+            series = table.get(name)
+            if series is None:
+                series = table[name] = Series()
+            series.observe(call)
+
+    def observe_operation(self, call: Call) -> None:
+        self._observe(self._operations, call.name, call)
+
+    def observe_page(self, page: str, seconds: float) -> None:
+        call = Call(page)
+        call.seconds = seconds
+        self._observe(self._pages, page, call)
+
+    def register_collector(self, name: str, collector: Callable[[], dict]) -> None:
+        """Adds a callable whose numeric values are exported as gauges, e.g. a cache's stats()."""
+        self._collectors[name] = collector
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "operations": {name: series.as_dict() for name, series in self._operations.items()},
+                "pages": {name: series.as_dict() for name, series in self._pages.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            self._render_histogram(lines, "fleet_operation_duration_seconds", "operation", self._operations,
+                                   "Latency of instrumented database and upload calls.")
+            self._render_counter(lines, "fleet_operation_errors_total", "operation", self._operations, "errors",
+                                 "Calls that raised or had a database command fail.")
+            self._render_counter(lines, "fleet_operation_documents_total", "operation", self._operations, "documents",
+                                 "Documents returned by instrumented calls.")
+            self._render_counter(lines, "fleet_operation_bytes_total", "operation", self._operations, "bytes",
+                                 "Bytes received from the database or sent to the upload backend.")
+            self._render_counter(lines, "fleet_operation_commands_total", "operation", self._operations, "commands",
+                                 "Database commands issued by instrumented calls.")
+            self._render_histogram(lines, "fleet_page_run_duration_seconds", "page", self._pages,
+                                   "Wall time of complete page script runs.")
+        for name, collector in list(self._collectors.items()):
+            try:
+                values = collector()
+            except Exception as e:
+                print(f"An error occurred while collecting '{name}' metrics: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (bool, int, float)):
+                    lines.append(f"# TYPE fleet_{name}_{key} gauge")
+                    lines.append(f"fleet_{name}_{key} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(lines: List[str], metric: str, label: str, table: Dict[str, Series], help_text: str) -> None:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, series in sorted(table.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, series.buckets):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {series.calls}')
+            lines.append(f'{metric}_sum{{{label}="{name}"}} {series.seconds}')
+            lines.append(f'{metric}_count{{{label}="{name}"}} {series.calls}')
+
+    @staticmethod
+    def _render_counter(lines: List[str], metric: str, label: str, table: Dict[str, Series], field: str, help_text: str) -> None:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for name, series in sorted(table.items()):
+            lines.append(f'{metric}{{{label}="{name}"}} {getattr(series, field)}')
+
+
+metrics = MetricsRegistry()
+_current_call: contextvars.ContextVar[Optional[Call]] = contextvars.ContextVar("current_call", default=None)
+_current_run: contextvars.ContextVar[Optional[PageRun]] = contextvars.ContextVar("current_run", default=None)
+
+
+def _count_documents(result: Any) -> int:
+    """Documents in a call's result, whatever shape the data layer returns them in."""
+    if result is None or isinstance(result, (bool, int, float, str, bytes)):
+        return 0
+    if isinstance(result, Page):
+        return len(result.items)
+    if isinstance(result, dict):
+        if isinstance(result.get("id"), list):
+            # Column layout, e.g. get_vehicle_table: one row per id.
+            return len(result["id"])
+        if result and all(isinstance(value, list) for value in result.values()):
+            # Lists per key, e.g. get_work_orders_for_vehicles.
+            return sum(len(value) for value in result.values())
+        return len(result)
+    if isinstance(result, (list, tuple, set)):
+        return len(result)
+    # A single model or record, e.g. get_vehicle.
+    return 1
+
+
+def instrumented(name: str):
+    """Decorator recording latency, documents returned, bytes and errors of every call under `name`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            call = Call(name)
+            token = _current_call.set(call)
+            started = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+                call.documents = _count_documents(result)
+                return result
+            except Exception:
+                call.errors += 1
+                raise
+            finally:
+                call.seconds = time.perf_counter() - started
+                _current_call.reset(token)
+                metrics.observe_operation(call)
+                run = _current_run.get()
+                if run is not None:
+                    run.calls.append(call)
+        return wrapper
+    return decorator
+
+
+def record_error() -> None:
+    """
+    Marks the instrumented call in progress, if any, as failed. For the data layer
+    functions that catch their errors and return an empty result instead of raising.
+    A failed command already counted by the listener is not counted twice.
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.errors = max(call.errors, 1)
+
+
+def add_bytes(count: int) -> None:
+    """Adds to the bytes transferred by the instrumented call in progress, if any."""
+    call = _current_call.get()
+    if call is not None:
+        call.bytes += count
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Attributes MongoDB command reply sizes and failures to the instrumented call
+    that issued them. Commands outside any call (health checks, the live watcher)
+    are recorded under `mongo.<command>`.
+    """
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        size = len(bson.encode(event.reply))
+        call = _current_call.get()
+        if call is not None:
+            call.commands += 1
+            call.bytes += size
+            return
+        background = Call(f"mongo.{event.command_name}")
+        background.seconds = event.duration_micros / 1_000_000
+        background.commands = 1
+        background.bytes = size
+        metrics.observe_operation(background)
+
+    def failed(self, event) -> None:
+        call = _current_call.get()
+        if call is not None:
+            call.commands += 1
+            call.errors += 1
+            return
+        background = Call(f"mongo.{event.command_name}")
+        background.seconds = event.duration_micros / 1_000_000
+        background.commands = 1
+        background.errors = 1
+        metrics.observe_operation(background)
+
+
+command_listener = CommandMetricsListener()
+
+
+# --- PAGE RUNS ---
+def start_page_run(page: str) -> PageRun:
+    """Starts timing a page's script run; instrumented calls made during it are kept on the run."""
+    run = PageRun(page)
+    run._token = _current_run.set(run)
+    return run
+
+
+def finish_page_run(run: PageRun) -> PageRun:
+    """
+    Records the run's total time. Runs cut short by st.rerun or st.stop never get
+    here, so only complete runs are counted.
+    """
+    run.seconds = time.perf_counter() - run.started
+    try:
+        _current_run.reset(run._token)
+    except ValueError:
+        # Reset from a different context (e.g. a fragment rerun); just stop collecting.
+        _current_run.set(None)
+    metrics.observe_page(run.page, run.seconds)
+    return run
+
+
+def register_collector(name: str, collector: Callable[[], dict]) -> None:
+    metrics.register_collector(name, collector)
+
+
+# --- PROMETHEUS ENDPOINT ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> None:
+    """Serves /metrics on `port` from a daemon thread, once per process. A port of 0 disables it."""
+    global _server
+    if not port:
+        return
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError as e:
+            print(f"❌ Could not start the metrics endpoint on port {port}: {e}")
+            _server = False
+            return
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"📈 Metrics available at http://0.0.0.0:{port}/metrics")
@@ -1,5 +1,6 @@
 # src/models.py
 
+from dataclasses import dataclass
 from datetime import date, datetime
 from enum import Enum
 from typing import List, Optional, Any
@@ -29,6 +30,24 @@ class NonRunningDetails(BaseModel):
     estimated_budget: float
     eta: datetime
 
+class WorkOrderTotals(BaseModel):
+    """
+    Running totals of a vehicle's work orders, kept on the vehicle document by the
+    work-order writes so spend views never have to scan the orders themselves.
+    """
+    open_orders: int = 0
+    open_cost: float = 0.0
+    total_cost: float = 0.0  # every order, open ones included
+    last_service_date: Optional[datetime] = None  # latest completion date
+
+def _is_available(condition: "VehicleCondition", documentation: Any) -> bool:
+    today = date.today()
+    docs_are_valid = (
+        documentation.inspection_due.date() > today and
+        documentation.tax_due.date() > today
+    )
+    return condition == VehicleCondition.RUNNING and docs_are_valid
+
 # =============================================================================
 # 2. Main Vehicle Model
 # =============================================================================
@@ -45,6 +64,7 @@ class Vehicle(BaseModel):
     non_running_details: Optional[NonRunningDetails] = None
     documentation: Documentation
     location: str
+    work_order_totals: WorkOrderTotals = Field(default_factory=WorkOrderTotals)
 
     @model_validator(mode='before')
     @classmethod
@@ -63,11 +83,13 @@ class Vehicle(BaseModel):
     @property
     def is_available(self) -> bool:
         """A vehicle is available if its condition is 'Running' and docs are current."""
-        docs_are_valid = (
-            self.documentation.inspection_due.date() > date.today() and
-            self.documentation.tax_due.date() > date.today()
-        )
-        return self.condition == VehicleCondition.RUNNING and docs_are_valid
+        return _is_available(self.condition, self.documentation)
+
+    @computed_field
+    @property
+    def next_expiry(self) -> datetime:
+        """The earlier of the ITV and road tax due dates; stored so expiries can be queried by index."""
+        return min(self.documentation.inspection_due, self.documentation.tax_due)
 
     class Config:
         """Pydantic model configuration for MongoDB compatibility."""
@@ -84,7 +106,7 @@ class WorkOrder(BaseModel):
     id: ObjectId = Field(default_factory=ObjectId, alias="_id")
     vehicle_id: ObjectId
     title: str
-    description: str
+    description: str = ""
     cost: float = 0.0
     start_date: datetime
     completion_date: Optional[datetime] = None
@@ -92,9 +114,214 @@ class WorkOrder(BaseModel):
     eta_is_tbd: bool = False        # Add TBD flag
     tasks: List[str] = []
     is_complete: bool = False
+    # Archived orders keep only this summary; description and tasks live in work_orders_archive.
+    is_archived: bool = False
 
     class Config:
         populate_by_name = True
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
         serialize_as_any = True
+
+# =============================================================================
+# 4. Query Results
+# =============================================================================
+
+class Page(BaseModel):
+    """A single page of query results plus the token needed to fetch the next one."""
+    items: List[Any]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+@dataclass(slots=True)
+class VehicleRef:
+    """Just enough of a vehicle to list it in a selector; read straight from the alias index."""
+    id: str
+    alias: str
+    location: str
+
+    @property
+    def label(self) -> str:
+        # Aliases are not unique, so the location helps tell vehicles apart.
+        return f"{self.alias} · {self.location}"
+
+
+class ExpiryAlert(BaseModel):
+    """One ITV or road tax due date inside the alert window; negative `days_left` means it has lapsed."""
+    vehicle_id: str
+    alias: str
+    location: str
+    document: str  # "inspection_due" or "tax_due"
+    due: datetime
+    days_left: int
+
+
+# =============================================================================
+# 5. Bulk Operation Reports
+# =============================================================================
+
+class RowError(BaseModel):
+    """A row that could not be imported, numbered from 1 in input order."""
+    row: int
+    message: str
+
+
+class ImportReport(BaseModel):
+    """Summary of a bulk import run."""
+    processed: int = 0
+    inserted: int = 0
+    errors: List[RowError] = []
+
+
+class VehicleUpdateResult(BaseModel):
+    """Outcome for one vehicle of a bulk update; `message` explains a failure."""
+    vehicle_id: str
+    updated: bool = False
+    message: Optional[str] = None
+
+
+class BulkUpdateReport(BaseModel):
+    """Summary of a bulk vehicle update, with one result per requested vehicle in request order."""
+    matched: int = 0
+    modified: int = 0
+    results: List[VehicleUpdateResult] = []
+
+    @property
+    def failed(self) -> List[VehicleUpdateResult]:
+        return [result for result in self.results if not result.updated]
+
+# =============================================================================
+# 6. Trusted Read Records
+# =============================================================================
+# Lightweight, slotted stand-ins for the models above, built straight from stored
+# documents with no validation. They expose the same attributes as the models and
+# are only meant for data this app already validated on write.
+
+_CONDITIONS = {c.value: c for c in VehicleCondition}
+
+
+@dataclass(slots=True)
+class DocumentationRecord:
+    inspection_due: datetime
+    tax_due: datetime
+
+
+@dataclass(slots=True)
+class NonRunningDetailsRecord:
+    explanation: str
+    estimated_budget: float
+    eta: datetime
+
+
+@dataclass(slots=True)
+class WorkOrderTotalsRecord:
+    open_orders: int
+    open_cost: float
+    total_cost: float
+    last_service_date: Optional[datetime]
+
+
+@dataclass(slots=True)
+class VehicleRecord:
+    id: ObjectId
+    alias: str
+    photo_url: Optional[str]
+    condition: VehicleCondition
+    non_running_details: Optional[NonRunningDetailsRecord]
+    documentation: DocumentationRecord
+    location: str
+    work_order_totals: WorkOrderTotalsRecord
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "VehicleRecord":
+        documentation = doc["documentation"]
+        details = doc.get("non_running_details")
+        totals = doc.get("work_order_totals") or {}
+        return cls(
+            doc["_id"],
+            doc["alias"],
+            doc.get("photo_url"),
+            _CONDITIONS[doc["condition"]],
+            NonRunningDetailsRecord(details["explanation"], details["estimated_budget"], details["eta"]) if details else None,
+            DocumentationRecord(documentation["inspection_due"], documentation["tax_due"]),
+            doc["location"],
+            WorkOrderTotalsRecord(
+                totals.get("open_orders", 0),
+                totals.get("open_cost", 0.0),
+                totals.get("total_cost", 0.0),
+                totals.get("last_service_date"),
+            ),
+        )
+
+    @property
+    def is_available(self) -> bool:
+        return _is_available(self.condition, self.documentation)
+
+    @property
+    def next_expiry(self) -> datetime:
+        return min(self.documentation.inspection_due, self.documentation.tax_due)
+
+
+@dataclass(slots=True)
+class WorkOrderRecord:
+    id: ObjectId
+    vehicle_id: ObjectId
+    title: str
+    description: str
+    cost: float
+    start_date: datetime
+    completion_date: Optional[datetime]
+    eta: Optional[datetime]
+    eta_is_tbd: bool
+    tasks: List[str]
+    is_complete: bool
+    is_archived: bool
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "WorkOrderRecord":
+        return cls(
+            doc["_id"],
+            doc["vehicle_id"],
+            doc["title"],
+            doc.get("description", ""),
+            doc.get("cost", 0.0),
+            doc["start_date"],
+            doc.get("completion_date"),
+            doc.get("eta"),
+            doc.get("eta_is_tbd", False),
+            doc.get("tasks", []),
+            doc.get("is_complete", False),
+            doc.get("is_archived", False),
+        )
+
+
+# =============================================================================
+# 7. Fleet KPIs
+# =============================================================================
+
+class LocationSummary(BaseModel):
+    location: str
+    vehicles: int
+    available: int
+
+
+class VehicleOpenCost(BaseModel):
+    vehicle_id: ObjectId
+    alias: Optional[str] = None
+    open_orders: int
+    open_cost: float
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class FleetKpis(BaseModel):
+    """Headline fleet numbers, computed by aggregation pipelines in the database."""
+    available: int = 0
+    unavailable: int = 0
+    repair_budget: float = 0.0
+    vehicles_in_repair: int = 0
+    open_work_order_cost: float = 0.0
+    by_location: List[LocationSummary] = []
+    open_costs: List[VehicleOpenCost] = []
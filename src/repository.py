@@ -0,0 +1,140 @@
+# src/repository.py
+
+from datetime import datetime
+from typing import Dict, List, Optional, Protocol
+
+from src import database, kpis
+from src.config import get_setting
+from src.embedded import SQLiteRepository
+from src.live import fleet_state
+from src.metrics import register_collector
+from src.models import BulkUpdateReport, FleetKpis, Page, Vehicle, VehicleRef, WorkOrder
+
+# "mongo" (the default) or "sqlite", which needs no database server.
+STORAGE_BACKEND = get_setting("STORAGE_BACKEND", "mongo")
+# Database file of the sqlite backend; ":memory:" keeps everything in memory, e.g. for tests.
+SQLITE_PATH = get_setting("SQLITE_PATH", "fleet.sqlite3")
+
+
+class FleetRepository(Protocol):
+    """
+    Everything the pages, jobs and tools read or write about vehicles and work orders.
+    Implementations behave like the functions in src.database: errors are printed
+    and an empty result is returned instead of raising.
+    """
+
+    def status(self) -> dict:
+        """Backend health for the pages: at least `healthy` and `degraded`."""
+        ...
+
+    # --- Vehicles ---
+    def get_all_vehicles(self) -> List[Vehicle]: ...
+
+    def find_vehicles(
+        self,
+        condition: Optional[str] = None,
+        location: Optional[str] = None,
+        available: Optional[bool] = None,
+        projection: Optional[List[str]] = None,
+        sort: str = "alias",
+        descending: bool = False,
+        limit: int = 20,
+        skip: int = 0,
+        cursor: Optional[str] = None,
+        with_total: bool = False,
+    ) -> Page: ...
+
+    def get_vehicle_table(
+        self,
+        condition: Optional[str] = None,
+        location: Optional[str] = None,
+        available: Optional[bool] = None,
+    ) -> Dict[str, list]: ...
+
+    def get_vehicles_by_ids(self, vehicle_ids: List[str]) -> Dict[str, Vehicle]: ...
+
+    def get_vehicle(self, vehicle_id: str) -> Optional[Vehicle]: ...
+
+    def get_vehicle_refs(self, search: Optional[str] = None, limit: int = 0) -> List[VehicleRef]: ...
+
+    def get_expiring_vehicles(self, before: datetime, since: Optional[datetime] = None) -> List[Vehicle]: ...
+
+    def get_vehicle_locations(self) -> List[str]: ...
+
+    def add_vehicle(self, vehicle: Vehicle) -> str: ...
+
+    def update_vehicle(self, vehicle_id: str, updates: dict) -> Optional[Vehicle]: ...
+
+    def bulk_update_vehicles(self, updates: Dict[str, dict]) -> BulkUpdateReport: ...
+
+    def refresh_availability(self) -> int: ...
+
+    def get_availability_counts(self) -> dict: ...
+
+    def delete_vehicle(self, vehicle_id: str) -> bool: ...
+
+    def get_fleet_kpis(self) -> FleetKpis: ...
+
+    # --- Work orders ---
+    def add_work_order(self, work_order: WorkOrder) -> Optional[WorkOrder]: ...
+
+    def get_work_orders_for_vehicle(self, vehicle_id: str) -> List[WorkOrder]: ...
+
+    def get_work_orders_page(self, vehicle_id: str, limit: int = 20, cursor: Optional[str] = None) -> Page: ...
+
+    def get_work_orders_for_vehicles(self, vehicle_ids: List[str]) -> Dict[str, List[WorkOrder]]: ...
+
+    def complete_work_order(self, work_order_id: str, completion_date: Optional[datetime] = None) -> Optional[WorkOrder]: ...
+
+    def rebuild_work_order_totals(self, vehicle_ids: Optional[List[str]] = None, batch_size: int = 1000) -> int: ...
+
+    def archive_work_orders(self, older_than_days: float = database.WORK_ORDER_ARCHIVE_AFTER_DAYS, batch_size: int = 500) -> int: ...
+
+    def get_archived_work_order(self, work_order_id: str) -> Optional[WorkOrder]: ...
+
+
+class MongoRepository:
+    """The MongoDB functions of src.database and src.kpis, with their caches and local snapshot."""
+
+    status = staticmethod(database.get_connection_status)
+
+    get_all_vehicles = staticmethod(database.get_all_vehicles)
+    find_vehicles = staticmethod(database.find_vehicles)
+    get_vehicle_table = staticmethod(database.get_vehicle_table)
+    get_vehicles_by_ids = staticmethod(database.get_vehicles_by_ids)
+    get_vehicle = staticmethod(database.get_vehicle)
+    get_vehicle_refs = staticmethod(database.get_vehicle_refs)
+    get_expiring_vehicles = staticmethod(database.get_expiring_vehicles)
+    get_vehicle_locations = staticmethod(database.get_vehicle_locations)
+    add_vehicle = staticmethod(database.add_vehicle)
+    update_vehicle = staticmethod(database.update_vehicle)
+    bulk_update_vehicles = staticmethod(database.bulk_update_vehicles)
+    refresh_availability = staticmethod(database.refresh_availability)
+    get_availability_counts = staticmethod(database.get_availability_counts)
+    delete_vehicle = staticmethod(database.delete_vehicle)
+    get_fleet_kpis = staticmethod(kpis.get_fleet_kpis)
+
+    add_work_order = staticmethod(database.add_work_order)
+    get_work_orders_for_vehicle = staticmethod(database.get_work_orders_for_vehicle)
+    get_work_orders_page = staticmethod(database.get_work_orders_page)
+    get_work_orders_for_vehicles = staticmethod(database.get_work_orders_for_vehicles)
+    complete_work_order = staticmethod(database.complete_work_order)
+    rebuild_work_order_totals = staticmethod(database.rebuild_work_order_totals)
+    archive_work_orders = staticmethod(database.archive_work_orders)
+    get_archived_work_order = staticmethod(database.get_archived_work_order)
+
+
+def create_repository(backend: str = STORAGE_BACKEND, path: str = SQLITE_PATH) -> FleetRepository:
+    """Builds the repository for a storage backend. The mongo one does not connect until first used."""
+    if backend == "mongo":
+        return MongoRepository()
+    if backend == "sqlite":
+        # Writes go straight into the live fleet state: there is no other process to watch.
+        sqlite_repository = SQLiteRepository(path, on_change=fleet_state.record)
+        register_collector("sqlite", sqlite_repository.status)
+        return sqlite_repository
+    raise ValueError(f"Unknown storage backend '{backend}'.")
+
+
+# Shared by every session in this process.
+repository = create_repository()
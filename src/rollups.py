@@ -0,0 +1,25 @@
+# src/rollups.py
+
+import argparse
+import sys
+
+from src.repository import repository
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.rollups",
+        description="Recomputes the work-order totals kept on the vehicles from their work orders.",
+    )
+    parser.add_argument("--vehicle", action="append", dest="vehicle_ids", metavar="ID",
+                        help="Only this vehicle; can be repeated. Defaults to every vehicle.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    corrected = repository.rebuild_work_order_totals(args.vehicle_ids, batch_size=args.batch_size)
+    print(f"Corrected the work-order totals of {corrected} vehicles.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# src/scheduler.py
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict
+
+from src.alerts import write_expiry_digest
+from src.api import start_api_server
+from src.database import db_connection
+from src.live import fleet_watcher
+from src.metrics import start_metrics_server
+from src.repository import STORAGE_BACKEND, repository
+
+
+class DailyScheduler:
+    """
+    Runs registered jobs in a daemon thread: once when started, to catch up after
+    a restart, and then every day shortly after local midnight.
+    """
+
+    def __init__(self, delay_after_midnight: timedelta = timedelta(seconds=5)):
+        self.delay_after_midnight = delay_after_midnight
+        self._jobs: Dict[str, Callable[[], object]] = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, job: Callable[[], object]) -> None:
+        self._jobs[name] = job
+
+    def run_jobs(self) -> None:
+        for name, job in list(self._jobs.items()):
+            try:
+                result = job()
+                print(f"⏰ Scheduled job '{name}' finished: {result}")
+            except Exception as e:
+                print(f"❌ Scheduled job '{name}' failed: {e}")
+
+    def _seconds_until_next_run(self) -> float:
+        tomorrow = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+        return ((tomorrow + self.delay_after_midnight) - datetime.now()).total_seconds()
+
+    def _loop(self) -> None:
+        while True:
+            self.run_jobs()
+            time.sleep(max(self._seconds_until_next_run(), 1))
+
+    def start(self) -> None:
+        """Starts the scheduler thread once per process; later calls do nothing."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="daily-scheduler", daemon=True)
+                self._thread.start()
+
+
+daily_scheduler = DailyScheduler()
+daily_scheduler.register("refresh_availability", repository.refresh_availability)
+daily_scheduler.register("archive_work_orders", repository.archive_work_orders)
+# After refresh_availability, so the digest matches what the pages show.
+daily_scheduler.register("expiry_digest", write_expiry_digest)
+
+
+def start_background_jobs() -> None:
+    """Starts the process-wide background jobs. Every page calls this; only the first call does anything."""
+    if STORAGE_BACKEND == "mongo":
+        # The sqlite backend records its own writes in the fleet state; there is nothing to watch.
+        db_connection.start()
+        fleet_watcher.start()
+    daily_scheduler.start()
+    start_metrics_server()
+    start_api_server()
@@ -0,0 +1,168 @@
+# src/snapshot.py
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import bson
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vehicles (id TEXT PRIMARY KEY, doc BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS open_work_orders (id TEXT PRIMARY KEY, vehicle_id TEXT NOT NULL, doc BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS open_work_orders_vehicle ON open_work_orders (vehicle_id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class LocalSnapshot:
+    """
+    Local copy of the vehicles and the open work orders, stored as BSON blobs in a
+    SQLite file and held in memory once read. The database functions serve reads
+    from it while MongoDB is unreachable, or not reached yet after a restart, so
+    pages render immediately. It only ever changes through replace() and apply().
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.last_synced_at: Optional[datetime] = None
+        self._vehicles: Optional[Dict[str, dict]] = None
+        self._work_orders: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """One transaction on the snapshot file, committed on success and always closed."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                connection.executescript(SCHEMA)
+                yield connection
+        finally:
+            connection.close()
+
+    def _load(self) -> Dict[str, dict]:
+        # Caller holds the lock.
+        if self._vehicles is None:
+            self._vehicles = {}
+            if self.enabled and self.path.exists():
+                try:
+                    with self._connect() as connection:
+                        for vehicle_id, doc in connection.execute("SELECT id, doc FROM vehicles"):
+                            self._vehicles[vehicle_id] = bson.decode(doc)
+                        for order_id, doc in connection.execute("SELECT id, doc FROM open_work_orders"):
+                            self._work_orders[order_id] = bson.decode(doc)
+                        row = connection.execute("SELECT value FROM meta WHERE key = 'last_synced_at'").fetchone()
+                        self.last_synced_at = datetime.fromisoformat(row[0]) if row else None
+                except sqlite3.Error as e:
+                    print(f"❌ Could not read the local snapshot {self.path}: {e}")
+        return self._vehicles
+
+    def has_data(self) -> bool:
+        with self._lock:
+            return bool(self._load()) if self.enabled else False
+
+    # --- Writes ---
+    def replace(self, vehicles: Iterable[dict], work_orders: Iterable[dict], synced_at: datetime) -> None:
+        """Replaces the whole snapshot, e.g. on the first sync."""
+        vehicles = {str(doc["_id"]): doc for doc in vehicles}
+        work_orders = {str(doc["_id"]): doc for doc in work_orders if not doc.get("is_complete")}
+        with self._lock:
+            with self._connect() as connection:
+                connection.execute("DELETE FROM vehicles")
+                connection.execute("DELETE FROM open_work_orders")
+                self._write(connection, vehicles, work_orders, synced_at)
+            self._vehicles, self._work_orders = vehicles, work_orders
+            self.last_synced_at = synced_at
+
+    def apply(
+        self,
+        vehicles: Iterable[dict],
+        deleted_vehicle_ids: Iterable[str],
+        work_orders: Iterable[dict],
+        synced_at: datetime,
+    ) -> None:
+        """Applies the changes read since the last sync. Completed work orders are dropped."""
+        vehicles = {str(doc["_id"]): doc for doc in vehicles}
+        deleted = set(deleted_vehicle_ids)
+        open_orders, closed_ids = {}, set()
+        for doc in work_orders:
+            if doc.get("is_complete") or str(doc["vehicle_id"]) in deleted:
+                closed_ids.add(str(doc["_id"]))
+            else:
+                open_orders[str(doc["_id"])] = doc
+        with self._lock:
+            current = self._load()
+            closed_ids |= {
+                order_id for order_id, doc in self._work_orders.items() if str(doc["vehicle_id"]) in deleted
+            }
+            with self._connect() as connection:
+                connection.executemany("DELETE FROM vehicles WHERE id = ?", [(vehicle_id,) for vehicle_id in deleted])
+                connection.executemany("DELETE FROM open_work_orders WHERE id = ?", [(order_id,) for order_id in closed_ids])
+                self._write(connection, vehicles, open_orders, synced_at)
+            for vehicle_id in deleted:
+                current.pop(vehicle_id, None)
+            for order_id in closed_ids:
+                self._work_orders.pop(order_id, None)
+            current.update(vehicles)
+            self._work_orders.update(open_orders)
+            self.last_synced_at = synced_at
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, vehicles: Dict[str, dict], work_orders: Dict[str, dict], synced_at: datetime) -> None:
+        connection.executemany(
+            "INSERT OR REPLACE INTO vehicles (id, doc) VALUES (?, ?)",
+            [(vehicle_id, bson.encode(doc)) for vehicle_id, doc in vehicles.items()],
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO open_work_orders (id, vehicle_id, doc) VALUES (?, ?, ?)",
+            [(order_id, str(doc["vehicle_id"]), bson.encode(doc)) for order_id, doc in work_orders.items()],
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_synced_at', ?)", (synced_at.isoformat(),)
+        )
+
+    # --- Reads ---
+    def vehicles(
+        self,
+        condition: Optional[str] = None,
+        location: Optional[str] = None,
+        available: Optional[bool] = None,
+    ) -> List[dict]:
+        """Stored vehicle documents matching the filters, in no particular order."""
+        with self._lock:
+            docs = list(self._load().values())
+        return [
+            doc for doc in docs
+            if (not condition or doc.get("condition") == condition)
+            and (not location or doc.get("location") == location)
+            and (available is None or doc.get("is_available") == available)
+        ]
+
+    def vehicle(self, vehicle_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._load().get(vehicle_id)
+
+    def open_work_orders(self, vehicle_ids: Iterable[str]) -> List[dict]:
+        """Open work orders of the given vehicles, newest first."""
+        vehicle_ids = set(vehicle_ids)
+        with self._lock:
+            self._load()
+            docs = [doc for doc in self._work_orders.values() if str(doc["vehicle_id"]) in vehicle_ids]
+        return sorted(docs, key=lambda doc: (doc["start_date"], doc["_id"]), reverse=True)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "vehicles": len(self._vehicles or {}),
+                "open_work_orders": len(self._work_orders),
+                "last_synced_at": self.last_synced_at,
+            }
+
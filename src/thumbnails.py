@@ -0,0 +1,267 @@
+# src/thumbnails.py
+
+import hashlib
+import http.client
+import io
+import ipaddress
+import os
+import socket
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from PIL import Image, ImageOps
+
+from src.config import get_setting
+from src.metrics import instrumented, register_collector
+
+THUMBNAIL_CACHE_DIR = Path(get_setting("THUMBNAIL_CACHE_DIR", ".cache/thumbnails"))
+THUMBNAIL_CACHE_MAX_BYTES = get_setting("THUMBNAIL_CACHE_MAX_BYTES", 200 * 1024 * 1024, int)
+THUMBNAIL_FETCH_TIMEOUT_SECONDS = get_setting("THUMBNAIL_FETCH_TIMEOUT_SECONDS", 5, float)
+# A photo that could not be fetched gets the placeholder for this long before it is tried again.
+THUMBNAIL_RETRY_AFTER_SECONDS = get_setting("THUMBNAIL_RETRY_AFTER_SECONDS", 300, float)
+# Larger source images are refused rather than read into memory.
+THUMBNAIL_MAX_SOURCE_BYTES = get_setting("THUMBNAIL_MAX_SOURCE_BYTES", 20 * 1024 * 1024, int)
+# Same setting as src.uploader: the only local files a photo_url may point to.
+LOCAL_UPLOAD_DIR = Path(get_setting("LOCAL_UPLOAD_DIR", "uploads"))
+
+# Grid cards are at most ~400px wide; 4:3 like the stored photos.
+THUMBNAIL_SIZE = (400, 300)
+JPEG_QUALITY = 80
+PLACEHOLDER_PATH = str(Path(__file__).resolve().parent.parent / "assets" / "no_photo.png")
+
+
+# --- Fetching ---
+# photo_url is user-editable, so the server only follows it to public http(s)
+# hosts or to files of the local upload backend.
+def _check_remote_url(url: str) -> None:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"Only http(s) photo URLs are fetched, not '{url}'.")
+
+
+def _public_connection(address: tuple, timeout: float, source_address=None) -> socket.socket:
+    """
+    socket.create_connection for photo hosts. The name is resolved once, every
+    address must be public, and the socket connects to those same addresses, so a
+    second DNS answer cannot point the fetch at an internal host.
+    """
+    host, port = address
+    addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    for *_, sockaddr in addresses:
+        if not ipaddress.ip_address(sockaddr[0]).is_global:
+            raise ValueError(f"Refusing to fetch a photo from the internal address {sockaddr[0]}.")
+    error = None
+    for *_, sockaddr in addresses:
+        try:
+            return socket.create_connection((sockaddr[0], sockaddr[1]), timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error or OSError(f"No address found for {host}.")
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The hook connect() opens its socket with.
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    """Connects like _PublicHTTPConnection; the certificate is still checked against the host name."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req)
+
+
+def _local_photo_path(url: str) -> Path:
+    path = Path(url).resolve()
+    if not path.is_relative_to(LOCAL_UPLOAD_DIR.resolve()):
+        raise ValueError(f"Local photos must be inside {LOCAL_UPLOAD_DIR}, not '{url}'.")
+    return path
+
+
+class _CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Applies the same checks to every redirect target."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _check_remote_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# No proxies: the address check has to see the photo host itself.
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _PublicHTTPHandler, _PublicHTTPSHandler, _CheckedRedirectHandler
+)
+
+
+class ThumbnailCache:
+    """
+    On-disk cache of grid-sized thumbnails, one file per source URL.
+    Least recently used files are evicted once the total size exceeds `max_bytes`;
+    recency is kept in the files' mtime so it survives restarts.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._failures: Dict[str, float] = {}  # url -> when it may be tried again
+        self._entries: Optional[Dict[Path, List[float]]] = None  # path -> [size, last_used]
+
+    def _load_entries(self) -> Dict[Path, List[float]]:
+        if self._entries is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._entries = {}
+            for path in self.directory.glob("*.jpg"):
+                stat = path.stat()
+                self._entries[path] = [stat.st_size, stat.st_mtime]
+        return self._entries
+
+    def _path_for(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode()).hexdigest()}.jpg"
+
+    def _touch(self, path: Path) -> bool:
+        with self._lock:
+            entry = self._load_entries().get(path)
+            if entry is None:
+                return False
+            entry[1] = time.time()
+        try:
+            os.utime(path, (entry[1], entry[1]))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _add(self, path: Path, size: int) -> None:
+        with self._lock:
+            entries = self._load_entries()
+            entries[path] = [size, time.time()]
+            total = sum(entry[0] for entry in entries.values())
+            if total <= self.max_bytes:
+                return
+            for old_path, (old_size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+                if total <= self.max_bytes or old_path == path:
+                    continue
+                old_path.unlink(missing_ok=True)
+                del entries[old_path]
+                total -= old_size
+
+    def _fetch(self, url: str) -> bytes:
+        if "://" not in url:
+            # Photos stored by the local upload backend are plain file paths.
+            path = _local_photo_path(url)
+            if path.stat().st_size > THUMBNAIL_MAX_SOURCE_BYTES:
+                raise ValueError(f"The photo is larger than {THUMBNAIL_MAX_SOURCE_BYTES} bytes.")
+            return path.read_bytes()
+        _check_remote_url(url)
+        with _opener.open(url, timeout=THUMBNAIL_FETCH_TIMEOUT_SECONDS) as response:
+            data = response.read(THUMBNAIL_MAX_SOURCE_BYTES + 1)
+        if len(data) > THUMBNAIL_MAX_SOURCE_BYTES:
+            raise ValueError(f"The photo is larger than {THUMBNAIL_MAX_SOURCE_BYTES} bytes.")
+        return data
+
+    def _recently_failed(self, url: str) -> bool:
+        with self._lock:
+            retry_at = self._failures.get(url)
+            if retry_at is None:
+                return False
+            if retry_at > time.monotonic():
+                return True
+            del self._failures[url]
+            return False
+
+    def _record_failure(self, url: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._failures = {key: retry_at for key, retry_at in self._failures.items() if retry_at > now}
+            self._failures[url] = now + THUMBNAIL_RETRY_AFTER_SECONDS
+
+    def _render(self, data: bytes) -> bytes:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            image = ImageOps.fit(image, THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, "JPEG", quality=JPEG_QUALITY, optimize=True)
+            return output.getvalue()
+
+    def get(self, url: Optional[str]) -> str:
+        """Returns the local path of the thumbnail for `url`, creating it on first use."""
+        if not url:
+            return PLACEHOLDER_PATH
+        path = self._path_for(url)
+        if self._touch(path):
+            self.hits += 1
+            return str(path)
+        if self._recently_failed(url):
+            return PLACEHOLDER_PATH
+
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        with url_lock:
+            # Another session may have generated it while we waited.
+            if self._touch(path):
+                self.hits += 1
+                return str(path)
+            if self._recently_failed(url):
+                return PLACEHOLDER_PATH
+            self.misses += 1
+            try:
+                thumbnail = self._render(self._fetch(url))
+                temporary_path = path.with_suffix(".tmp")
+                temporary_path.write_bytes(thumbnail)
+                os.replace(temporary_path, path)
+                self._add(path, len(thumbnail))
+                return str(path)
+            except Exception as e:
+                print(f"An error occurred while creating a thumbnail for {url}: {e}")
+                self._record_failure(url)
+                return PLACEHOLDER_PATH
+            finally:
+                with self._lock:
+                    self._url_locks.pop(url, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._load_entries()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "files": len(entries),
+                "failed_urls": len(self._failures),
+                "bytes": sum(entry[0] for entry in entries.values()),
+            }
+
+
+thumbnail_cache = ThumbnailCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+register_collector("thumbnail_cache", thumbnail_cache.stats)
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="thumbnails")
+
+
+def get_thumbnail(photo_url: Optional[str]) -> str:
+    """Returns a local, grid-sized image path for a vehicle photo, or the bundled placeholder."""
+    return thumbnail_cache.get(photo_url)
+
+
+@instrumented("thumbnails.get_thumbnails")
+def get_thumbnails(photo_urls: List[Optional[str]]) -> List[str]:
+    """Like get_thumbnail for a whole page of cards, generating missing thumbnails in parallel."""
+    return list(_executor.map(thumbnail_cache.get, photo_urls))
@@ -1,32 +1,168 @@
 # src/uploader.py
+import hashlib
+import io
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Union
+
 import cloudinary
 import cloudinary.uploader
-import streamlit as st
+from PIL import Image, ImageOps
 
-cloudinary.config(
-    cloud_name=st.secrets["CLOUDINARY_CLOUD_NAME"],
-    api_key=st.secrets["CLOUDINARY_API_KEY"],
-    api_secret=st.secrets["CLOUDINARY_API_SECRET"],
-    secure=True
-)
+from src.config import get_setting
+from src.repository import repository
+from src.metrics import add_bytes, instrumented, register_collector
 
-def upload_image(file_to_upload, vehicle_alias: str) -> str:
-    """
-    Uploads and transforms an image file to Cloudinary, returning its secure URL.
-    """
-    try:
-        # Add a transformation to crop the image to a 4:3 aspect ratio
+UPLOAD_BACKEND = get_setting("UPLOAD_BACKEND", "cloudinary")
+UPLOAD_WORKERS = get_setting("UPLOAD_WORKERS", 4, int)
+LOCAL_UPLOAD_DIR = get_setting("LOCAL_UPLOAD_DIR", "uploads")
+
+# Photos are stored at the 4:3 size the overview cards use.
+IMAGE_SIZE = (800, 600)
+JPEG_QUALITY = 85
+
+
+# --- Image preparation ---
+def prepare_image(data: bytes) -> bytes:
+    """Crops an image to 4:3 around its centre, resizes it to 800x600 and re-encodes it as JPEG."""
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image = ImageOps.fit(image, IMAGE_SIZE, Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        return output.getvalue()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+# --- Backends ---
+class CloudinaryBackend:
+    """Stores images on Cloudinary under a content-addressed public id."""
+
+    def __init__(self):
+        cloudinary.config(
+            cloud_name=get_setting("CLOUDINARY_CLOUD_NAME"),
+            api_key=get_setting("CLOUDINARY_API_KEY"),
+            api_secret=get_setting("CLOUDINARY_API_SECRET"),
+            secure=True
+        )
+
+    def store(self, data: bytes, key: str) -> str:
+        # overwrite=False returns the image already stored under the key untouched,
+        # which spares a lookup through the rate-limited Admin API.
         result = cloudinary.uploader.upload(
-            file_to_upload,
-            public_id=f"fleet-status/{vehicle_alias}",
-            overwrite=True,
-            resource_type="image",
-            transformation=[
-                {'width': 800, 'height': 600, 'crop': 'fill', 'gravity': 'auto'}
-            ]
+            data,
+            public_id=f"fleet-status/{key}",
+            overwrite=False,
+            resource_type="image"
         )
         return result.get("secure_url")
+
+
+class LocalBackend:
+    """Stores images as files in a local directory; a stand-in for tests and benchmarks."""
+
+    def __init__(self, directory: Union[str, Path] = LOCAL_UPLOAD_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.jpg"
+
+    def store(self, data: bytes, key: str) -> str:
+        path = self._path(key)
+        if path.exists():
+            return str(path)
+        temporary_path = path.with_suffix(".tmp")
+        temporary_path.write_bytes(data)
+        os.replace(temporary_path, path)
+        return str(path)
+
+
+BACKENDS = {"cloudinary": CloudinaryBackend, "local": LocalBackend}
+
+# Content hash -> URL of every image uploaded by this process.
+_uploaded: Dict[str, str] = {}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Returns the configured upload backend, created on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = BACKENDS[UPLOAD_BACKEND]()
+        return _backend
+
+
+def set_backend(backend) -> None:
+    """Replaces the upload backend, e.g. with a LocalBackend in tests and benchmarks."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+        _uploaded.clear()
+
+
+# --- Uploading ---
+@instrumented("uploader.upload_image_bytes")
+def upload_image_bytes(data: bytes) -> Optional[str]:
+    """
+    Resizes and uploads an image, returning its URL.
+    Identical images (same resized bytes) are uploaded only once.
+    """
+    try:
+        prepared = prepare_image(data)
+        key = content_hash(prepared)
+        if key in _uploaded:
+            return _uploaded[key]
+        # Backends keep an image already stored under its key.
+        url = get_backend().store(prepared, key)
+        add_bytes(len(prepared))
+        _uploaded[key] = url
+        return url
     except Exception as e:
         print(f"Error uploading image: {e}")
         return None
+
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="image-upload")
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _upload_vehicle_photo(data: bytes, vehicle_id: str) -> Optional[str]:
+    url = upload_image_bytes(data)
+    if url:
+        repository.update_vehicle(vehicle_id, {"photo_url": url})
+    return url
+
+
+def enqueue_vehicle_photo(data: bytes, vehicle_id: str) -> Future:
+    """
+    Queues a photo to be resized, uploaded and attached to the vehicle in the background.
+    Pass the raw bytes: Streamlit upload objects do not outlive the script run.
+    """
+    with _pending_lock:
+        future = _executor.submit(_upload_vehicle_photo, data, vehicle_id)
+        _pending.add(future)
+    future.add_done_callback(_forget)
+    return future
+
+
+def _forget(future: Future) -> None:
+    with _pending_lock:
+        _pending.discard(future)
+
+
+def pending_uploads() -> int:
+    """Returns the number of photo uploads still queued or running."""
+    with _pending_lock:
+        return len(_pending)
+
+
+register_collector("uploads", lambda: {"pending": pending_uploads()})
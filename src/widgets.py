@@ -0,0 +1,71 @@
+# src/widgets.py
+
+from typing import Dict, List, Optional
+
+import streamlit as st
+
+from src.repository import repository
+from src.i18n import TEXT
+from src.models import VehicleRef
+
+# How many matches a selector lists at once; typing more narrows them down.
+VEHICLE_PICKER_LIMIT = 50
+
+
+def connection_banner() -> None:
+    """Warns when the page is showing the local snapshot because the database is not answering."""
+    status = repository.status()
+    if status["degraded"]:
+        synced_at = status["snapshot"]["last_synced_at"]
+        st.warning(TEXT["degraded_banner"].format(
+            synced_at=synced_at.astimezone().strftime("%Y-%m-%d %H:%M") if synced_at else "?"
+        ))
+
+
+def _search_refs(key: str) -> List[VehicleRef]:
+    """Shows the search box and returns the first matches. Warns when nothing matches."""
+    search = st.text_input(
+        TEXT["vehicle_search_label"],
+        key=f"{key}_search",
+        placeholder=TEXT["vehicle_search_placeholder"]
+    )
+    refs = repository.get_vehicle_refs(search=search, limit=VEHICLE_PICKER_LIMIT + 1)
+    if len(refs) > VEHICLE_PICKER_LIMIT:
+        refs = refs[:VEHICLE_PICKER_LIMIT]
+        st.caption(TEXT["vehicle_search_more"].format(limit=VEHICLE_PICKER_LIMIT))
+    elif not refs:
+        st.warning(TEXT["vehicle_search_no_results"] if search else TEXT["manage_no_vehicles"])
+    return refs
+
+
+def vehicle_picker(key: str) -> Optional[VehicleRef]:
+    """
+    Type-ahead vehicle selector: a search box plus a selectbox of the matching vehicles.
+    Only (id, alias, location) are fetched; load the full vehicle for the returned ref.
+    Returns None when nothing matches.
+    """
+    refs = {ref.id: ref for ref in _search_refs(key)}
+    if not refs:
+        return None
+    vehicle_id = st.selectbox(
+        TEXT["manage_select_vehicle"],
+        options=list(refs),
+        format_func=lambda vehicle_id: refs[vehicle_id].label,
+        key=f"{key}_choice"
+    )
+    return refs[vehicle_id]
+
+
+def vehicle_multi_picker(key: str) -> List[VehicleRef]:
+    """Like vehicle_picker, for several vehicles. Chosen vehicles stay selected across searches."""
+    chosen: Dict[str, VehicleRef] = st.session_state.setdefault(f"{key}_chosen", {})
+    refs = {**chosen, **{ref.id: ref for ref in _search_refs(key)}}
+    selected_ids = st.multiselect(
+        TEXT["bulk_edit_select"],
+        options=list(refs),
+        default=[vehicle_id for vehicle_id in chosen if vehicle_id in refs],
+        format_func=lambda vehicle_id: refs[vehicle_id].label,
+    )
+    chosen.clear()
+    chosen.update((vehicle_id, refs[vehicle_id]) for vehicle_id in selected_ids)
+    return list(chosen.values())